@@ -1,7 +1,14 @@
+import os
+
 import dash
 from dash import html, dcc 
 import dash_bootstrap_components as dbc
 
+from components.figureCache import figure_cache
+from components.metrics import register_metrics
+from components.warmup import warm_in_background
+from data.loaderCache import loader_cache
+
 # Initialize the Dash app with specific external stylesheets and configuration settings.
 # The app uses the Dash Bootstrap SPACELAB theme and suppresses exceptions for callback.
 app = dash.Dash(__name__, use_pages=True, external_stylesheets=[dbc.themes.SPACELAB], suppress_callback_exceptions=True)
@@ -24,7 +31,19 @@ app.layout = dbc.Container([
     )
 ], fluid=True)
 
+# Callback latencies, response sizes, figure builds and cache statistics are served in the
+# Prometheus text format on /metrics.
+register_metrics(app.server, {'figure': figure_cache, 'loader': loader_cache})
+
+# WSGI entry point for production servers, see serve.py
+server = app.server
+
 
 if __name__ == '__main__':
+    # The reloader runs this file again in the process that serves the requests; only that one
+    # pre-renders the most requested figures, in the background. serve.py does it in its master
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        from pages.StockVis import get_warmup_tasks
+        warm_in_background(get_warmup_tasks())
     app.run_server(debug=True, port=8052)
 
@@ -0,0 +1,239 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+import plotly
+import plotly.io as pio
+from plotly.io.json import to_json_plotly
+
+from benchmarks.scaleData import scale_dataset
+from components.buySell import create_buysell_volume
+from components.company import create_parallel_coordinates_figure
+from components.dividend import create_dividend_figure, create_monthly_dividend_figure, create_simplified_monthly_dividend_figure
+from components.figureCache import figure_cache
+from components.serialize import compact_figure
+from components.gainLoss import create_gain_loss_chart
+from components.multiple import create_stock_overview_figure, get_overview_lines
+from components.single import create_single_stock_figure
+from data import dataManage
+from data.loaderCache import loader_cache
+from data.portfolioAccounting import build_company_data, stock_splits
+from data.priceStore import compile_price_store
+from data.transactionCube import build_cube, transaction_cube
+from data.valuation import portfolio_valuation
+
+# Dataset sizes benchmarked by default, as multiples of the shipped data
+DEFAULT_SCALES = [1, 10, 100]
+
+LOADERS = [
+    dataManage.load_investment_data,
+    dataManage.load_price_panel,
+    dataManage.load_investment_dates,
+    dataManage.get_all_tickers,
+    dataManage.load_company_data,
+]
+
+
+def _uncached(function):
+    # builders and loaders are memoized, time the function underneath
+    return getattr(function, '__wrapped__', function)
+
+
+def measure(function, repeat):
+    """
+    Times a call and records its peak Python memory.
+
+    Parameters:
+        function (callable): The call to measure, without arguments.
+        repeat (int): The number of timed runs.
+
+    Returns:
+        tuple: (result dict with the timings and peak memory, value returned by the last run).
+    """
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        value = function()
+        runs.append(time.perf_counter() - start)
+
+    # peak memory is measured in a separate run as tracing slows the code down
+    tracemalloc.start()
+    function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {'min_seconds': min(runs), 'median_seconds': statistics.median(runs), 'runs': runs, 'peak_bytes': peak}, value
+
+
+def measure_figure(builder, args, repeat):
+    """
+    Measures a figure builder, bypassing the figure cache, and the serialization of its figure,
+    both as plotly JSON and in the compact form the callbacks send.
+
+    Parameters:
+        builder (function): A memoized create_* figure builder.
+        args (tuple): The arguments of the builder.
+        repeat (int): The number of timed runs.
+
+    Returns:
+        dict: The timings, peak memory, serialized sizes and trace count.
+    """
+    result, fig = measure(lambda: _uncached(builder)(*args), repeat)
+    start = time.perf_counter()
+    serialized = pio.to_json(fig, validate=False)
+    result['serialize_seconds'] = time.perf_counter() - start
+    result['figure_bytes'] = len(serialized.encode())
+    start = time.perf_counter()
+    compact = to_json_plotly(compact_figure(fig))
+    result['compact_serialize_seconds'] = time.perf_counter() - start
+    result['compact_bytes'] = len(compact.encode())
+    result['traces'] = len(fig['data'])
+    return result
+
+
+def benchmark_scale(data_dir, scale, repeat):
+    """
+    Runs every benchmark against one dataset.
+
+    Parameters:
+        data_dir (str): The directory holding the dataset.
+        scale (int): The scale of the dataset, recorded with the results.
+        repeat (int): The number of timed runs of each benchmark.
+
+    Returns:
+        list: One dict per benchmark.
+    """
+    dataManage.DATA_DIR = data_dir
+    loader_cache.clear()
+    figure_cache.clear()
+    results = []
+
+    def record(kind, name, result):
+        result.update({'scale': scale, 'kind': kind, 'name': name})
+        results.append(result)
+        print(f"{scale:>4}x {kind:8s} {name:45s} {result['median_seconds'] * 1000:10.1f} ms"
+              f" {result['peak_bytes'] / 2**20:8.1f} MiB" + (f" {result['figure_bytes'] / 2**10:10.1f} KiB" if 'figure_bytes' in result else ''))
+
+    record('store', 'compile_price_store', measure(lambda: compile_price_store(data_dir, force=True), 1)[0])
+    for loader in LOADERS:
+        # each loader is timed from an empty cache, not on top of the loads before it
+        loader_cache.clear()
+        record('loader', loader.__name__, measure(_uncached(loader), repeat)[0])
+    # the frames sliced from the price panel, timed once the panel is loaded
+    tickers = dataManage.get_all_tickers()
+    dataManage.load_price_panel()
+    record('loader', 'load_stock_close_data', measure(dataManage.load_stock_close_data, repeat)[0])
+    record('loader', 'load_ticker_stock_data', measure(lambda: dataManage.load_ticker_stock_data(tickers[0]), repeat)[0])
+
+    df = dataManage.load_investment_data()
+    dates = dataManage.load_investment_dates()
+    stock_df = dataManage.load_stock_close_data()
+    result, company_df = measure(lambda: build_company_data(df, stock_df, dataManage.load_company_data()), repeat)
+    record('compute', 'build_company_data', result)
+    record('compute', 'build_cube', measure(lambda: build_cube(df), repeat)[0])
+    splits = stock_splits(company_df)
+    record('compute', 'portfolio_valuation', measure(lambda: portfolio_valuation(df, stock_df, splits), repeat)[0])
+    dividend_df = dataManage.filter_dividend_data(transaction_cube(df))
+    # the lines of one zoom of the overview to its last year
+    zoom_range = (stock_df.index[-1] - pd.DateOffset(years=1), stock_df.index[-1])
+    record('compute', 'get_overview_lines', measure(lambda: get_overview_lines(stock_df, dates, company_df, x_range=zoom_range), repeat)[0])
+
+    figures = [
+        (create_single_stock_figure, (tickers[0], dates, df, [10, 50], 'line')),
+        (create_stock_overview_figure, (stock_df, dates, df, company_df)),
+        (create_buysell_volume, (df,)),
+        (create_dividend_figure, (dividend_df,)),
+        (create_monthly_dividend_figure, (dividend_df,)),
+        (create_simplified_monthly_dividend_figure, (dividend_df,)),
+        (create_parallel_coordinates_figure, (company_df,)),
+        (create_gain_loss_chart, (company_df,)),
+    ]
+    for builder, args in figures:
+        record('figure', builder.__name__, measure_figure(builder, args, repeat))
+    return results
+
+
+def environment():
+    """
+    Describes the code and software versions the benchmarks ran with.
+
+    Returns:
+        dict: Timestamp, git commit and library versions.
+    """
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'plotly': plotly.__version__,
+    }
+
+
+def compare(results, baseline_path):
+    """
+    Prints the change of every median time and figure size against an earlier run.
+
+    Parameters:
+        results (list): The results of this run.
+        baseline_path (str): The JSON file written by an earlier run.
+    """
+    with open(baseline_path) as file:
+        baseline = {(entry['scale'], entry['kind'], entry['name']): entry for entry in json.load(file)['results']}
+    print(f'\nCompared with {baseline_path}')
+    for entry in results:
+        previous = baseline.get((entry['scale'], entry['kind'], entry['name']))
+        if previous is None:
+            continue
+        line = f"{entry['scale']:>4}x {entry['name']:45s} time x{entry['median_seconds'] / previous['median_seconds']:.2f}"
+        if 'figure_bytes' in entry and 'figure_bytes' in previous:
+            line += f"  size x{entry['figure_bytes'] / previous['figure_bytes']:.2f}"
+        print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the FinVis loaders and figure builders at scaled data sizes.')
+    parser.add_argument('--scales', type=int, nargs='+', default=DEFAULT_SCALES, help='dataset sizes as multiples of the shipped data')
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs per benchmark')
+    parser.add_argument('--source', default=dataManage.DATA_DIR, help='directory of the dataset to scale')
+    parser.add_argument('--work-dir', help='directory for the scaled datasets, a temporary one by default')
+    parser.add_argument('--out', help='JSON file for the results, benchmarks/results/<timestamp>.json by default')
+    parser.add_argument('--compare', help='JSON file of an earlier run to compare with')
+    args = parser.parse_args(argv)
+
+    source = os.path.abspath(args.source)
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix='finvis-bench-')
+    results = []
+    for scale in args.scales:
+        data_dir = scale_dataset(source, os.path.join(work_dir, f'x{scale}'), scale)
+        results.extend(benchmark_scale(data_dir, scale, args.repeat))
+
+    report = {'environment': environment(), 'repeat': args.repeat, 'results': results}
+    out = args.out or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results',
+                                   datetime.datetime.now().strftime('%Y%m%d-%H%M%S') + '.json')
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, 'w') as file:
+        json.dump(report, file, indent=2)
+    print(f'\nResults written to {out}')
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+import os
+import shutil
+
+import pandas as pd
+
+
+# name of the n-th copy of a ticker, the first copy keeps the original name
+def _copy_ticker(ticker, copy):
+    return ticker if copy == 0 else f'{ticker}.{copy}'
+
+
+def _link_or_copy(source, target):
+    try:
+        os.symlink(os.path.abspath(source), target)
+    except OSError:
+        shutil.copyfile(source, target)
+
+
+def scale_dataset(source_dir, target_dir, factor):
+    """
+    Writes a copy of a data directory with every ticker repeated factor times.
+
+    The n-th copy of a ticker is renamed '<TICKER>.<n>' in the transaction ledger, the company data,
+    the holding periods and the close price files, and its daily price file links to the
+    original one. Ledger rows are renumbered so 'No.' stays unique.
+
+    Parameters:
+        source_dir (str): The directory holding the shipped csv files.
+        target_dir (str): The directory to write the scaled dataset to.
+        factor (int): How many copies of each ticker to write.
+
+    Returns:
+        str: target_dir.
+    """
+    os.makedirs(target_dir, exist_ok=True)
+    copies = range(factor)
+
+    ledger = pd.read_csv(os.path.join(source_dir, 'Investment Transaction.csv'), dtype=str, keep_default_na=False)
+    scaled = []
+    for copy in copies:
+        part = ledger.copy()
+        traded = part['Ticker'] != 'Null'
+        part.loc[traded, 'Ticker'] = part.loc[traded, 'Ticker'].map(lambda ticker: _copy_ticker(ticker, copy))
+        scaled.append(part)
+    ledger = pd.concat(scaled, ignore_index=True)
+    ledger['No.'] = range(1, len(ledger) + 1)
+    ledger.to_csv(os.path.join(target_dir, 'Investment Transaction.csv'), index=False)
+
+    company = pd.read_csv(os.path.join(source_dir, 'Investment Company.csv'))
+    company = pd.concat([company.assign(Ticker=company['Ticker'].map(lambda ticker: _copy_ticker(ticker, copy)))
+                         for copy in copies], ignore_index=True)
+    company['Ticker Index'] = range(len(company))
+    company.to_csv(os.path.join(target_dir, 'Investment Company.csv'), index=False)
+
+    periods = pd.read_csv(os.path.join(source_dir, 'stock_time.csv'), dtype=str)
+    periods = pd.concat([periods.assign(Ticker=periods['Ticker'].map(lambda ticker: _copy_ticker(ticker, copy)))
+                         for copy in copies], ignore_index=True)
+    periods.to_csv(os.path.join(target_dir, 'stock_time.csv'), index=False)
+
+    for name in ('API', 'stock_close'):
+        path = os.path.join(source_dir, f'{name}.csv')
+        if not os.path.exists(path):
+            continue
+        closes = pd.read_csv(path, dtype=str, keep_default_na=False)
+        tickers = closes.columns[1:]
+        columns = [closes[['Date']]] + [closes[tickers].rename(columns=lambda ticker: _copy_ticker(ticker, copy))
+                                        for copy in copies]
+        pd.concat(columns, axis=1).to_csv(os.path.join(target_dir, f'{name}.csv'), index=False)
+
+    for file_name in os.listdir(source_dir):
+        if not file_name.endswith('_stock_data.csv'):
+            continue
+        ticker = file_name[:-len('_stock_data.csv')]
+        for copy in copies:
+            target = os.path.join(target_dir, f'{_copy_ticker(ticker, copy)}_stock_data.csv')
+            if not os.path.exists(target):
+                _link_or_copy(os.path.join(source_dir, file_name), target)
+    return target_dir
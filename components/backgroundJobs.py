@@ -0,0 +1,155 @@
+import functools
+import os
+import tempfile
+
+import flask
+from dash import callback
+
+from components.figureCache import figure_cache
+from components.metrics import merge_metrics, metrics_snapshot, reset_metrics
+from data.ingest import ledger
+from data.loaderCache import snapshot_version
+
+try:
+    import diskcache
+    import multiprocess  # noqa: F401
+    import psutil  # noqa: F401
+    from dash import DiskcacheManager
+except ImportError:  # dash[diskcache] is optional, the callbacks then run in their requests
+    DiskcacheManager = object
+
+# Directory of the disk-backed job store and the seconds a finished result is kept there,
+# overridable through the environment
+JOB_STORE_DIR = os.environ.get('FINVIS_JOB_STORE_DIR', os.path.join(tempfile.gettempdir(), 'finvis-jobs'))
+JOB_EXPIRE_SECONDS = int(os.environ.get('FINVIS_JOB_EXPIRE_SECONDS', 600))
+
+# Milliseconds between two polls of a running job by the browser, and FINVIS_BACKGROUND=0 to run
+# every callback in its request
+JOB_POLL_MS = int(os.environ.get('FINVIS_JOB_POLL_MS', 250))
+BACKGROUND_ENABLED = os.environ.get('FINVIS_BACKGROUND', '1') == '1'
+
+# Prefix of the job store keys under which a finished job leaves its metrics and figures, followed by its job id
+JOB_REPORT_PREFIX = 'finvis-job-report-'
+
+
+# version of the data the results of background callbacks are computed from
+def data_version():
+    """
+    Identifies the loaded ledger and source files, so stored job results are not reused once
+    either changes.
+
+    Returns:
+        tuple: The ledger version and the loader snapshot version.
+    """
+    return (ledger.version, snapshot_version())
+
+
+class JobManager(DiskcacheManager):
+    """
+    DiskcacheManager that brings what a job recorded back into the worker polling for its result.
+
+    A job runs in a process forked from a worker, so the metrics it records and the figures it
+    builds would otherwise be lost with the process. The job leaves them in the store next to its
+    result; the worker that collects the result adds the metrics to its own, attributes the size of
+    the response to the job's callback and, when it is the worker the job was forked from, stores
+    the figures in its figure cache.
+    """
+
+    def get_result(self, key, job):
+        result = super().get_result(key, job)
+        if job and result is not self.UNDEFINED:
+            report = self.handle.pop(f'{JOB_REPORT_PREFIX}{job}', None)
+            if report is not None:
+                merge_metrics(report['metrics'])
+                flask.g.finvis_callback = report['callback']
+                if report['worker'] == os.getpid():
+                    figure_cache.adopt(report['figures'])
+        return result
+
+
+def create_job_manager(directory=JOB_STORE_DIR, expire=JOB_EXPIRE_SECONDS):
+    """
+    Creates the job manager running background callbacks in forked processes.
+
+    Jobs and their progress and results live in a diskcache store, so every worker process of the
+    server shares them without an external broker. Results are stored by callback arguments and
+    data_version, and a repeated request is answered from the store.
+
+    Parameters:
+        directory (str, optional): The directory of the job store.
+        expire (int, optional): The seconds an unused result is kept.
+
+    Returns:
+        JobManager: The manager, or None if dash[diskcache] is not installed.
+    """
+    if DiskcacheManager is object:
+        return None
+    cache = diskcache.Cache(directory)
+    # drop the connection opened by the constructor so forked workers do not share it; each
+    # process reopens its own on first use
+    cache.close()
+    return JobManager(cache, cache_by=[data_version], expire=expire)
+
+
+job_manager = create_job_manager() if BACKGROUND_ENABLED else None
+
+
+def _ignore_progress(*values):
+    pass
+
+
+# run a callback in a job process and leave what it recorded for the worker collecting its result
+def _reporting_job(function):
+    @functools.wraps(function)
+    def in_job(*args):
+        # the metrics inherited from the worker are already counted there
+        reset_metrics()
+        figure_cache.start_recording()
+        try:
+            return function(*args)
+        finally:
+            # stored before Dash stores the result, so the report is there when the result is
+            report = {'callback': function.__name__, 'worker': os.getppid(), 'metrics': metrics_snapshot(),
+                      'figures': figure_cache.stop_recording()}
+            job_manager.handle.set(f'{JOB_REPORT_PREFIX}{os.getpid()}', report, expire=job_manager.expire)
+    return in_job
+
+
+# register a callback that runs outside of its request on the job manager
+def background_callback(*dependencies, progress, progress_default=None, running=None, **kwargs):
+    """
+    Registers a callback as a Dash background callback on job_manager.
+
+    The request that triggers the callback only starts a job and returns, and the browser polls for
+    the progress and the result, so slow figure builds do not hold a request worker. When the
+    callback fires again while its job runs, the browser sends the running job along and it is
+    terminated. The callback receives set_progress as its first argument.
+
+    Without a job manager the callback runs in its request, set_progress does nothing and the
+    running outputs are not updated.
+
+    The metrics a job records and the figures it builds are handed back to the worker that
+    collects its result, see JobManager.
+
+    Parameters:
+        *dependencies: The Outputs, Inputs and States of the callback.
+        progress (list): The Outputs set by set_progress.
+        progress_default (list, optional): The values of the progress Outputs when no job runs.
+        running (list, optional): (Output, value while running, value after) of properties
+                                  changed while a job runs.
+        **kwargs: Other arguments of dash.callback, such as prevent_initial_call.
+
+    Returns:
+        function: The decorator.
+    """
+    def decorator(function):
+        if job_manager is not None:
+            return callback(*dependencies, background=True, manager=job_manager, interval=JOB_POLL_MS,
+                            progress=progress, progress_default=progress_default, running=running,
+                            **kwargs)(_reporting_job(function))
+
+        @functools.wraps(function)
+        def in_request(*args):
+            return function(_ignore_progress, *args)
+        return callback(*dependencies, **kwargs)(in_request)
+    return decorator
@@ -2,21 +2,28 @@ from dash import dcc, html
 import pandas as pd
 import plotly.graph_objs as go
 from data.dataManage import filter_buysell_data, aggregate_data_volume
+from data.transactionCube import transaction_cube
+from components.figureCache import memoize_figure
+from components.serialize import compact_figure
 
+@memoize_figure
 def create_buysell_volume(df):
     """
     Creates a bar chart representing monthly buy and sell transactions for different account types.
 
+    The monthly volumes are rolled up from the monthly transaction cube of df.
+
     Parameters:
         df (DataFrame): The main DataFrame containing transaction data.
 
     Returns:
         go.Figure: A Plotly graph object figure containing the bar chart of buy and sell volumes.
     """
-    inv_buys = aggregate_data_volume(filter_buysell_data(df, 2131, 'buy'))
-    inv_sells = aggregate_data_volume(filter_buysell_data(df, 2131, 'sell'))  
-    isa_buys = aggregate_data_volume(filter_buysell_data(df, 2129, 'buy'))
-    isa_sells = aggregate_data_volume(filter_buysell_data(df, 2129, 'sell'))  
+    cube = transaction_cube(df)
+    inv_buys = aggregate_data_volume(filter_buysell_data(cube, 2131, 'buy'))
+    inv_sells = aggregate_data_volume(filter_buysell_data(cube, 2131, 'sell'))  
+    isa_buys = aggregate_data_volume(filter_buysell_data(cube, 2129, 'buy'))
+    isa_sells = aggregate_data_volume(filter_buysell_data(cube, 2129, 'sell'))  
 
     all_months = sorted(set(inv_buys.index) | set(inv_sells.index) | set(isa_buys.index) | set(isa_sells.index))
     inv_buys = inv_buys.reindex(all_months, fill_value=0)
@@ -69,7 +76,7 @@ def get_buysellTrans_layout(df):
     """
     return html.Div([
         html.H1('Investment Transactions: Buys and Sells'),
-        dcc.Graph(figure=create_buysell_volume(df)),  # Dynamically create and use the figure here
+        dcc.Graph(figure=compact_figure(create_buysell_volume(df))),  # Dynamically create and use the figure here
     ])
 
 
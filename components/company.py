@@ -3,8 +3,11 @@ from dash import dcc, html
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
+from components.figureCache import memoize_figure
+from components.serialize import compact_figure
 
 
+@memoize_figure
 def create_parallel_coordinates_figure(df):
     """
     Creates a parallel coordinates plot for visualizing multivariate data points across different dimensions.
@@ -101,6 +104,6 @@ def get_risk_layout(df):
     # Return the layout with the generated figure
     return html.Div([
         html.H2('Risk Factors'),
-        dcc.Graph(id='risk-parallel-chart',figure=parallel_coordinates_fig),
+        dcc.Graph(id='risk-parallel-chart',figure=compact_figure(parallel_coordinates_fig)),
     ])
  
\ No newline at end of file
@@ -0,0 +1,105 @@
+from dash import dcc, html
+import pandas as pd
+import plotly.graph_objs as go
+from data.dataManage import load_price_panel, get_all_tickers
+from data.correlation import rebase, rolling_correlation
+from components.figureCache import memoize_figure
+from components.downsample import MAX_POINTS_PER_TRACE, downsample_series
+
+# Trailing windows of the correlation heatmap, in trading days (0 for every day)
+CORRELATION_WINDOWS = {'1 month': 21, '3 months': 63, '6 months': 126, '1 year': 252, 'All': 0}
+
+# Number of tickers selected when the compare view opens
+DEFAULT_COMPARE_TICKERS = 5
+
+
+@memoize_figure
+def create_compare_figure(tickers, base_date=None, max_points=MAX_POINTS_PER_TRACE):
+    """
+    Creates a line chart of the adjusted closes of several tickers rebased to 100 at a date.
+
+    Parameters:
+        tickers (list): The tickers to compare.
+        base_date (str, optional): The date every ticker is rebased at, the first date by default.
+        max_points (int, optional): The maximum number of points plotted per ticker.
+
+    Returns:
+        go.Figure: Plotly graph object figure with one line per ticker.
+    """
+    close_df = load_price_panel().frame('Close')
+    rebased = rebase(close_df[[ticker for ticker in tickers if ticker in close_df.columns]], base_date)
+
+    fig = go.Figure()
+    for ticker in rebased.columns:
+        line = downsample_series(rebased[ticker], max_points)
+        fig.add_trace(go.Scatter(x=line.index, y=line, mode='lines', name=ticker))
+    fig.add_hline(y=100, line=dict(color='grey', dash='dot', width=1))
+    fig.update_layout(title='Adjusted Close Rebased to 100', xaxis_title='Date', yaxis_title='Rebased Close',
+                      hovermode='x unified')
+    return fig
+
+
+@memoize_figure
+def create_correlation_figure(tickers, window=252, end_date=None):
+    """
+    Creates a heatmap of the correlations of the daily returns of the holdings over a trailing window.
+
+    Parameters:
+        tickers (list): The tickers of the heatmap.
+        window (int, optional): The number of trading days in the window, 0 for every day.
+        end_date (str, optional): The last date of the window, the last trading date by default.
+
+    Returns:
+        go.Figure: Plotly graph object figure containing the heatmap.
+    """
+    close_df = load_price_panel().frame('Close')
+    correlations = rolling_correlation(close_df[[ticker for ticker in tickers if ticker in close_df.columns]], window, end_date)
+
+    fig = go.Figure(go.Heatmap(z=correlations.to_numpy(), x=correlations.columns, y=correlations.index,
+                               zmin=-1, zmax=1, colorscale='RdBu_r', hoverongaps=False,
+                               hovertemplate='%{y} / %{x}: %{z:.2f}<extra></extra>'))
+    fig.update_layout(title='Correlation of Daily Returns', height=max(500, 12 * len(correlations)),
+                      xaxis=dict(tickangle=-90), yaxis=dict(autorange='reversed'))
+    return fig
+
+
+def get_compare_layout():
+    """
+    Generates the layout of the compare view: selected tickers rebased to a common date, and the
+    correlation heatmap of every holding.
+
+    Returns:
+        html.Div: A Dash HTML component containing the layout of the compare view.
+    """
+    tickers = sorted(get_all_tickers())
+    dates = load_price_panel().frame('Close').index
+    default_base = dates[dates.searchsorted(dates[-1] - pd.DateOffset(years=1))]
+    return html.Div([
+        dcc.Dropdown(
+            id='compare-tickers',
+            options=[{'label': ticker, 'value': ticker} for ticker in tickers],
+            value=tickers[:DEFAULT_COMPARE_TICKERS],
+            multi=True,
+            placeholder="Select tickers to compare",
+        ),
+        html.Div([
+            html.Label('Rebase at ', style={'marginRight': '10px'}),
+            dcc.DatePickerSingle(id='compare-base-date', date=default_base.date(), min_date_allowed=dates[0].date(),
+                                 max_date_allowed=dates[-1].date(), display_format='DD/MM/YYYY'),
+        ], style={'padding': '10px'}),
+        dcc.Graph(id='compare-chart'),
+        html.Div([
+            html.Label('Correlation over ', style={'marginRight': '10px'}),
+            dcc.Dropdown(
+                id='correlation-window',
+                options=[{'label': label, 'value': days} for label, days in CORRELATION_WINDOWS.items()],
+                value=CORRELATION_WINDOWS['1 year'],
+                clearable=False,
+                style={'width': '200px', 'display': 'inline-block', 'verticalAlign': 'middle'},
+            ),
+            html.Label(' up to ', style={'margin': '0 10px'}),
+            dcc.DatePickerSingle(id='correlation-end-date', date=dates[-1].date(), min_date_allowed=dates[0].date(),
+                                 max_date_allowed=dates[-1].date(), display_format='DD/MM/YYYY'),
+        ], style={'padding': '10px'}),
+        dcc.Graph(id='correlation-heatmap')
+    ])
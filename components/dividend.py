@@ -2,9 +2,12 @@ import dash
 from dash import dcc, html
 import plotly.graph_objs as go
 from data.dataManage import aggregate_dividend_data, aggregate_dividend_data_by_month
+from components.figureCache import memoize_figure
+from components.serialize import compact_figure
  
 
 
+@memoize_figure
 def create_dividend_figure(dividend_df):
     """
     Creates a bar chart displaying the total dividends by type for each ticker.
@@ -39,6 +42,7 @@ def create_dividend_figure(dividend_df):
     return fig
 
 
+@memoize_figure
 def create_monthly_dividend_figure(dividend_df):
     """
     Creates a stacked bar chart of monthly dividends by ticker and type over time.
@@ -85,6 +89,7 @@ def create_monthly_dividend_figure(dividend_df):
     )
     return fig
 
+@memoize_figure
 def create_simplified_monthly_dividend_figure(dividend_df):
     """
     Creates a simplified bar chart of monthly dividends by ticker.
@@ -97,7 +102,7 @@ def create_simplified_monthly_dividend_figure(dividend_df):
     """
 
     monthly_dividend_data = aggregate_dividend_data_by_month(dividend_df)
-    grouped_df = monthly_dividend_data.groupby(['Month_Year', 'Ticker'])['Total (GBP)'].sum().reset_index()
+    grouped_df = monthly_dividend_data.groupby(['Month_Year', 'Ticker'], observed=True)['Total (GBP)'].sum().reset_index()
     fig = go.Figure()
     tickers = grouped_df['Ticker'].unique()
     for ticker in tickers:
@@ -148,9 +153,9 @@ def get_dividend_layout(dividend_df):
     simplified_fig = create_simplified_monthly_dividend_figure(dividend_df)
     layout = html.Div([
         html.H2('Dividend Actions by Ticker and Type'),
-        dcc.Graph(id='dividend-actions-chart', figure=dividend_fig),
+        dcc.Graph(id='dividend-actions-chart', figure=compact_figure(dividend_fig)),
         html.Button('Toggle View', id='dividend-detail-view', n_clicks=0),
-        html.Div(id='toggle-simplified-view', children=[dcc.Graph(figure=simplified_fig)]),
+        html.Div(id='toggle-simplified-view', children=[dcc.Graph(figure=compact_figure(simplified_fig))]),
     ])
     return layout
 
@@ -0,0 +1,98 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+# Maximum number of points sent per line trace, overridable through the environment
+MAX_POINTS_PER_TRACE = int(os.environ.get('FINVIS_MAX_POINTS', 300))
+
+
+# pick the points of a line that keep its visual shape (largest-triangle-three-buckets)
+def lttb_indices(x, y, max_points):
+    """
+    Selects the points of a line with the largest-triangle-three-buckets algorithm.
+
+    The first and last points are always kept; the points in between are split into equal
+    buckets and from each one the point forming the largest triangle with the previously
+    selected point and the average of the next bucket is kept, which preserves peaks and troughs.
+
+    Parameters:
+        x (ndarray): The x values, increasing.
+        y (ndarray): The y values, without NaN.
+        max_points (int): The number of points to keep.
+
+    Returns:
+        ndarray: The sorted positions of the kept points.
+    """
+    n = len(x)
+    if max_points >= n or max_points < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    # bucket edges over the points between the first and the last one
+    edges = (np.arange(max_points - 1) * (n - 2) / (max_points - 2)).astype(np.int64) + 1
+    edges[-1] = n - 1
+
+    # the average point of the bucket after each one does not depend on the selection, so it is
+    # computed up front; the last point forms a bucket of its own
+    starts = edges[1:]
+    sizes = np.diff(np.append(starts, n))
+    average_x = np.add.reduceat(x, starts) / sizes
+    average_y = np.add.reduceat(y, starts) / sizes
+
+    selected = np.empty(max_points, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    previous = 0
+    for bucket in range(max_points - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        areas = np.abs((x[previous] - average_x[bucket]) * (y[start:end] - y[previous])
+                       - (x[previous] - x[start:end]) * (average_y[bucket] - y[previous]))
+        previous = start + int(np.argmax(areas))
+        selected[bucket + 1] = previous
+    return selected
+
+
+def downsample_series(series, max_points=MAX_POINTS_PER_TRACE):
+    """
+    Reduces a date-indexed series to at most max_points points for plotting.
+
+    Missing values are dropped before sampling.
+
+    Parameters:
+        series (Series): Values indexed by date.
+        max_points (int, optional): The maximum number of points to keep.
+
+    Returns:
+        Series: The kept points, in date order.
+    """
+    series = series.dropna()
+    if len(series) <= max_points:
+        return series
+    x = series.index.asi8 if isinstance(series.index, pd.DatetimeIndex) else series.index.to_numpy()
+    return series.iloc[lttb_indices(x, series.to_numpy(), max_points)]
+
+
+# read the new x axis range out of a graph's relayoutData
+def relayout_x_range(relayout_data):
+    """
+    Extracts the x axis range from the relayoutData of a graph.
+
+    Parameters:
+        relayout_data (dict): The relayoutData property of a dcc.Graph.
+
+    Returns:
+        tuple: (changed, x_range) where changed tells whether the x axis was zoomed, panned or
+               reset and x_range is a (start, end) pair of Timestamps, or None for the full range.
+    """
+    if not relayout_data:
+        return False, None
+    if 'xaxis.range[0]' in relayout_data:
+        return True, (pd.Timestamp(relayout_data['xaxis.range[0]']), pd.Timestamp(relayout_data['xaxis.range[1]']))
+    if 'xaxis.range' in relayout_data:
+        start, end = relayout_data['xaxis.range']
+        return True, (pd.Timestamp(start), pd.Timestamp(end))
+    if relayout_data.get('xaxis.autorange'):
+        return True, None
+    return False, None
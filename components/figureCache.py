@@ -0,0 +1,277 @@
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import plotly.io as pio
+
+from components.metrics import record_figure_request
+from data.loaderCache import snapshot_version
+
+# Number of figures kept in memory and whether they are kept as JSON, overridable through the environment
+DEFAULT_MAX_FIGURES = int(os.environ.get('FINVIS_FIGURE_CACHE_SIZE', 128))
+DEFAULT_STORE_JSON = os.environ.get('FINVIS_FIGURE_CACHE_JSON', '0') == '1'
+
+
+# DataFrames used in cache keys by id, so keys of figures built in a forked process can be resolved
+_tracked_frames = weakref.WeakValueDictionary()
+
+
+class _Uncacheable(Exception):
+    pass
+
+
+def track_frames(*frames):
+    """
+    Registers frames that figures built in forked processes, such as background jobs, may be keyed by.
+
+    Frames passed to memoized builders in this process are registered as they are used.
+
+    Parameters:
+        *frames (DataFrame): The frames.
+    """
+    for frame in frames:
+        _tracked_frames[id(frame)] = frame
+
+
+# turn builder arguments into a hashable key, remembering the frames it refers to
+def _freeze(value, frames):
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        frames.append(weakref.ref(value))
+        _tracked_frames[id(value)] = value
+        return ('frame', id(value), value.shape)
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item, frames) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item, frames)) for key, item in value.items()))
+    if isinstance(value, np.generic):
+        return value.item()
+    try:
+        hash(value)
+    except TypeError:
+        raise _Uncacheable()
+    return value
+
+
+class FigureCache:
+    """
+    LRU cache of built figures keyed by builder, arguments and data snapshot version.
+
+    DataFrame arguments are keyed by identity; an entry is only served while the very same frames
+    are still alive. With store_json the figures are kept as serialized JSON and served as dicts,
+    which Dash accepts wherever a figure is expected.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_FIGURES, store_json=DEFAULT_STORE_JSON):
+        self.max_entries = max_entries
+        self.store_json = store_json
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._recorded = None
+
+    def get(self, key):
+        """
+        Looks up a figure.
+
+        Parameters:
+            key (tuple): The cache key.
+
+        Returns:
+            tuple: (True, figure) on a hit, (False, None) on a miss.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and any(ref() is None for ref in entry[0]):
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            stored = entry[1]
+        return True, json.loads(stored) if isinstance(stored, str) else stored
+
+    def contains(self, key):
+        """
+        Tells whether a figure is cached, without counting a hit or a miss.
+
+        Parameters:
+            key (tuple): The cache key.
+
+        Returns:
+            bool: True if the figure is cached and the frames it was built from are alive.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and all(ref() is not None for ref in entry[0])
+
+    def put(self, key, frames, figure):
+        """
+        Stores a figure, evicting the least recently used ones beyond max_entries.
+
+        Parameters:
+            key (tuple): The cache key.
+            frames (list): Weak references to the DataFrame arguments the figure was built from.
+            figure (go.Figure, dict or str): The figure, its dict form or its JSON.
+
+        Returns:
+            The figure as it should be served: a dict when figures are stored as JSON.
+        """
+        if self.store_json and not isinstance(figure, str):
+            figure = pio.to_json(figure, validate=False)
+        with self._lock:
+            if self._recorded is not None:
+                self._recorded.append((key, [(id(ref()), ref().shape) for ref in frames], figure))
+            self._store(key, frames, figure)
+        return json.loads(figure) if isinstance(figure, str) else figure
+
+    def _store(self, key, frames, figure):
+        self._entries[key] = (frames, figure)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def start_recording(self):
+        """
+        Starts collecting the figures stored from now on, to hand them to another process.
+        """
+        with self._lock:
+            self._recorded = []
+
+    def stop_recording(self):
+        """
+        Stops collecting the stored figures.
+
+        Returns:
+            list: (key, (id, shape) of every frame of the key, stored figure) of the figures
+                  stored since start_recording.
+        """
+        with self._lock:
+            recorded, self._recorded = self._recorded, None
+        return recorded or []
+
+    def adopt(self, entries):
+        """
+        Stores figures built by a process forked from this one, such as a background job.
+
+        The frames of each key are looked up by id among the tracked frames of this process, and a
+        figure is skipped when one of them is gone or has changed shape.
+
+        Parameters:
+            entries (list): The figures, as returned by stop_recording in the other process.
+
+        Returns:
+            int: The number of figures stored.
+        """
+        adopted = 0
+        for key, frame_ids, figure in entries:
+            frames = [_tracked_frames.get(frame_id) for frame_id, _ in frame_ids]
+            if any(frame is None or frame.shape != tuple(shape) for frame, (_, shape) in zip(frames, frame_ids)):
+                continue
+            with self._lock:
+                self._store(key, [weakref.ref(frame) for frame in frames], figure)
+            adopted += 1
+        return adopted
+
+    def clear(self):
+        """
+        Removes every figure while keeping the counters.
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+        Reports the cache counters.
+
+        Returns:
+            dict: Hits, misses, evictions and number of entries.
+        """
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                    'entries': len(self._entries), 'max_entries': self.max_entries}
+
+
+figure_cache = FigureCache()
+
+
+def figure_key(builder, args, kwargs):
+    """
+    Computes the cache key of a builder call.
+
+    Parameters:
+        builder (function): The undecorated figure builder.
+        args (tuple): Positional arguments of the call.
+        kwargs (dict): Keyword arguments of the call.
+
+    Returns:
+        tuple: (key, frames), or (None, None) if an argument cannot be part of a key.
+    """
+    bound = inspect.signature(builder).bind(*args, **kwargs)
+    bound.apply_defaults()
+    frames = []
+    try:
+        arguments = _freeze(dict(bound.arguments), frames)
+    except _Uncacheable:
+        return None, None
+    return (builder.__module__, builder.__qualname__, snapshot_version(), arguments), frames
+
+
+# cached figure of a memoized builder call, never building it
+def peek_figure(builder, *args, **kwargs):
+    """
+    Looks up a call of a memoized builder in the shared figure cache without building the figure.
+
+    Parameters:
+        builder (function): A builder decorated with memoize_figure.
+        *args: Positional arguments of the call.
+        **kwargs: Keyword arguments of the call.
+
+    Returns:
+        The cached figure, or None if it is not cached.
+    """
+    key, _ = figure_key(builder.__wrapped__, args, kwargs)
+    if key is None or not figure_cache.contains(key):
+        return None
+    hit, figure = figure_cache.get(key)
+    return figure if hit else None
+
+
+# decorator serving repeated builder calls from the shared figure cache
+def memoize_figure(builder):
+    """
+    Memoizes a create_*_figure function in the shared figure cache.
+
+    The returned figure is shared between callers and must not be modified. Every call is recorded
+    as a cache hit or miss, and the time spent building missed figures is recorded per builder.
+
+    Parameters:
+        builder (function): A figure builder that is pure with respect to its arguments and the loaded data.
+
+    Returns:
+        function: The memoized builder. The original is available as __wrapped__.
+    """
+    @functools.wraps(builder)
+    def wrapper(*args, **kwargs):
+        key, frames = figure_key(builder, args, kwargs)
+        if key is not None:
+            hit, figure = figure_cache.get(key)
+            if hit:
+                record_figure_request(builder.__name__, True)
+                return figure
+        start = time.perf_counter()
+        figure = builder(*args, **kwargs)
+        record_figure_request(builder.__name__, False, time.perf_counter() - start)
+        return figure if key is None else figure_cache.put(key, frames, figure)
+    return wrapper
@@ -1,16 +1,18 @@
 from dash import dcc, html
 import plotly.graph_objects as go
+from components.figureCache import memoize_figure
 
-def create_gain_loss_chart(data, sort_column = 'Total'):
+def get_gain_loss_bars(data, sort_column = 'Total'):
     """
-    Creates a horizontal bar chart to display total dividends and realized capital gains and losses for each ticker.
+    Computes the sorted labels and bar lengths of the gain/loss chart.
 
     Parameters:
         data (DataFrame): DataFrame containing 'Ticker', 'Total Dividends', and 'Realized Capital Gain & Loss'.
         sort_column (str, optional): Column name to sort the data by. Defaults to 'Total'.
 
     Returns:
-        go.Figure: A Plotly graph object figure containing the bar chart.
+        tuple: (labels, dividends, gains) where labels are the y-axis categories and dividends and gains
+               the Total Dividends and Realized Capital Gain & Loss of each ticker, in ascending order of sort_column.
     """
     data = data[['Ticker', 'Total Dividends', 'Realized Capital Gain & Loss']]
     data_grouped = data.groupby('Ticker').sum()
@@ -21,12 +23,49 @@ def create_gain_loss_chart(data, sort_column = 'Total'):
     # Sort data by the 'Total' column in descending order
     data_grouped = data_grouped.sort_values(sort_column, ascending=True)
 
+    labels = [f"{idx}: £{value:.2f}" for idx, value in zip(data_grouped.index, data_grouped[sort_column])]
+    return labels, data_grouped['Total Dividends'].tolist(), data_grouped['Realized Capital Gain & Loss'].tolist()
+
+
+# Pick the sort column matching the traces left visible in the legend
+def get_gain_loss_sort_column(visible):
+    """
+    Chooses the column the gain/loss chart is sorted by.
+
+    Parameters:
+        visible (list): Visibility of the Total Dividends and Capital Gain & Loss traces.
+
+    Returns:
+        str: 'Total Dividends' or 'Realized Capital Gain & Loss' when only that trace is shown, otherwise 'Total'.
+    """
+    dividends_shown, gains_shown = (value is True for value in visible)
+    if dividends_shown and not gains_shown:
+        return 'Total Dividends'
+    if gains_shown and not dividends_shown:
+        return 'Realized Capital Gain & Loss'
+    return 'Total'
+
+
+@memoize_figure
+def create_gain_loss_chart(data, sort_column = 'Total'):
+    """
+    Creates a horizontal bar chart to display total dividends and realized capital gains and losses for each ticker.
+
+    Parameters:
+        data (DataFrame): DataFrame containing 'Ticker', 'Total Dividends', and 'Realized Capital Gain & Loss'.
+        sort_column (str, optional): Column name to sort the data by. Defaults to 'Total'.
+
+    Returns:
+        go.Figure: A Plotly graph object figure containing the bar chart.
+    """
+    labels, dividends, gains = get_gain_loss_bars(data, sort_column)
+
     fig = go.Figure()
 
     # Add Total Dividends as a bar
     fig.add_trace(go.Bar(
-        y=[f"{idx}: £{row[sort_column]:.2f}" for idx, row in data_grouped.iterrows()],  # Modified y-axis labels
-        x=data_grouped['Total Dividends'],
+        y=labels,  # Modified y-axis labels
+        x=dividends,
         name='Total Dividends',
         orientation='h',
         marker_color='blue'
@@ -34,8 +73,8 @@ def create_gain_loss_chart(data, sort_column = 'Total'):
 
     # Add Realized Capital Gain & Loss as another bar
     fig.add_trace(go.Bar(
-        y=[f"{idx}: £{row[sort_column]:.2f}" for idx, row in data_grouped.iterrows()],  # Reused modified y-axis labels
-        x=data_grouped['Realized Capital Gain & Loss'],
+        y=labels,  # Reused modified y-axis labels
+        x=gains,
         name='Capital Gain & Loss',
         orientation='h',
         marker_color='green'
@@ -59,19 +98,17 @@ def create_gain_loss_chart(data, sort_column = 'Total'):
 
     return fig
 
-def get_gainLoss_layout(df):
+def get_gainLoss_layout():
     """
     Generates the layout for the Gain/Loss view containing a bar chart.
 
-    Parameters:
-        df (DataFrame): DataFrame containing data to be displayed in the bar chart.
+    The chart is filled by the same callback as the one on the home page.
 
     Returns:
         html.Div: A Dash HTML component containing the Gain/Loss layout.
     """
-    gain_loss_fig = create_gain_loss_chart(df)
-
     return html.Div([
         html.H2('Gain/Loss'),
-        dcc.Graph(id='gain-loss-chart',figure=gain_loss_fig),
+        dcc.Graph(id='gain-loss-chart'),
+        dcc.Store(id='gain-loss-visible', data=[True, True]),
     ])
\ No newline at end of file
@@ -0,0 +1,489 @@
+import functools
+import glob
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+
+import flask
+
+# Upper bounds of the latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Upper bounds of the response size histogram buckets, in bytes (1 KiB to 16 MiB)
+SIZE_BUCKETS = tuple(float(2 ** power) for power in range(10, 25, 2))
+
+# Cache counters exported as Prometheus counters, the other statistics are exported as gauges
+_CACHE_COUNTERS = ('hits', 'misses', 'evictions', 'invalidations')
+
+# Directory shared by the server worker processes. Each writes its metrics to <pid>.json after it
+# served requests and /metrics on any worker reports the sum of all files; serve.py sets it for
+# multi-worker servers. Without it every process only reports its own metrics
+METRICS_DIR = os.environ.get('FINVIS_METRICS_DIR')
+
+# Minimum number of seconds between two writes of a worker's metrics file
+METRICS_FLUSH_SECONDS = 1.0
+
+_flush_lock = threading.Lock()
+
+# background thread writing the metrics file of the process it was started in, woken by requests
+_flusher = {'pid': None, 'pending': None}
+_flusher_lock = threading.Lock()
+
+# callback running in the current thread, for the builders of background jobs that run outside a request
+_running = threading.local()
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra is not None:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """
+    Thread-safe Prometheus histogram with one series per combination of label values.
+    """
+
+    def __init__(self, name, documentation, labelnames, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        """
+        Records an observation.
+
+        Parameters:
+            value (float): The observed value.
+            *labels (str): The label values, in the order of labelnames.
+        """
+        # the first bucket whose upper bound is not below the value, or +Inf
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def snapshot(self):
+        """
+        Returns:
+            dict: A copy of every series, [bucket counts, sum, count] by label values.
+        """
+        with self._lock:
+            return {labels: [list(counts), total, count] for labels, (counts, total, count) in self._series.items()}
+
+    @staticmethod
+    def combine(first, second):
+        """
+        Parameters:
+            first (list): The [bucket counts, sum, count] of a series.
+            second (list): The [bucket counts, sum, count] of the same series in another process.
+
+        Returns:
+            list: The sum of both.
+        """
+        return [[a + b for a, b in zip(first[0], second[0])], first[1] + second[1], first[2] + second[2]]
+
+    def merge(self, series):
+        """
+        Adds the series of another process to this histogram.
+
+        Parameters:
+            series (dict): [bucket counts, sum, count] by label values, as returned by snapshot().
+        """
+        with self._lock:
+            for labels, value in series.items():
+                current = self._series.get(labels)
+                self._series[labels] = [list(value[0]), value[1], value[2]] if current is None else self.combine(current, value)
+
+    def reset(self):
+        """
+        Removes every series.
+        """
+        with self._lock:
+            self._series = {}
+
+    def render(self, series=None):
+        """
+        Formats the histogram in the Prometheus text exposition format.
+
+        Parameters:
+            series (dict, optional): The series to format, as returned by snapshot(), this process' by default.
+
+        Returns:
+            list: The lines of the histogram.
+        """
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        series = sorted((labels, counts, total, count) for labels, (counts, total, count) in (self.snapshot() if series is None else series).items())
+        for labels, counts, total, count in series:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                bucket_labels = _format_labels(self.labelnames, labels, ('le', _format_value(bound)))
+                lines.append(f'{self.name}_bucket{bucket_labels} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(total)}')
+            lines.append(f'{self.name}_count{_format_labels(self.labelnames, labels)} {count}')
+        return lines
+
+
+class Counter:
+    """
+    Thread-safe Prometheus counter with one series per combination of label values.
+    """
+
+    def __init__(self, name, documentation, labelnames):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        """
+        Increments the counter.
+
+        Parameters:
+            *labels (str): The label values, in the order of labelnames.
+            amount (int, optional): The increment.
+        """
+        with self._lock:
+            self._series[labels] = self._series.get(labels, 0) + amount
+
+    def snapshot(self):
+        """
+        Returns:
+            dict: A copy of every series, the count by label values.
+        """
+        with self._lock:
+            return dict(self._series)
+
+    @staticmethod
+    def combine(first, second):
+        """
+        Parameters:
+            first (int): The count of a series.
+            second (int): The count of the same series in another process.
+
+        Returns:
+            int: The sum of both.
+        """
+        return first + second
+
+    def merge(self, series):
+        """
+        Adds the series of another process to this counter.
+
+        Parameters:
+            series (dict): The count by label values, as returned by snapshot().
+        """
+        with self._lock:
+            for labels, value in series.items():
+                self._series[labels] = self._series.get(labels, 0) + value
+
+    def reset(self):
+        """
+        Removes every series.
+        """
+        with self._lock:
+            self._series = {}
+
+    def render(self, series=None):
+        """
+        Formats the counter in the Prometheus text exposition format.
+
+        Parameters:
+            series (dict, optional): The series to format, as returned by snapshot(), this process' by default.
+
+        Returns:
+            list: The lines of the counter.
+        """
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        series = sorted((self.snapshot() if series is None else series).items())
+        lines.extend(f'{self.name}{_format_labels(self.labelnames, labels)} {value}' for labels, value in series)
+        return lines
+
+
+callback_seconds = Histogram('finvis_callback_seconds', 'Wall time of the Dash callbacks.', ['callback'])
+callback_response_bytes = Histogram('finvis_callback_response_bytes', 'Size of the Dash callback responses.',
+                                    ['callback'], SIZE_BUCKETS)
+builder_seconds = Histogram('finvis_builder_seconds', 'Time spent building figures in the create_* builders.',
+                            ['builder', 'callback'])
+figure_requests = Counter('finvis_figure_requests_total', 'Figure builder calls by figure cache result.',
+                          ['builder', 'callback', 'result'])
+
+_METRICS = [callback_seconds, callback_response_bytes, builder_seconds, figure_requests]
+
+
+# name of the callback handling the current request, '' outside of callbacks
+def current_callback():
+    """
+    Returns the name of the instrumented callback running in the current request, or in the
+    current thread outside of a request, as in a background job.
+
+    Returns:
+        str: The callback name, or '' outside of a callback.
+    """
+    if not flask.has_request_context():
+        return getattr(_running, 'callback', '')
+    return flask.g.get('finvis_callback', '')
+
+
+# decorator recording the wall time of a Dash callback
+def timed_callback(function):
+    """
+    Records the wall time of a callback and tags the request so the builders it calls and the
+    size of its response are attributed to it.
+
+    Apply it below @callback so Dash registers the timed function.
+
+    Parameters:
+        function (function): The callback.
+
+    Returns:
+        function: The timed callback.
+    """
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if flask.has_request_context():
+            flask.g.finvis_callback = function.__name__
+        previous, _running.callback = getattr(_running, 'callback', ''), function.__name__
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            callback_seconds.observe(time.perf_counter() - start, function.__name__)
+            _running.callback = previous
+    return wrapper
+
+
+def record_figure_request(builder, hit, seconds=None):
+    """
+    Records a figure builder call.
+
+    Parameters:
+        builder (str): The name of the builder.
+        hit (bool): Whether the figure was served from the figure cache.
+        seconds (float, optional): The time spent building the figure on a miss.
+    """
+    callback = current_callback()
+    figure_requests.inc(builder, callback, 'hit' if hit else 'miss')
+    if seconds is not None:
+        builder_seconds.observe(seconds, builder, callback)
+
+
+def metrics_snapshot(caches=None):
+    """
+    Copies the metrics of this process in a form that can be written as JSON.
+
+    Parameters:
+        caches (dict, optional): Caches with a stats() method, by name.
+
+    Returns:
+        dict: The [label values, value] pairs of every metric by name, and the cache statistics under 'caches'.
+    """
+    snapshot = {metric.name: [[list(labels), value] for labels, value in metric.snapshot().items()] for metric in _METRICS}
+    snapshot['caches'] = {cache_name: cache.stats() for cache_name, cache in (caches or {}).items()}
+    return snapshot
+
+
+def merge_snapshots(snapshots):
+    """
+    Sums the metrics of several processes.
+
+    Parameters:
+        snapshots (list): Snapshots as returned by metrics_snapshot.
+
+    Returns:
+        dict: The summed series of every metric by name, as returned by its snapshot(), and the
+              summed cache statistics under 'caches'.
+    """
+    merged = {metric.name: {} for metric in _METRICS}
+    merged['caches'] = {}
+    for snapshot in snapshots:
+        for metric in _METRICS:
+            series = merged[metric.name]
+            for labels, value in snapshot.get(metric.name, []):
+                labels = tuple(labels)
+                series[labels] = value if labels not in series else metric.combine(series[labels], value)
+        for cache_name, stats in snapshot.get('caches', {}).items():
+            totals = merged['caches'].setdefault(cache_name, {})
+            for stat, value in stats.items():
+                totals[stat] = totals.get(stat, 0) + value
+    return merged
+
+
+def merge_metrics(snapshot):
+    """
+    Adds the metrics of another process, such as a finished background job, to this process' metrics.
+
+    Parameters:
+        snapshot (dict): The metrics, as returned by metrics_snapshot.
+    """
+    for metric in _METRICS:
+        metric.merge({tuple(labels): value for labels, value in snapshot.get(metric.name, [])})
+
+
+def reset_metrics():
+    """
+    Removes every series, such as the ones a forked process inherited from its parent.
+    """
+    for metric in _METRICS:
+        metric.reset()
+
+
+# write this process' metrics to METRICS_DIR for the other workers to report
+def flush_metrics(caches=None):
+    """
+    Writes the metrics of this process to <pid>.json in METRICS_DIR, replacing the file atomically.
+
+    Parameters:
+        caches (dict, optional): Caches with a stats() method, by name.
+    """
+    if not METRICS_DIR:
+        return
+    path = os.path.join(METRICS_DIR, f'{os.getpid()}.json')
+    with _flush_lock:
+        with open(path + '.tmp', 'w') as file:
+            json.dump(metrics_snapshot(caches), file)
+        os.replace(path + '.tmp', path)
+
+
+def collect_metrics(caches=None):
+    """
+    Gathers the metrics of every worker from METRICS_DIR, or of this process without it.
+
+    Files of workers that exited are kept, so the counters never go down while the server runs, but
+    only the counters of their caches are added: the entries and bytes they held were freed.
+
+    Parameters:
+        caches (dict, optional): Caches with a stats() method, by name.
+
+    Returns:
+        dict: The summed metrics, as returned by merge_snapshots.
+    """
+    if not METRICS_DIR:
+        return merge_snapshots([metrics_snapshot(caches)])
+    flush_metrics(caches)
+    snapshots = []
+    for path in glob.glob(os.path.join(METRICS_DIR, '*.json')):
+        try:
+            with open(path) as file:
+                snapshot = json.load(file)
+        except (OSError, ValueError):
+            # a file removed or replaced while listing the directory
+            continue
+        if not _alive(os.path.basename(path)[:-len('.json')]):
+            snapshot['caches'] = {
+                cache_name: {stat: value for stat, value in stats.items() if stat in _CACHE_COUNTERS}
+                for cache_name, stats in snapshot.get('caches', {}).items()
+            }
+        snapshots.append(snapshot)
+    return merge_snapshots(snapshots)
+
+
+def _alive(pid):
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, ValueError):
+        pass
+    return True
+
+
+def _cache_lines(cache_stats):
+    lines = []
+    samples = {}
+    for cache_name, stats in cache_stats.items():
+        for stat, value in stats.items():
+            samples.setdefault(stat, []).append((cache_name, value))
+    for stat, values in samples.items():
+        name, kind = (f'finvis_cache_{stat}_total', 'counter') if stat in _CACHE_COUNTERS else (f'finvis_cache_{stat}', 'gauge')
+        lines.extend([f'# HELP {name} {stat.replace("_", " ").capitalize()} of the data caches.', f'# TYPE {name} {kind}'])
+        lines.extend(f'{name}{{cache="{cache_name}"}} {_format_value(value)}' for cache_name, value in values)
+    return lines
+
+
+def render_metrics(caches=None):
+    """
+    Formats every metric in the Prometheus text exposition format, summed over the worker
+    processes when METRICS_DIR is set.
+
+    Parameters:
+        caches (dict, optional): Caches with a stats() method, by name, exported as counters and gauges.
+
+    Returns:
+        str: The exposition text.
+    """
+    merged = collect_metrics(caches)
+    lines = []
+    for metric in _METRICS:
+        lines.extend(metric.render(merged[metric.name]))
+    lines.extend(_cache_lines(merged['caches']))
+    return '\n'.join(lines) + '\n'
+
+
+def _record_response_size(response):
+    callback = current_callback()
+    if callback and not response.direct_passthrough:
+        callback_response_bytes.observe(len(response.get_data()), callback)
+    return response
+
+
+def _flush_periodically(caches, pending):
+    while True:
+        pending.wait()
+        pending.clear()
+        flush_metrics(caches)
+        time.sleep(METRICS_FLUSH_SECONDS)
+
+
+def _flush_after_request(caches):
+    def flush(response):
+        with _flusher_lock:
+            # a forked worker inherits the flusher state of its parent but not its thread
+            if _flusher['pid'] != os.getpid():
+                _flusher.update(pid=os.getpid(), pending=threading.Event())
+                threading.Thread(target=_flush_periodically, args=(caches, _flusher['pending']), daemon=True).start()
+        _flusher['pending'].set()
+        return response
+    return flush
+
+
+def register_metrics(server, caches=None):
+    """
+    Adds the /metrics route to the Flask server and records the size of the callback responses.
+
+    With METRICS_DIR set, a background thread of each worker writes its metrics to the directory
+    after it served requests, at most once every METRICS_FLUSH_SECONDS.
+
+    Parameters:
+        server (Flask): The server of the Dash app.
+        caches (dict, optional): Caches with a stats() method, by name, to export with the metrics.
+    """
+    if METRICS_DIR:
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        # registered first so it runs last, after the response size is recorded
+        server.after_request(_flush_after_request(caches))
+    server.after_request(_record_response_size)
+    server.add_url_rule('/metrics', 'metrics', lambda: flask.Response(
+        render_metrics(caches), mimetype='text/plain; version=0.0.4; charset=utf-8'))
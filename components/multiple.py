@@ -1,28 +1,183 @@
+import threading
+from collections import OrderedDict
+
 import dash
+import numpy as np
 from dash import dcc, html
 import plotly.graph_objs as go
 import pandas as pd
 import plotly.express as px
- 
-def create_stock_overview_figure(stock_df, investment_dates, investment_data, company_data, show_trend_after_last_buy=False, show_trend_after_last_sell=False, ma_period=10):
+from data.movingAverage import moving_average, panel_version
+from components.figureCache import memoize_figure
+from components.downsample import MAX_POINTS_PER_TRACE, downsample_series
+from components.serialize import compact_figure, FLOAT32_PRICES
+
+# Date the trend lines are extended to after the last buy or sell
+extended_date = pd.to_datetime('11/03/2024')
+
+# Symbol and colour of the buy and sell markers of the stock overview
+MARKER_STYLES = {'Buy': ('triangle-up', 'green'), 'Sell': ('triangle-down', 'red')}
+
+# Number of holding period lists kept, one per version of the investment dates and company order
+MAX_CACHED_SEGMENTS = 4
+
+_segment_lock = threading.Lock()
+_segment_cache = OrderedDict()
+
+
+def get_overview_tickers(company_data):
+    """
+    Lists the tickers of the stock overview in plotting order.
+
+    Parameters:
+        company_data (DataFrame): DataFrame with company data.
+
+    Returns:
+        list: The tickers, last company first.
+    """
+    # the first row of each ticker, ordered by index from the last
+    first_rows = company_data['Ticker'].drop_duplicates()
+    return first_rows.sort_index(ascending=False).tolist()
+
+
+# holding periods grouped by ticker once per version of the data, so zooming only slices lines
+def get_overview_segments(investment_dates, company_data):
+    """
+    Lists the holding periods of the stock overview in plotting order.
+
+    The investment dates are grouped by ticker in one vectorized pass and the result is cached per
+    version of the investment dates and of the company order.
+
+    Parameters:
+        investment_dates (DataFrame): DataFrame with the start and end dates for each stock.
+        company_data (DataFrame): DataFrame with company data.
+
+    Returns:
+        list: (ticker, start date, end date, last action) tuples, grouped by ticker in the order of
+              get_overview_tickers. The list is shared with the cache and must not be modified.
+    """
+    key = (panel_version(investment_dates), panel_version(company_data[['Ticker']]))
+    with _segment_lock:
+        segments = _segment_cache.get(key)
+        if segments is not None:
+            _segment_cache.move_to_end(key)
+            return segments
+
+    tickers = get_overview_tickers(company_data)
+    ranks = pd.Index(tickers).get_indexer(investment_dates['Ticker'].astype(object))
+    # rows of tickers without company data are dropped, the others keep their order within a ticker
+    rows = np.flatnonzero(ranks >= 0)
+    rows = rows[np.argsort(ranks[rows], kind='stable')]
+    selected = investment_dates.iloc[rows]
+    last_actions = selected['Last Action'].astype(object) if 'Last Action' in selected else pd.Series(None, index=selected.index)
+    segments = list(zip(selected['Ticker'].astype(object),
+                        pd.to_datetime(selected['Start Date'], format='%d/%m/%Y'),
+                        pd.to_datetime(selected['End Date'], format='%d/%m/%Y'),
+                        last_actions))
+
+    with _segment_lock:
+        _segment_cache[key] = segments
+        while len(_segment_cache) > MAX_CACHED_SEGMENTS:
+            _segment_cache.popitem(last=False)
+    return segments
+
+
+def get_overview_lines(stock_df, investment_dates, company_data, show_trend_after_last_buy=False, show_trend_after_last_sell=False, ma_period=10, x_range=None):
+    """
+    Computes the moving-average line of every holding period shown on the stock overview.
+
+    Parameters:
+        stock_df (DataFrame): DataFrame containing stock close prices indexed by date.
+        investment_dates (DataFrame): DataFrame with the start and end dates for each stock.
+        company_data (DataFrame): DataFrame with company data.
+        show_trend_after_last_buy (bool, optional): Whether to extend the trend line after the last buy action.
+        show_trend_after_last_sell (bool, optional): Whether to extend the trend line after the last sell action.
+        ma_period (int, optional): The period over which to calculate the moving average.
+        x_range (tuple, optional): (start, end) Timestamps the lines are clipped to.
+
+    Returns:
+        list: (ticker, Series) pairs at full resolution, in the order of the line traces of the figure.
+    """
+    # Moving averages of every ticker in one pass, cached per window
+    ma_df = moving_average(stock_df, ma_period)
+
+    # each line is a slice of a column of the matrix, as ma_df.loc[start_date:end_date, ticker]
+    # but without the label lookups of .loc
+    dates = ma_df.index
+    values = ma_df.to_numpy()
+    columns = {ticker: position for position, ticker in enumerate(ma_df.columns)}
+
+    lines = []
+    for ticker, start_date, end_date, last_action in get_overview_segments(investment_dates, company_data):
+        if ticker not in columns:
+            continue
+        if (show_trend_after_last_buy and last_action == 'Buy') or (show_trend_after_last_sell and last_action == 'Sell'):
+            end_date = extended_date
+        if x_range is not None:
+            start_date, end_date = max(start_date, x_range[0]), min(end_date, x_range[1])
+
+        start, end = dates.searchsorted(start_date), dates.searchsorted(end_date, side='right')
+        end = max(start, end)
+        lines.append((ticker, pd.Series(values[start:end, columns[ticker]], index=dates[start:end], name=ticker)))
+    return lines
+
+
+# trace layout of the overview read off the holding periods and transactions, without plotting
+def get_overview_traces(stock_df, investment_dates, investment_data, company_data):
+    """
+    Lists the traces of the stock overview figure without building it.
+
+    The traces are the same whatever the trend and moving-average options, so they can be mapped
+    to tickers before or without the figure.
+
+    Parameters:
+        stock_df (DataFrame): DataFrame containing stock close prices indexed by date.
+        investment_dates (DataFrame): DataFrame with the start and end dates for each stock.
+        investment_data (TransactionFrame): Indexed investment transaction data.
+        company_data (DataFrame): DataFrame with company data.
+
+    Returns:
+        list: (ticker, kind) pairs in trace order, kind being 'line' for a moving-average line, in
+              the order of get_overview_lines, or a key of MARKER_STYLES for the markers of a side.
+    """
+    line_counts = {}
+    for ticker, *_ in get_overview_segments(investment_dates, company_data):
+        if ticker in stock_df.columns:
+            line_counts[ticker] = line_counts.get(ticker, 0) + 1
+    held_tickers = set(investment_dates['Ticker'])
+
+    traces = []
+    for ticker in get_overview_tickers(company_data):
+        traces.extend([(ticker, 'line')] * line_counts.get(ticker, 0))
+        if ticker not in held_tickers:
+            continue
+        for side in MARKER_STYLES:
+            if len(investment_data.rows(ticker=ticker, action_type=side.lower())):
+                traces.append((ticker, side))
+    return traces
+
+
+@memoize_figure
+def create_stock_overview_figure(stock_df, investment_dates, investment_data, company_data, show_trend_after_last_buy=False, show_trend_after_last_sell=False, ma_period=10, max_points=MAX_POINTS_PER_TRACE):
     """
     Creates a stock overview figure with options to extend trend lines and display transactions.
 
+    Each moving-average line is downsampled to at most max_points points; buy and sell markers are
+    always sent in full.
+
     Parameters:
-        stock_df (DataFrame): DataFrame containing stock data.
+        stock_df (DataFrame): DataFrame containing stock close prices indexed by date.
         investment_dates (DataFrame): DataFrame with the start and end dates for each stock.
-        investment_data (DataFrame): DataFrame with investment transaction data.
+        investment_data (TransactionFrame): Indexed investment transaction data.
         company_data (DataFrame): DataFrame with company data.
         show_trend_after_last_buy (bool, optional): Whether to extend the trend line after the last buy action.
         show_trend_after_last_sell (bool, optional): Whether to extend the trend line after the last sell action.
         ma_period (int, optional): The period over which to calculate the moving average.
+        max_points (int, optional): The maximum number of points of each line.
 
     Returns:
         go.Figure: A Plotly graph object figure containing the stock overview chart.
     """
-    stock_df.index = pd.to_datetime(stock_df.index, format='%d/%m/%Y')  
-    extended_date = pd.to_datetime('11/03/2024')
-
     tickers = company_data['Ticker'].unique()
 
     continuous_color_scale = px.colors.sequential.Plasma
@@ -31,52 +186,32 @@ def create_stock_overview_figure(stock_df, investment_dates, investment_data, co
     n_tickers = len(tickers)
     interval = 1 / max(n_tickers - 1, 1)
 
-    sorted_tickers = sorted(tickers, key=lambda x: company_data[company_data['Ticker'] == x].index[0], reverse=True)
-
     # Create a color map for each ticker 
     ticker_color_map = {
         ticker: px.colors.sample_colorscale(continuous_color_scale, i * interval)[0]
         for i, ticker in enumerate(tickers)
     }
     
+    lines = iter(get_overview_lines(stock_df, investment_dates, company_data, show_trend_after_last_buy, show_trend_after_last_sell, ma_period))
+
     fig = go.Figure()
-    for ticker in sorted_tickers:
-        investment_rows = investment_dates[investment_dates['Ticker'] == ticker]
-        for _, row in investment_rows.iterrows():
-            ticker = row['Ticker']
-            start_date = pd.to_datetime(row['Start Date'], format='%d/%m/%Y')
-            end_date = pd.to_datetime(row['End Date'], format='%d/%m/%Y')
-            last_action = row.get('Last Action', None)
-            
-            if (show_trend_after_last_buy and last_action == 'Buy') or (show_trend_after_last_sell and last_action == 'Sell'):
-                end_date = extended_date
-
-            if ticker in stock_df.columns:
-                filtered_df = stock_df.loc[start_date:end_date, ticker]
-                
-                ma = filtered_df.rolling(window=ma_period, min_periods=1).mean()
-
-                legendgroup = f"group_{ticker}"
-                
-                fig.add_trace(go.Scatter(x=ma.index, y=ma, mode='lines', name=f'{ticker}', line=dict(color=ticker_color_map[ticker]), legendgroup=legendgroup))
-
-                buy_transactions = investment_data[(investment_data['Ticker'] == ticker) & (investment_data['Action'].str.contains('buy', case=False))]
-            sell_transactions = investment_data[(investment_data['Ticker'] == ticker) & (investment_data['Action'].str.contains('sell', case=False))]
-
-            # Plot buy and sell markers with transaction price in the investment transaction dataset
-            for _, buy in buy_transactions.iterrows():
-                fig.add_trace(go.Scatter(
-                    x=[buy['Transaction Date']], y=[buy['Price / share']],
-                    mode='markers', name=f'{ticker} Buy', marker_symbol='triangle-up',
-                    marker_color='green', marker_size=7, showlegend=False, legendgroup=legendgroup
-                ))
-
-            for _, sell in sell_transactions.iterrows():
-                fig.add_trace(go.Scatter(
-                    x=[sell['Transaction Date']], y=[sell['Price / share']],
-                    mode='markers', name=f'{ticker} Sell', marker_symbol='triangle-down',
-                    marker_color='red', marker_size=7, showlegend=False, legendgroup=legendgroup
-                ))
+    for ticker, kind in get_overview_traces(stock_df, investment_dates, investment_data, company_data):
+        legendgroup = f"group_{ticker}"
+        if kind == 'line':
+            _, ma = next(lines)
+            ma = downsample_series(ma, max_points)
+            fig.add_trace(go.Scatter(x=ma.index, y=ma, mode='lines', name=f'{ticker}', line=dict(color=ticker_color_map[ticker]), legendgroup=legendgroup))
+            continue
+
+        # Plot buy and sell markers with transaction price in the investment transaction dataset, one trace per side
+        side, (symbol, color) = kind, MARKER_STYLES[kind]
+        side_transactions = investment_data.select(ticker=ticker, action_type=side.lower())
+        fig.add_trace(go.Scatter(
+            x=side_transactions['Timestamp'], y=side_transactions['Price / share'],
+            hovertext=side_transactions['No. of shares'].astype(str) + ' shares',
+            mode='markers', name=f'{ticker} {side}', marker_symbol=symbol,
+            marker_color=color, marker_size=7, showlegend=False, legendgroup=legendgroup
+        ))
 
     fig.update_layout(
         title='Stock Investment Overview',
@@ -105,7 +240,7 @@ def get_overview_layout(investment_dates, df, company_data, stock_df):
         investment_dates (DataFrame): DataFrame with the start and end dates for each stock.
         df (DataFrame): DataFrame containing transaction data.
         company_data (DataFrame): DataFrame with company data.
-        stock_df (DataFrame): DataFrame containing stock data.
+        stock_df (DataFrame): DataFrame containing stock close prices indexed by date.
 
     Returns:
         html.Div: A Dash HTML component containing the layout for the stock overview.
@@ -114,7 +249,7 @@ def get_overview_layout(investment_dates, df, company_data, stock_df):
     
     layout = html.Div([
         html.H2('Stock Prices Overview'),
-        dcc.Graph(id='stock-overview-chart', figure=stock_overview_fig)
+        dcc.Graph(id='stock-overview-chart', figure=compact_figure(stock_overview_fig, float32=FLOAT32_PRICES))
     ])
     return layout
 
@@ -0,0 +1,76 @@
+from dash import dcc, html
+import plotly.graph_objs as go
+from data.dataManage import load_fx_rates
+from data.portfolioAccounting import stock_splits
+from data.valuation import portfolio_valuation, ALL_ACCOUNTS
+from components.figureCache import memoize_figure
+
+# Names of the broker accounts, by account number
+ACCOUNT_NAMES = {2131: 'INV', 2129: 'ISA'}
+
+
+def account_label(account):
+    """
+    Parameters:
+        account (int or str): An account number, or ALL_ACCOUNTS.
+
+    Returns:
+        str: The label of the account, such as '2131 INV'.
+    """
+    if account == ALL_ACCOUNTS:
+        return 'All accounts'
+    name = ACCOUNT_NAMES.get(account)
+    return f'{account} {name}' if name else str(account)
+
+
+@memoize_figure
+def create_portfolio_value_figure(transactions, close_df, company_data, account=ALL_ACCOUNTS):
+    """
+    Creates a chart of the daily value of an account against the money put into it.
+
+    Parameters:
+        transactions (DataFrame): The transactions, as returned by load_investment_data.
+        close_df (DataFrame): Close prices indexed by date with one column per ticker.
+        company_data (DataFrame): The company data, whose notes describe the stock splits.
+        account (int or str, optional): The account number, or ALL_ACCOUNTS for their sum.
+
+    Returns:
+        go.Figure: Plotly graph object figure with the net asset value, holdings and net contributions.
+    """
+    valuation = portfolio_valuation(transactions, close_df, stock_splits(company_data), load_fx_rates())
+    if account not in valuation:
+        return go.Figure()
+    daily = valuation[account]
+
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(x=daily.index, y=daily['Net Asset Value'], mode='lines', name='Net Asset Value',
+                             fill='tozeroy', line=dict(color='royalblue')))
+    fig.add_trace(go.Scatter(x=daily.index, y=daily['Holdings'], mode='lines', name='Holdings',
+                             line=dict(color='seagreen', width=1)))
+    fig.add_trace(go.Scatter(x=daily.index, y=daily['Net Contributions'], mode='lines', name='Net Contributions',
+                             line=dict(color='grey', dash='dash')))
+    fig.update_layout(title=f'Portfolio Value: {account_label(account)}', xaxis_title='Date', yaxis_title='Value (GBP)',
+                      yaxis=dict(tickprefix='£'), hovermode='x unified')
+    return fig
+
+
+def get_portfolio_layout(transactions):
+    """
+    Generates the layout of the portfolio value view with an account selector.
+
+    Parameters:
+        transactions (DataFrame): The transactions, whose accounts can be selected.
+
+    Returns:
+        html.Div: A Dash HTML component containing the layout of the portfolio value view.
+    """
+    accounts = sorted(transactions['Account Number'].unique().tolist())
+    return html.Div([
+        dcc.Dropdown(
+            id='portfolio-account',
+            options=[{'label': account_label(account), 'value': account} for account in [ALL_ACCOUNTS] + accounts],
+            value=ALL_ACCOUNTS,
+            clearable=False,
+        ),
+        dcc.Graph(id='portfolio-value-chart', style={'height': '600px'})
+    ])
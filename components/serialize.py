@@ -0,0 +1,193 @@
+import base64
+import datetime
+import os
+import re
+
+import numpy as np
+import pandas as pd
+from dash import dcc
+
+# Oldest plotly.js release that decodes typed arrays ({'dtype', 'bdata'}) in figure data
+_TYPED_ARRAY_PLOTLYJS = (2, 28, 0)
+
+# Typed array dtypes understood by plotly.js, by numpy dtype
+_TYPED_DTYPES = {
+    np.dtype('int8'): 'i1', np.dtype('uint8'): 'u1', np.dtype('int16'): 'i2', np.dtype('uint16'): 'u2',
+    np.dtype('int32'): 'i4', np.dtype('uint32'): 'u4', np.dtype('float32'): 'f4', np.dtype('float64'): 'f8',
+}
+
+# Trace attributes whose dates are placed on an axis and may be sent as epoch milliseconds
+_AXIS_KEYS = {'x': 'xaxis', 'y': 'yaxis'}
+
+
+# version of the plotly.js bundle dcc.Graph renders with
+def bundled_plotlyjs_version():
+    """
+    Reads the version of the plotly.js bundle shipped with dash.
+
+    Returns:
+        tuple: (major, minor, patch), or None if it cannot be determined.
+    """
+    try:
+        with open(os.path.join(os.path.dirname(dcc.__file__), 'plotly.min.js'), encoding='utf-8') as file:
+            header = file.read(256)
+    except OSError:
+        return None
+    match = re.search(r'plotly\.js v(\d+)\.(\d+)\.(\d+)', header)
+    return tuple(int(part) for part in match.groups()) if match else None
+
+
+def _typed_arrays_setting(value):
+    if value == 'auto':
+        version = bundled_plotlyjs_version()
+        return version is not None and version >= _TYPED_ARRAY_PLOTLYJS
+    return value == '1'
+
+
+# Whether numeric arrays are sent as base64 typed arrays: '1', '0' or 'auto' to enable them when the
+# bundled plotly.js decodes them, and whether price traces are downcast to float32, through the environment
+TYPED_ARRAYS = _typed_arrays_setting(os.environ.get('FINVIS_TYPED_ARRAYS', 'auto'))
+FLOAT32_PRICES = os.environ.get('FINVIS_FLOAT32_PRICES', '1') == '1'
+
+# Shorter arrays stay JSON numbers, which are smaller than a base64 buffer and its envelope
+TYPED_ARRAY_MIN_LENGTH = 64
+
+
+def encode_typed_array(values, float32=False):
+    """
+    Encodes a numeric array as a plotly.js typed array.
+
+    64-bit integers are narrowed to 32 bits when their range allows it and sent as float64 otherwise.
+
+    Parameters:
+        values (ndarray): A one or two dimensional numeric array.
+        float32 (bool, optional): Whether to downcast floats to float32.
+
+    Returns:
+        dict: {'dtype', 'bdata'} plus 'shape' for two dimensional arrays.
+    """
+    if values.dtype.kind == 'f':
+        values = values.astype(np.float32 if float32 else np.float64, copy=False)
+    elif values.dtype.kind in 'iu' and values.dtype not in _TYPED_DTYPES:
+        fits = values.size == 0 or (values.min() >= np.iinfo(np.int32).min and values.max() <= np.iinfo(np.int32).max)
+        values = values.astype(np.int32 if fits else np.float64)
+    # plotly.js reads little endian buffers
+    values = np.ascontiguousarray(values, dtype=values.dtype.newbyteorder('<'))
+    encoded = {'dtype': _TYPED_DTYPES[values.dtype.newbyteorder('=')], 'bdata': base64.b64encode(values.tobytes()).decode('ascii')}
+    if values.ndim > 1:
+        encoded['shape'] = ', '.join(str(size) for size in values.shape)
+    return encoded
+
+
+def _as_dates(values):
+    if isinstance(values, pd.DatetimeIndex):
+        return values
+    if values.dtype.kind == 'M':
+        return pd.DatetimeIndex(values)
+    # plotly stores dates as object arrays of Timestamps; checking the first element avoids
+    # scanning arrays of other objects
+    if values.dtype == object and len(values) and isinstance(values[0], (datetime.date, np.datetime64)):
+        try:
+            return pd.DatetimeIndex(values)
+        except (TypeError, ValueError):
+            return None
+    return None
+
+
+def _format_dates(dates):
+    # day precision is enough, and shorter, when every date is at midnight
+    unit = 'D' if (dates.asi8[~dates.isna()] % (86400 * 10 ** 9) == 0).all() else 's'
+    strings = np.datetime_as_string(dates.to_numpy(), unit=unit).astype(object)
+    strings[dates.isna()] = None
+    return strings.tolist()
+
+
+def compact_array(values, float32=False, typed_arrays=None, dates_as_numbers=False):
+    """
+    Converts an array of a figure to a form the JSON encoder writes without cleaning it first.
+
+    Numeric arrays of at least TYPED_ARRAY_MIN_LENGTH values become typed arrays when enabled and
+    contiguous numpy arrays otherwise, which orjson writes natively; dates become ISO strings, or
+    epoch milliseconds when dates_as_numbers is set and typed arrays are enabled. Other arrays
+    become lists.
+
+    Parameters:
+        values (ndarray, Index or Series): The array.
+        float32 (bool, optional): Whether to downcast floats to float32 in typed arrays.
+        typed_arrays (bool, optional): Whether to emit typed arrays, TYPED_ARRAYS by default.
+        dates_as_numbers (bool, optional): Whether dates may be sent as epoch milliseconds.
+
+    Returns:
+        dict, ndarray or list: The converted array.
+    """
+    typed_arrays = TYPED_ARRAYS if typed_arrays is None else typed_arrays
+    if isinstance(values, (pd.Series, pd.Index)) and not isinstance(values, pd.DatetimeIndex):
+        values = values.to_numpy()
+    if not isinstance(values, (np.ndarray, pd.DatetimeIndex)):
+        return values
+    if values.dtype.kind in 'iuf':
+        if typed_arrays and len(values) >= TYPED_ARRAY_MIN_LENGTH:
+            return encode_typed_array(values, float32)
+        return np.ascontiguousarray(values)
+    dates = _as_dates(values)
+    if dates is not None:
+        if typed_arrays and dates_as_numbers and len(dates) >= TYPED_ARRAY_MIN_LENGTH and not dates.hasnans:
+            return encode_typed_array(dates.asi8 // 10 ** 6 * 1.0)
+        return _format_dates(dates)
+    return values.tolist() if isinstance(values, np.ndarray) else values
+
+
+def _compact_value(value, float32, typed_arrays):
+    if isinstance(value, dict):
+        return {key: _compact_value(item, float32, typed_arrays) for key, item in value.items()}
+    if isinstance(value, (np.ndarray, pd.Series, pd.Index)):
+        return compact_array(value, float32, typed_arrays)
+    if isinstance(value, (list, tuple)) and value and isinstance(value[0], dict):
+        return [_compact_value(item, float32, typed_arrays) for item in value]
+    return value
+
+
+def _compact_trace(trace, layout, float32, typed_arrays):
+    compact = {}
+    for key, value in trace.items():
+        if key in _AXIS_KEYS and isinstance(value, (np.ndarray, pd.Series, pd.Index)):
+            compact[key] = compact_array(value, float32, typed_arrays, dates_as_numbers=True)
+            if isinstance(compact[key], dict) and value.dtype.kind not in 'iuf':
+                # numbers on an axis are only read as epoch milliseconds when it is a date axis
+                axis = _AXIS_KEYS[key] + trace.get(_AXIS_KEYS[key], key)[1:]
+                layout[axis] = {'type': 'date', **layout.get(axis, {})}
+        else:
+            compact[key] = _compact_value(value, float32, typed_arrays)
+    return compact
+
+
+# figure as a plain dict with its arrays in their most compact serializable form
+def compact_figure(figure, float32=False, typed_arrays=None):
+    """
+    Converts a figure to a dict that serializes fast and small.
+
+    Dash serializes callback outputs with orjson when it is installed, but falls back to a slow
+    recursive cleaning pass, after a deep copy, as soon as a figure holds dates or object arrays.
+    The returned dict only holds values orjson writes directly, and with typed arrays enabled its
+    numeric and date arrays are sent as base64 buffers. The figure itself is not modified.
+
+    Parameters:
+        figure (go.Figure or dict): The figure.
+        float32 (bool, optional): Whether to downcast floats to float32, for price traces.
+        typed_arrays (bool, optional): Whether to emit typed arrays, TYPED_ARRAYS by default.
+
+    Returns:
+        dict: The figure with 'data' and 'layout'.
+    """
+    if isinstance(figure, dict):
+        data, layout = figure.get('data', []), dict(figure.get('layout', {}))
+        frames = figure.get('frames')
+    else:
+        # the figure's own trace dicts are read without the deep copy of to_plotly_json
+        data, layout = figure._data, figure.layout.to_plotly_json()
+        frames = None
+    compact = {'data': [_compact_trace(trace, layout, float32, typed_arrays) for trace in data],
+               'layout': _compact_value(layout, float32, typed_arrays)}
+    if frames:
+        compact['frames'] = frames
+    return compact
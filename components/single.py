@@ -1,39 +1,50 @@
 from dash import dcc, html
 import plotly.graph_objs as go
-from data.dataManage import load_ticker_stock_data, get_all_tickers, load_stock_close_single
-import pandas as pd
+from data.dataManage import load_ticker_stock_data, get_all_tickers, load_price_panel, load_stock_close_data, load_fx_rates
+from data.fx import ticker_currencies
+from data.pricePanel import WIDE_FIELD
+from data.movingAverage import moving_average
+from components.figureCache import memoize_figure
 
 
-def create_single_stock_figure(ticker, investment_dates, investment_data, ma_periods =[], chart_style='line'):
+@memoize_figure
+def create_single_stock_figure(ticker, investment_dates, investment_data, ma_periods =[], chart_style='line', currency=None):
     """
     Creates a stock figure for a single ticker with specified chart style and moving averages.
 
+    Prices and trades are shown in the currency the ticker is quoted in, or converted to currency:
+    closes with the rate of their date and trades with the rate they were made at.
+
     Parameters:
         ticker (str): The stock ticker.
         investment_dates (DataFrame): DataFrame containing start and end dates for each ticker.
-        investment_data (DataFrame): DataFrame containing transaction data.
+        investment_data (TransactionFrame): Indexed transaction data.
         ma_periods (list, optional): List of integers representing moving average periods.
         chart_style (str, optional): The style of the chart ('line', 'candle', 'ohlc', 'area').
+        currency (str, optional): The currency to show prices in, the quoted one by default.
 
     Returns:
         go.Figure: Plotly graph object figure containing the stock chart with transactions and moving averages.
     """
-    df = load_ticker_stock_data(ticker)
-    dfclose = load_stock_close_single()
-    
     # Find the start and end dates for the ticker
     start_date, end_date = investment_dates[investment_dates['Ticker'] == ticker][['Start Date', 'End Date']].iloc[0]
 
-    # Filter the stock data and investment data based on the dates
-    df_filtered = df[(df['Date'] >= start_date) & (df['Date'] <= end_date)]
-    df_filtered_close = dfclose[(dfclose['Date'] >= start_date) & (dfclose['Date'] <= end_date)]
-    transactions = investment_data[(investment_data['Ticker'] == ticker) & (investment_data['Action'].str.contains('buy|sell', case=False))]
+    # The price panel slices the stock data to the dates with binary searches
+    df_filtered = load_ticker_stock_data(ticker, start_date, end_date)
+    close = load_price_panel().series(ticker, WIDE_FIELD, start_date, end_date)
+    transactions = investment_data.select(ticker=ticker, action_type=['buy', 'sell'])
+    if currency is not None:
+        rates = load_fx_rates()
+        close = get_close_data(investment_data, currency).loc[close.index, ticker]
+        factors = rates.factors(df_filtered['Date'], [ticker_currencies(transactions).get(ticker, currency)], currency)[:, 0]
+        df_filtered = df_filtered.assign(**{field: df_filtered[field] * factors for field in ['Open', 'High', 'Low', 'Close']})
+        transactions = rates.convert_trades(transactions, target=currency)
 
     fig = go.Figure()
 
     if chart_style == 'line':
     # Add the main stock line
-        fig.add_trace(go.Scatter(x=df_filtered_close['Date'], y=df_filtered_close[ticker], mode='lines', name=ticker))
+        fig.add_trace(go.Scatter(x=close.index, y=close, mode='lines', name=ticker))
 
     elif chart_style == 'candle':
         fig.add_trace(go.Candlestick(x=df_filtered['Date'],
@@ -48,20 +59,21 @@ def create_single_stock_figure(ticker, investment_dates, investment_data, ma_per
     elif chart_style == 'area':
         fig.add_trace(go.Scatter(x=df_filtered['Date'], y=df_filtered['Close'], fill='tozeroy', name=ticker))
     
-    # Add buy and sell points
-    for _, transaction in transactions.iterrows():
-        date_time = pd.to_datetime(f"{transaction['Transaction Date']} {transaction['Time']}")
-        price = transaction['Price / share']
-        action = 'Buy' if 'buy' in transaction['Action'].lower() else 'Sell'
-        color = 'green' if action == 'Buy' else 'red'
-        fig.add_trace(go.Scatter(x=[date_time], y=[price], mode='markers', name=f'{action}',
-                                 marker=dict(color=color, size=10, symbol='circle'), showlegend=False))
+    # Add buy and sell points, one trace per side
+    date_times = transactions['Timestamp']
+    is_buy = transactions['Action Type'] == 'buy'
+    hover_text = transactions['Action'].astype(str) + ': ' + transactions['No. of shares'].astype(str) + ' shares'
+    for action, mask, color in (('Buy', is_buy, 'green'), ('Sell', ~is_buy, 'red')):
+        if mask.any():
+            fig.add_trace(go.Scatter(x=date_times[mask], y=transactions.loc[mask, 'Price / share'], mode='markers', name=action,
+                                     hovertext=hover_text[mask], marker=dict(color=color, size=10, symbol='circle'), showlegend=False))
     
     for period in ma_periods:
-        ma = calculate_moving_average(ticker, df_filtered_close, period)
-        fig.add_trace(go.Scatter(x=df_filtered_close['Date'], y=ma, mode='lines', name=f'MA {period} days'))
+        ma = calculate_moving_average(ticker, start_date, end_date, period, get_close_data(investment_data, currency))
+        fig.add_trace(go.Scatter(x=ma.index, y=ma, mode='lines', name=f'MA {period} days'))
     
-    fig.update_layout(title=f'{ticker} Stock Data with Transactions', xaxis_title='Date', yaxis_title='Price',
+    fig.update_layout(title=f'{ticker} Stock Data with Transactions', xaxis_title='Date',
+                      yaxis_title=f'Price ({currency})' if currency else 'Price',
                       xaxis=dict(
                         rangeselector=dict(
                             buttons=list([
@@ -80,19 +92,42 @@ def create_single_stock_figure(ticker, investment_dates, investment_data, ma_per
     return fig
 
 
-def calculate_moving_average(ticker, df, period):
+# close prices of every ticker, converted once per currency and kept by the rate table
+def get_close_data(investment_data, currency=None):
+    """
+    Returns the close price panel, in the quoted currency of each ticker or converted to one currency.
+
+    Parameters:
+        investment_data (DataFrame): The transactions, which tell the currency of each ticker.
+        currency (str, optional): The currency to convert to, the quoted ones by default.
+
+    Returns:
+        DataFrame: Close prices indexed by date with one column per ticker.
+    """
+    if currency is None:
+        return load_stock_close_data()
+    return load_fx_rates().convert_panel(load_stock_close_data(), ticker_currencies(investment_data), currency)
+
+
+def calculate_moving_average(ticker, start_date, end_date, period, close_df=None):
     """
-    Calculates the moving average for the given period.
+    Calculates the moving average for the given period between two dates.
+
+    The average is sliced from the cached moving averages of the whole close price panel, so
+    prices before start_date are part of the first windows.
 
     Parameters:
         ticker (str): The stock ticker for which the moving average is calculated.
-        df (DataFrame): DataFrame containing close price data.
+        start_date (Timestamp): The first date to return.
+        end_date (Timestamp): The last date to return.
         period (int): The number of days over which to calculate the moving average.
+        close_df (DataFrame, optional): The close price panel, load_stock_close_data by default.
 
     Returns:
-        Series: A pandas Series representing the moving average.
+        Series: A pandas Series representing the moving average, indexed by date.
     """
-    return df[ticker].rolling(window=period, min_periods=1).mean()
+    close_df = load_stock_close_data() if close_df is None else close_df
+    return moving_average(close_df, period).loc[start_date:end_date, ticker]
 
 
 def get_single_layout():
@@ -121,6 +156,14 @@ def get_single_layout():
             value='line',  # Default value is 'line'
             placeholder="Select chart style",
         ),
+        dcc.RadioItems(  # Currency of the prices
+            id='single-currency',
+            options=[{'label': ' Quoted currency', 'value': 'quoted'}, {'label': ' GBP', 'value': 'GBP'}],
+            value='quoted',
+            inline=True,
+            inputStyle={'marginLeft': '10px'},
+        ),
+        html.Div(id='single-progress'),
         dcc.Graph(id='single-stock-graph'),
         ma_controls
     ])
@@ -0,0 +1,149 @@
+import json
+import logging
+import multiprocessing
+import os
+import threading
+import time
+
+from plotly.io.json import to_json_plotly
+
+from components.figureCache import figure_cache, figure_key
+from components.serialize import compact_figure
+
+# Time budget of a warm-up in seconds (0 disables it) and the number of rendering processes,
+# overridable through the environment
+WARMUP_SECONDS = float(os.environ.get('FINVIS_WARMUP_SECONDS', 30))
+WARMUP_PROCESSES = int(os.environ.get('FINVIS_WARMUP_PROCESSES', os.cpu_count() or 1))
+
+# Number of worker processes of the server sharing the machine, set by serve.py
+SERVER_WORKERS_VARIABLE = 'FINVIS_SERVER_WORKERS'
+
+# Chart styles of the single stock view and moving average windows of the overview that are pre-rendered
+WARMUP_CHART_STYLES = os.environ.get('FINVIS_WARMUP_STYLES', 'line,candle').split(',')
+WARMUP_MA_PERIODS = [int(period) for period in os.environ.get('FINVIS_WARMUP_MA', '10,20,50').split(',')]
+
+# Tasks of the running warm-up, inherited by the forked rendering processes so the frames they
+# refer to are never pickled
+_tasks = []
+_warmup_lock = threading.Lock()
+
+logger = logging.getLogger(__name__)
+
+
+def _render(index):
+    builder, args, kwargs = _tasks[index]
+    try:
+        figure = getattr(builder, '__wrapped__', builder)(*args, **kwargs)
+        return index, to_json_plotly(compact_figure(figure))
+    except Exception:
+        # a failed figure is left to be built on request, the warm-up goes on with the others
+        logger.exception('Warm-up: %s%r failed', builder.__name__, args[:1])
+        return index, None
+
+
+def log_progress(done, total, elapsed):
+    """
+    Logs the progress of a warm-up every tenth of the tasks.
+
+    Parameters:
+        done (int): The number of tasks finished.
+        total (int): The number of tasks.
+        elapsed (float): The seconds since the warm-up started.
+    """
+    if done == total or done % max(total // 10, 1) == 0:
+        logger.info('Warm-up: %d/%d figures in %.1fs', done, total, elapsed)
+
+
+def _results(tasks, pending, processes, deadline):
+    # fork lets the workers share the frames of the tasks; without it figures are rendered here
+    if processes > 1 and 'fork' in multiprocessing.get_all_start_methods():
+        pool = multiprocessing.get_context('fork').Pool(processes)
+        try:
+            results = pool.imap_unordered(_render, pending)
+            for _ in pending:
+                yield results.next(timeout=max(deadline - time.monotonic(), 0))
+        except multiprocessing.TimeoutError:
+            return
+        finally:
+            pool.terminate()
+    else:
+        for index in pending:
+            if time.monotonic() >= deadline:
+                return
+            yield _render(index)
+
+
+# pre-render figures into the shared figure cache on a process pool
+def warm_figure_cache(tasks, budget=WARMUP_SECONDS, processes=WARMUP_PROCESSES, progress=log_progress):
+    """
+    Renders figures into the figure cache before they are requested.
+
+    The figures are built by forked processes, which inherit the loaded data, and sent back as
+    the JSON of their compact form. Tasks whose figure is already cached are skipped and at most
+    as many figures as the cache holds are rendered, so the warm-up never evicts its own entries.
+    Rendering stops when the time budget runs out; the figures finished by then stay cached. A
+    builder that raises is logged and its figure skipped.
+
+    Parameters:
+        tasks (list): (builder, args, kwargs) of memoized figure builder calls, most requested first.
+        budget (float, optional): The time budget in seconds.
+        processes (int, optional): The number of rendering processes, 1 renders in this process.
+        progress (callable, optional): Called with (done, total, elapsed seconds) after each figure.
+
+    Returns:
+        dict: The number of tasks, of figures rendered, of figures whose builder raised and of
+              figures already cached, the elapsed seconds and whether every figure was rendered
+              within the budget.
+    """
+    start = time.monotonic()
+    keys = [figure_key(getattr(builder, '__wrapped__', builder), args, kwargs) for builder, args, kwargs in tasks]
+    pending, seen = [], set()
+    for index, (key, _) in enumerate(keys):
+        if key is not None and key not in seen and not figure_cache.contains(key):
+            pending.append(index)
+        seen.add(key)
+    cached = len(tasks) - len(pending)
+    pending = pending[:max(figure_cache.max_entries - cached, 0)]
+    rendered = failed = 0
+    if budget > 0 and pending:
+        with _warmup_lock:
+            _tasks[:] = tasks
+            try:
+                for index, figure in _results(tasks, pending, processes, start + budget):
+                    if figure is None:
+                        failed += 1
+                        continue
+                    key, frames = keys[index]
+                    figure_cache.put(key, frames, figure if figure_cache.store_json else json.loads(figure))
+                    rendered += 1
+                    if progress is not None:
+                        progress(rendered, len(pending), time.monotonic() - start)
+            finally:
+                _tasks.clear()
+    return {'tasks': len(tasks), 'rendered': rendered, 'failed': failed, 'cached': cached,
+            'seconds': time.monotonic() - start, 'complete': rendered == len(pending)}
+
+
+def worker_processes():
+    """
+    Returns:
+        int: The rendering processes of a warm-up run by a server worker: WARMUP_PROCESSES shared
+             among the workers of the server, at least 1.
+    """
+    return max(WARMUP_PROCESSES // int(os.environ.get(SERVER_WORKERS_VARIABLE, 1)), 1)
+
+
+def warm_in_background(tasks, **kwargs):
+    """
+    Runs warm_figure_cache in a daemon thread.
+
+    Parameters:
+        tasks (list): The tasks, as for warm_figure_cache.
+        **kwargs: Other arguments of warm_figure_cache.
+
+    Returns:
+        Thread: The started thread.
+    """
+    thread = threading.Thread(target=warm_figure_cache, args=(tasks,), kwargs=kwargs, daemon=True, name='figure-warmup')
+    thread.start()
+    return thread
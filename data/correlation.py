@@ -0,0 +1,111 @@
+import numpy as np
+import pandas as pd
+
+# Fewest overlapping returns a pair of tickers needs for its correlation to be shown
+MIN_OVERLAP = 10
+
+
+# prices of every column relative to its first price from a date on
+def rebase(close_df, base_date=None, level=100.0):
+    """
+    Rebases every column of a close price panel to a common level at a date, so prices of
+    different magnitudes can be compared.
+
+    Each column is divided by its first price on or after base_date, which is the price at
+    base_date unless the ticker only started trading later. Columns without a positive price from
+    base_date on are NaN.
+
+    Parameters:
+        close_df (DataFrame): Close prices indexed by date with one column per ticker.
+        base_date (Timestamp, optional): The date every column is rebased at, the first date by default.
+        level (float, optional): The value of every column at its base price.
+
+    Returns:
+        DataFrame: The rebased prices from base_date on, empty when base_date is after the last date.
+    """
+    start = 0 if base_date is None else close_df.index.searchsorted(pd.Timestamp(base_date))
+    values = close_df.to_numpy(dtype=np.float64)[start:]
+    if not len(values):
+        # base_date is after the last date: there is nothing to rebase
+        return close_df.iloc[start:].astype(np.float64)
+    # a missing or zero price cannot be a base; NaN compares False
+    valid = values > 0
+    # argmax finds the first True of each column, columns without any are masked below
+    first = valid.argmax(axis=0)
+    base = values[first, np.arange(values.shape[1])]
+    base[~valid.any(axis=0)] = np.nan
+    with np.errstate(invalid='ignore', divide='ignore'):
+        rebased = values / base * level
+    return pd.DataFrame(rebased, index=close_df.index[start:], columns=close_df.columns)
+
+
+def daily_returns(values):
+    """
+    Computes the simple returns between consecutive rows of a price matrix.
+
+    Parameters:
+        values (ndarray): A (dates, tickers) price matrix.
+
+    Returns:
+        ndarray: The (dates - 1, tickers) returns, NaN where either price is missing.
+    """
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return values[1:] / values[:-1] - 1.0
+
+
+# pairwise complete correlation of every pair of columns, computed with matrix products
+def correlation_matrix(values, min_periods=MIN_OVERLAP):
+    """
+    Computes the Pearson correlation of every pair of columns over the rows where both are present.
+
+    Matches DataFrame.corr(min_periods=min_periods), but instead of one pass per pair, the counts,
+    sums, sums of squares and cross products of all pairs are each read off one matrix product of
+    the zero-filled values and their presence mask.
+
+    Parameters:
+        values (ndarray): A (rows, columns) matrix, NaN or infinite where a value is missing.
+        min_periods (int, optional): The fewest shared rows a pair needs, NaN below it.
+
+    Returns:
+        ndarray: The (columns, columns) correlation matrix.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    valid = np.isfinite(values)
+    present = valid.astype(np.float64)
+    # centre each column on its mean first so the sums below do not cancel out
+    counts = present.sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = np.where(counts > 0, np.where(valid, values, 0.0).sum(axis=0) / counts, 0.0)
+    centred = np.where(valid, values - means, 0.0)
+
+    # entry [i, j] of each product only sums the rows where both column i and column j are present
+    pair_counts = present.T @ present
+    sums = centred.T @ present
+    squares = (centred * centred).T @ present
+    products = centred.T @ centred
+    with np.errstate(invalid='ignore', divide='ignore'):
+        covariances = products - sums * sums.T / pair_counts
+        variances = squares - sums * sums / pair_counts
+        correlations = covariances / np.sqrt(variances * variances.T)
+    correlations[pair_counts < max(min_periods, 2)] = np.nan
+    return np.clip(correlations, -1.0, 1.0, out=correlations)
+
+
+def rolling_correlation(close_df, window=None, end_date=None, min_periods=MIN_OVERLAP):
+    """
+    Correlates the daily returns of every ticker of a close price panel over a trailing window.
+
+    Parameters:
+        close_df (DataFrame): Close prices indexed by date with one column per ticker.
+        window (int, optional): The number of trading days in the window, every day up to end_date by default.
+        end_date (Timestamp, optional): The last date of the window, the last date of the panel by default.
+        min_periods (int, optional): The fewest shared returns a pair needs, NaN below it.
+
+    Returns:
+        DataFrame: The correlation of every pair of tickers, labelled by ticker on both axes.
+    """
+    stop = len(close_df) if end_date is None else close_df.index.searchsorted(pd.Timestamp(end_date), side='right')
+    # a window of n returns needs n + 1 prices
+    start = 0 if not window else max(stop - int(window) - 1, 0)
+    returns = daily_returns(close_df.to_numpy(dtype=np.float64)[start:stop])
+    return pd.DataFrame(correlation_matrix(returns, min_periods), index=close_df.columns, columns=close_df.columns)
@@ -1,40 +1,82 @@
+import os
 import pandas as pd
+from data.pricePanel import WIDE_FIELD, build_price_panel, price_source_paths
+from data.fx import FX_RATES_FILE, build_rate_table
+from data.loaderCache import cached_loader
+from data.transactionIndex import TransactionFrame, index_transactions
+from data.schema import (INVESTMENT_DATE_COLUMNS, INVESTMENT_DATE_DTYPES, month_categories, parse_dates,
+                         price_frame, read_transactions, read_typed_csv)
+
+# Directory holding the csv files and the compiled price store, overridable through the environment
+DATA_DIR = os.environ.get('FINVIS_DATA_DIR', 'data')
 
 # load the investment data
 def load_investment_data():
     """
-    Load investment transactions from a CSV file and process dates.
+    Load investment transactions from a CSV file with the types of the transaction schema and process dates.
 
     Returns:
-        DataFrame: A pandas DataFrame with the investment transactions, including
-                   parsed and formatted transaction dates and a new 'Month_Year' column.
+        TransactionFrame: A DataFrame with the investment transactions, including parsed transaction
+                          dates, a categorical 'Month_Year' column, a 'Timestamp' column, the normalized
+                          'Action Type' and row partitions by ticker, account and action type.
+    """
+
+    df = read_transactions(os.path.join(DATA_DIR, 'Investment Transaction.csv'))
+    return index_transactions(prepare_transactions(df))
+
+# parse the dates of raw ledger rows
+def prepare_transactions(df):
     """
+    Parses the transaction dates of raw ledger rows and adds the 'Month_Year' and 'Timestamp' columns.
 
-    df = pd.read_csv('data\Investment Transaction.csv')
-    df['Transaction Date'] = pd.to_datetime(df['Transaction Date'], dayfirst=True)
-    df['Month_Year'] = df['Transaction Date'].dt.strftime('%Y-%m')
+    Parameters:
+        df (DataFrame): Ledger rows as read from the transaction CSV.
+
+    Returns:
+        DataFrame: The same DataFrame with the parsed and derived date columns.
+    """
+
+    parse_dates(df, ['Transaction Date'])
+    df['Month_Year'] = month_categories(df['Transaction Date'])
+    df['Timestamp'] = transaction_timestamps(df)
     return df
 
+# combine the transaction date and time into timestamps
+def transaction_timestamps(df):
+    """
+    Builds the timestamp of each transaction from its date and time in one vectorized pass.
+
+    Parameters:
+        df (DataFrame): The DataFrame containing transaction data with parsed 'Transaction Date'
+                        and 'Time' in HH:MM:SS format.
+
+    Returns:
+        Series: A datetime Series aligned with the rows of df.
+    """
+
+    return df['Transaction Date'] + pd.to_timedelta(df['Time'].astype(str), errors='coerce').fillna(pd.Timedelta(0))
+
 # filter the buy and sell actions according to account number
 def filter_buysell_data(df, account_number, transaction_type):
     """
     Filters buy and sell actions based on account number and transaction type.
 
     Parameters:
-        df (DataFrame): The DataFrame containing transaction data.
-        account_number (int): The account number to filter by.
+        df (DataFrame): The DataFrame containing transaction data, or a monthly transaction cube.
+        account_number (int): The account number to filter by, or 9 for every account.
         transaction_type (str): 'buy' or 'sell' indicating the type of transaction.
 
     Returns:
         DataFrame: A filtered DataFrame based on the specified action and account number.
     """
     
-    action = 'Market buy' if transaction_type == 'buy' else 'Market sell'
-    if account_number == 9:
-        filtered_df = df[df['Action'].str.contains(action)]
-    else:
-        filtered_df = df[(df['Account Number'] == account_number) & (df['Action'].str.contains(action))]
-    return filtered_df
+    account = None if account_number == 9 else account_number
+    if isinstance(df, TransactionFrame):
+        return df.select(account=account, action_type=transaction_type)
+    mask = df['Action Type'] == transaction_type
+    if account is not None:
+        mask &= df['Account Number'] == account
+    return df[mask]
 
 # aggregate data by month and number of shares
 def aggregate_data_volume(filtered_df):
@@ -42,13 +84,13 @@ def aggregate_data_volume(filtered_df):
     Aggregates the volume of shares by month.
 
     Parameters:
-        filtered_df (DataFrame): The DataFrame filtered for specific transaction types.
+        filtered_df (DataFrame): The transactions or cube rows filtered for specific transaction types.
 
     Returns:
         Series: A pandas Series aggregating the number of shares per month.
     """
     
-    return filtered_df.groupby('Month_Year')['No. of shares'].sum()
+    return filtered_df.groupby('Month_Year', observed=True)['No. of shares'].sum()
 
 # aggregate data by month and Total value
 def aggregate_data_value(filtered_df):
@@ -56,13 +98,13 @@ def aggregate_data_value(filtered_df):
     Aggregates the total value of transactions by month.
 
     Parameters:
-        filtered_df (DataFrame): The DataFrame filtered for specific transaction types.
+        filtered_df (DataFrame): The transactions or cube rows filtered for specific transaction types.
 
     Returns:
         Series: A pandas Series aggregating the total value in GBP per month.
     """
     
-    return filtered_df.groupby('Month_Year')['Total (GBP)'].sum()
+    return filtered_df.groupby('Month_Year', observed=True)['Total (GBP)'].sum()
 
 # filter the dividend data
 def filter_dividend_data(df):
@@ -70,22 +112,15 @@ def filter_dividend_data(df):
     Filters out the dividend data from transaction data.
 
     Parameters:
-        df (DataFrame): The DataFrame containing transaction data.
+        df (DataFrame): The DataFrame containing transaction data, or a monthly transaction cube.
 
     Returns:
         DataFrame: A DataFrame containing only the rows with dividend transactions.
     """
     
-    dividend_types = [
-        "Dividend (Ordinary)",
-        "Dividend (Dividend)",
-        "Dividend (Demerger)",
-        "Dividend (Bonus)",
-        "Dividend (Ordinary manufactured payment)",
-        "Dividend (Dividends paid by us corporations)",
-        "Dividend (Dividends paid by foreign corporations)"
-    ]
-    return df[df['Action'].isin(dividend_types)]
+    if isinstance(df, TransactionFrame):
+        return df.select(action_type='dividend')
+    return df[df['Action Type'] == 'dividend']
 
 # Sum up 'Total (GBP)' for each 'Ticker' and 'Type of Dividend'
 def aggregate_dividend_data(filtered_df):
@@ -93,13 +128,13 @@ def aggregate_dividend_data(filtered_df):
     Summarizes the total GBP of dividends by ticker and type.
 
     Parameters:
-        filtered_df (DataFrame): The DataFrame containing filtered dividend transactions.
+        filtered_df (DataFrame): The filtered dividend transactions or cube rows.
 
     Returns:
         DataFrame: An aggregated DataFrame with total GBP summed up for each ticker and dividend type.
     """
 
-    aggregated_df = filtered_df.groupby(['Ticker', 'Action'])['Total (GBP)'].sum().unstack().fillna(0)
+    aggregated_df = filtered_df.groupby(['Ticker', 'Action'], observed=True)['Total (GBP)'].sum().unstack().fillna(0)
     return aggregated_df
 
 # Sum up 'Total (GBP)' for each 'Ticker' and 'Type of Dividend' by month
@@ -108,65 +143,77 @@ def aggregate_dividend_data_by_month(filtered_df):
     Aggregates dividend data by month, ticker, and type.
 
     Parameters:
-        filtered_df (DataFrame): The DataFrame containing filtered dividend transactions.
+        filtered_df (DataFrame): The filtered dividend transactions or cube rows.
 
     Returns:
         DataFrame: An aggregated DataFrame with total GBP summarized by month, ticker, and type.
     """
 
-    return filtered_df.groupby(['Month_Year', 'Ticker', 'Action'])['Total (GBP)'].sum().reset_index()
+    return filtered_df.groupby(['Month_Year', 'Ticker', 'Action'], observed=True)['Total (GBP)'].sum().reset_index()
 
-# Load stock close price data for single view
-def load_stock_close_single():
+# Load the prices of every ticker
+@cached_loader(lambda: price_source_paths(DATA_DIR))
+def load_price_panel():
     """
-    Loads daily closing prices of stocks.
+    Loads the price panel holding every field of every ticker, from the compiled price store when it is up to date.
 
     Returns:
-        DataFrame: A DataFrame with the daily stock close price data including a parsed Date column.
+        PricePanel: The prices indexed by ticker, date and field.
     """
-    df = pd.read_csv('data/API.csv', dtype={'Date': 'object'})
-    df['Date'] = pd.to_datetime(df['Date'], format='%d/%m/%Y', dayfirst=True)
-    
-    return df
+    return build_price_panel(DATA_DIR)
+
+# Load the exchange rates, rebuilt when the ledger or the rates csv changes
+@cached_loader(lambda: [os.path.join(DATA_DIR, 'Investment Transaction.csv'), os.path.join(DATA_DIR, FX_RATES_FILE)])
+def load_fx_rates():
+    """
+    Loads the exchange rates against GBP, from the rates csv when there is one and interpolated from
+    the exchange rates of the ledger otherwise.
+
+    Returns:
+        RateTable: The rates, which cache the price panels converted with them.
+    """
+    return build_rate_table(load_investment_data(), os.path.join(DATA_DIR, FX_RATES_FILE))
 
 # Load stock close price data
 def load_stock_close_data():
     """
-    Loads daily closing prices of stocks indexed by date.
+    Loads the daily unadjusted closing prices of stocks indexed by date, as a view of the price panel.
 
     Returns:
         DataFrame: A DataFrame with the daily stock close price data, indexed by date.
     """
-    df = pd.read_csv('data/API.csv', index_col='Date')
-    return df
+    return price_frame(load_price_panel().frame(WIDE_FIELD))
 
 # load time range of each stock
+@cached_loader(lambda: [os.path.join(DATA_DIR, 'stock_time.csv')])
 def load_investment_dates():
     """
     Loads the start and end dates for investments.
 
     Returns:
-        DataFrame: A DataFrame with the start and end dates of stocks parsed as date types.
+        DataFrame: A DataFrame with the start and end dates of stocks parsed as date types and
+                   categorical 'Ticker' and 'Last Action' columns.
     """
-    df = pd.read_csv('data/stock_time.csv', parse_dates=['Start Date','End Date'], dayfirst=True)
+    df = read_typed_csv(os.path.join(DATA_DIR, 'stock_time.csv'), INVESTMENT_DATE_DTYPES, INVESTMENT_DATE_COLUMNS)
     return df
 
 # load the data for each stock for single or compare view
-def load_ticker_stock_data(ticker):
+def load_ticker_stock_data(ticker, start_date=None, end_date=None):
     """
-    Loads stock data for a specific ticker.
+    Loads the stock data of a ticker from the price panel.
 
     Parameters:
         ticker (str): The stock ticker symbol.
+        start_date (Timestamp, optional): The first date to return.
+        end_date (Timestamp, optional): The last date to return.
 
     Returns:
         DataFrame: A DataFrame containing the stock data for the specified ticker, including parsed dates.
     """
-    file_path = f'data/{ticker}_stock_data.csv'
-    df = pd.read_csv(file_path, parse_dates=['Date'], dayfirst=True)
-    return df[['Date', 'Open', 'High', 'Low', 'Close', 'Volume']]
+    return price_frame(load_price_panel().ticker_frame(ticker, start_date, end_date))
 
 # get all the tickers in the user dataset
+@cached_loader(lambda: [os.path.join(DATA_DIR, 'stock_time.csv')])
 def get_all_tickers():
     """
     Retrieves all stock ticker symbols from the dataset.
@@ -174,7 +221,7 @@ def get_all_tickers():
     Returns:
         ndarray: An array of unique ticker symbols.
     """
-    df = pd.read_csv('data/stock_time.csv')
+    df = pd.read_csv(os.path.join(DATA_DIR, 'stock_time.csv'))
     return df['Ticker'].unique()
 
 def load_company_data():
@@ -184,6 +231,6 @@ def load_company_data():
     Returns:
         DataFrame: A DataFrame containing data about investment companies.
     """
-    df = pd.read_csv('data/Investment Company.csv')
+    df = pd.read_csv(os.path.join(DATA_DIR, 'Investment Company.csv'))
     return df
 
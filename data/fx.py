@@ -0,0 +1,230 @@
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from data.movingAverage import panel_version
+from data.schema import DATE_FORMAT
+
+# Currency every exchange rate is quoted against: the ledger records units of a currency per GBP
+BASE_CURRENCY = 'GBP'
+
+# csv of daily rates in the data directory, with a Date column and one column of units per GBP per
+# currency; without it the rates are interpolated from the ledger. Overridable through the environment
+FX_RATES_FILE = os.environ.get('FINVIS_FX_RATES_FILE', 'fx_rates.csv')
+
+# Number of converted price panels kept per rate table
+MAX_CONVERTED_PANELS = 8
+
+
+class RateTable:
+    """
+    Exchange rates of currencies against BASE_CURRENCY, interpolated in time between observations.
+
+    The rates of any dates are read off the observations with one np.interp per currency, linear
+    between two observations and flat before the first and after the last. Price panels converted
+    to a currency are cached, so switching a chart between currencies only converts once.
+    """
+
+    def __init__(self, observations, version=None):
+        """
+        Parameters:
+            observations (DataFrame): Units per BASE_CURRENCY indexed by date with one column per
+                                      currency, NaN where a currency was not observed.
+            version (object, optional): A token identifying the source of the observations.
+        """
+        self.version = version
+        self._points = {}
+        for currency in observations.columns:
+            observed = observations[currency].dropna()
+            if len(observed):
+                self._points[str(currency)] = (observed.index.asi8, observed.to_numpy(dtype=np.float64))
+        self._lock = threading.Lock()
+        self._panels = OrderedDict()
+
+    @property
+    def currencies(self):
+        return [BASE_CURRENCY] + sorted(self._points)
+
+    def rates(self, dates, currencies):
+        """
+        Interpolates the rates of currencies on dates.
+
+        Parameters:
+            dates (DatetimeIndex): The dates.
+            currencies (list): The currencies, BASE_CURRENCY included.
+
+        Returns:
+            ndarray: The (dates, currencies) units per BASE_CURRENCY, NaN for unknown currencies.
+        """
+        times = pd.DatetimeIndex(dates).asi8
+        table = np.full((len(times), len(currencies)), np.nan)
+        # each distinct currency is interpolated once and copied to all of its columns
+        uniques, columns = np.unique(np.asarray(currencies, dtype=object).astype(str), return_inverse=True)
+        for code, currency in enumerate(uniques):
+            if currency == BASE_CURRENCY:
+                table[:, columns == code] = 1.0
+            elif currency in self._points:
+                points, values = self._points[currency]
+                table[:, columns == code] = np.interp(times, points, values)[:, None]
+        return table
+
+    def factors(self, dates, currencies, target=BASE_CURRENCY):
+        """
+        Computes the factors converting amounts in currencies to a target currency on dates.
+
+        Parameters:
+            dates (DatetimeIndex): The dates.
+            currencies (list): The currency of each column.
+            target (str, optional): The currency to convert to.
+
+        Returns:
+            ndarray: The (dates, currencies) factors.
+        """
+        return self.rates(dates, [target]) / self.rates(dates, currencies)
+
+    def convert_panel(self, close_df, currencies, target=BASE_CURRENCY):
+        """
+        Converts a price panel to a currency in one vectorized step.
+
+        The result is cached per panel, column currencies and target, and tagged with its own
+        attrs['data_version'] so results derived from it, such as moving averages, are cached too.
+
+        Parameters:
+            close_df (DataFrame): Prices indexed by date with one column per ticker.
+            currencies (Series): The currency of each ticker; tickers without one are left unconverted.
+            target (str, optional): The currency to convert to.
+
+        Returns:
+            DataFrame: The converted prices. The frame is shared with the cache and must not be modified.
+        """
+        column_currencies = currencies.reindex(close_df.columns).astype(object).fillna(target).to_numpy()
+        key = (panel_version(close_df), hash(tuple(column_currencies)), target)
+        with self._lock:
+            converted = self._panels.get(key)
+            if converted is not None:
+                self._panels.move_to_end(key)
+                return converted
+        values = close_df.to_numpy(dtype=np.float64) * self.factors(close_df.index, column_currencies, target)
+        converted = pd.DataFrame(values, index=close_df.index, columns=close_df.columns)
+        converted.attrs['data_version'] = repr((key, self.version))
+        with self._lock:
+            self._panels[key] = converted
+            while len(self._panels) > MAX_CONVERTED_PANELS:
+                self._panels.popitem(last=False)
+        return converted
+
+    def convert_trades(self, transactions, columns=('Price / share',), target=BASE_CURRENCY):
+        """
+        Converts columns of ledger rows from their 'Currency (Price / share)' to a currency.
+
+        Rows are converted to BASE_CURRENCY with the exchange rate recorded on the row, the rate the
+        trade was actually made at, or the interpolated rate of its date when it has none, and from
+        there to the target with the interpolated rate of the date.
+
+        Parameters:
+            transactions (DataFrame): Ledger rows with 'Transaction Date', 'Currency (Price / share)'
+                                      and 'Exchange rate'.
+            columns (list, optional): The columns to convert.
+            target (str, optional): The currency to convert to.
+
+        Returns:
+            DataFrame: A copy of transactions with the columns converted.
+        """
+        dates = pd.DatetimeIndex(transactions['Transaction Date'])
+        currencies = transactions['Currency (Price / share)'].astype(object).fillna(target).to_numpy()
+        recorded = transactions['Exchange rate'].to_numpy(dtype=np.float64)
+        source_rates = np.where(np.isnan(recorded), self.row_rates(dates, currencies), recorded)
+        # rows already in the target keep their values, whatever rate they recorded
+        factors = np.where(currencies == target, 1.0, self.rates(dates, [target])[:, 0] / source_rates)
+        return transactions.assign(**{column: transactions[column].to_numpy(dtype=np.float64) * factors for column in columns})
+
+    def row_rates(self, dates, currencies):
+        """
+        Interpolates the rate of each row's own currency on its own date.
+
+        Parameters:
+            dates (DatetimeIndex): The date of each row.
+            currencies (ndarray): The currency of each row.
+
+        Returns:
+            ndarray: The units per BASE_CURRENCY of each row.
+        """
+        currencies = np.asarray(currencies, dtype=object).astype(str)
+        rates = np.empty(len(currencies))
+        for currency in np.unique(currencies):
+            rows = currencies == currency
+            rates[rows] = self.rates(dates[rows], [currency])[:, 0]
+        return rates
+
+
+def ledger_observations(transactions):
+    """
+    Collects the exchange rates the ledger recorded on its trades.
+
+    Parameters:
+        transactions (DataFrame): Ledger rows with 'Transaction Date', 'Currency (Price / share)'
+                                  and 'Exchange rate' (units per BASE_CURRENCY).
+
+    Returns:
+        DataFrame: The last rate of each currency on each trading date, indexed by date with one
+                   column per currency.
+    """
+    rates = transactions[['Transaction Date', 'Currency (Price / share)', 'Exchange rate']].dropna()
+    rates = rates.assign(**{'Currency (Price / share)': rates['Currency (Price / share)'].astype(str)})
+    rates = rates[rates['Currency (Price / share)'] != BASE_CURRENCY]
+    return rates.pivot_table(index='Transaction Date', columns='Currency (Price / share)', values='Exchange rate',
+                             aggfunc='last').sort_index()
+
+
+def read_rates_csv(path):
+    """
+    Reads daily exchange rates from a csv with a Date column in DATE_FORMAT and one column of units
+    per BASE_CURRENCY per currency.
+
+    Parameters:
+        path (str): The path of the csv.
+
+    Returns:
+        DataFrame: The rates indexed by date.
+    """
+    df = pd.read_csv(path)
+    df['Date'] = pd.to_datetime(df['Date'], format=DATE_FORMAT)
+    return df.set_index('Date').sort_index().astype(np.float64)
+
+
+def ticker_currencies(transactions):
+    """
+    Finds the currency each ticker is quoted in, the one of its last trade.
+
+    Parameters:
+        transactions (DataFrame): Ledger rows with 'Ticker', 'Action Type' and 'Currency (Price / share)'.
+
+    Returns:
+        Series: The currency of every traded ticker, indexed by ticker.
+    """
+    trades = transactions[transactions['Action Type'].isin(['buy', 'sell'])]
+    currencies = trades['Currency (Price / share)'].astype(object)
+    return currencies.groupby(trades['Ticker'].astype(object)).last()
+
+
+def build_rate_table(transactions, rates_path=None):
+    """
+    Builds the rate table from a rates csv when one exists, from the ledger's exchange rates otherwise.
+
+    Currencies missing from the csv are still interpolated from the ledger.
+
+    Parameters:
+        transactions (DataFrame): The transactions, as returned by load_investment_data.
+        rates_path (str, optional): The path of the rates csv.
+
+    Returns:
+        RateTable: The rates.
+    """
+    observations = ledger_observations(transactions)
+    if rates_path is not None and os.path.exists(rates_path):
+        loaded = read_rates_csv(rates_path)
+        observations = pd.concat([loaded, observations[observations.columns.difference(loaded.columns)]], axis=1)
+    return RateTable(observations.sort_index(), version=panel_version(observations))
@@ -0,0 +1,160 @@
+import io
+import os
+import threading
+
+import pandas as pd
+
+from data.dataManage import DATA_DIR, prepare_transactions
+from data.transactionIndex import index_transactions, append_transactions
+from data.schema import TRANSACTION_NA_VALUES, read_transactions, read_typed_csv
+
+# Seconds between two checks of the transaction csv for new rows, overridable through the environment
+REFRESH_SECONDS = int(os.environ.get('FINVIS_LEDGER_REFRESH_SECONDS', 60))
+
+# Bytes before the read offset that a refresh compares with the ones read, to tell appended rows
+# from edits of earlier ones
+TAIL_CHECK_BYTES = 4096
+
+# Columns parsed by prepare_transactions or indexed by index_transactions rather than kept as read
+_DERIVED_COLUMNS = ('Transaction Date', 'Ticker')
+
+
+class TransactionLedger:
+    """
+    Transaction ledger that picks up rows appended to the transaction csv without re-reading it.
+
+    The file is tailed by byte offset: a refresh reads only the bytes written since the last one,
+    up to the last complete line, and keeps the rows whose 'No.' is above the highest one already
+    loaded. The rows are parsed and indexed on their own and appended to the TransactionFrame
+    together with its partitions and monthly cube.
+
+    Before reading, the header and the last TAIL_CHECK_BYTES bytes before the offset are compared
+    with the ones read, so a file that shrank, or grew because an earlier row was edited, is
+    reloaded in full. So is a file whose modification time changed without it growing. A last row
+    without a trailing newline is loaded too; once its line is complete, a refresh reloads the file
+    if the line differs from the one loaded.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(DATA_DIR, 'Investment Transaction.csv')
+        self.frame = None
+        self.offset = 0
+        self.watermark = None
+        self._header = b''
+        self._tail = b''
+        self._unterminated = b''
+        self._signature = None
+        self._dtypes = {}
+        self._lock = threading.Lock()
+
+    @property
+    def version(self):
+        """
+        Identifies the loaded state of the ledger.
+
+        Returns:
+            int: The highest transaction number loaded, or 0 before the first load.
+        """
+        return 0 if self.watermark is None else int(self.watermark)
+
+    def _file_signature(self):
+        stat = os.stat(self.path)
+        return stat.st_size, stat.st_mtime_ns
+
+    def stale(self):
+        """
+        Tells whether the csv changed since the last load or refresh, from its size and modification time.
+
+        Returns:
+            bool: True if a refresh may find new or changed rows.
+        """
+        return self._file_signature() != self._signature
+
+    def _read(self, start):
+        with open(self.path, 'rb') as file:
+            file.seek(start)
+            return file.read()
+
+    def load(self):
+        """
+        Loads the whole ledger.
+
+        Returns:
+            TransactionFrame: The indexed transactions.
+        """
+        with self._lock:
+            return self._load()
+
+    def _load(self):
+        self._signature = self._file_signature()
+        data = self._read(0)
+        self._header = data[:data.find(b'\n') + 1]
+        df = read_transactions(io.BytesIO(data))
+        # new rows bring their own categories, which append_transactions merges with the loaded ones
+        self._dtypes = {column: 'category' if isinstance(dtype, pd.CategoricalDtype) else dtype
+                        for column, dtype in df.dtypes.items() if column not in _DERIVED_COLUMNS}
+        self.frame = index_transactions(prepare_transactions(df))
+        # the offset stops after the last complete line, an unterminated last row is loaded but
+        # remembered, to be checked against its line once that is complete
+        self.offset = data.rfind(b'\n') + 1
+        self._tail = data[max(self.offset - TAIL_CHECK_BYTES, 0):self.offset]
+        self._unterminated = data[self.offset:]
+        self.watermark = self.frame['No.'].max() if len(self.frame) else None
+        return self.frame
+
+    def _rewritten(self, size):
+        # the bytes read so far must still be in place for the new bytes to be appended rows
+        if size < self.offset or size == self._signature[0]:
+            return True
+        with open(self.path, 'rb') as file:
+            header = file.read(len(self._header))
+            file.seek(self.offset - len(self._tail))
+            tail = file.read(len(self._tail))
+        return header != self._header or tail != self._tail
+
+    def refresh(self):
+        """
+        Appends the transactions written to the csv since the last load or refresh, or reloads
+        the csv when rows already loaded changed.
+
+        Returns:
+            bool: True if the transaction frame changed.
+        """
+        with self._lock:
+            if self.frame is None:
+                self._load()
+                return True
+            signature = self._file_signature()
+            if signature == self._signature:
+                return False
+            if self._rewritten(signature[0]):
+                self._load()
+                return True
+            self._signature = signature
+
+            data = self._read(self.offset)
+            # keep a partially written last line for the next refresh
+            data = data[:data.rfind(b'\n') + 1]
+            if not data:
+                return False
+            if self._unterminated:
+                if data[:data.find(b'\n')].rstrip(b'\r') != self._unterminated.rstrip(b'\r'):
+                    # the row loaded without its newline was still being written
+                    self._load()
+                    return True
+                self._unterminated = b''
+            new_rows = read_typed_csv(io.BytesIO(self._header + data), self._dtypes, na_values=TRANSACTION_NA_VALUES,
+                                      drop_unnamed=True)
+            self.offset += len(data)
+            self._tail = (self._tail + data)[-TAIL_CHECK_BYTES:]
+            if self.watermark is not None:
+                new_rows = new_rows[new_rows['No.'] > self.watermark].copy()
+            if new_rows.empty:
+                return False
+            self.frame = append_transactions(self.frame, prepare_transactions(new_rows))
+            newest = new_rows['No.'].max()
+            self.watermark = newest if self.watermark is None else max(self.watermark, newest)
+            return True
+
+
+ledger = TransactionLedger()
@@ -0,0 +1,227 @@
+import functools
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from data.priceStore import file_signature
+
+# Default memory budget of the loader cache, overridable through the environment
+DEFAULT_BUDGET_MB = int(os.environ.get('FINVIS_CACHE_MB', 256))
+
+_snapshot = {'version': 0}
+_snapshot_lock = threading.Lock()
+
+
+# version of the loaded data, used to key results derived from it
+def snapshot_version():
+    """
+    Returns the current data snapshot version.
+
+    The version changes whenever a loader reads a source file whose contents changed, or when
+    the application swaps in refreshed data through bump_snapshot.
+
+    Returns:
+        int: The snapshot version.
+    """
+    return _snapshot['version']
+
+
+def bump_snapshot():
+    """
+    Starts a new data snapshot, invalidating every result keyed by the previous version.
+
+    Returns:
+        int: The new snapshot version.
+    """
+    with _snapshot_lock:
+        _snapshot['version'] += 1
+        return _snapshot['version']
+
+
+# estimate the resident size of a loaded value
+def estimate_nbytes(value):
+    """
+    Estimates how many bytes a loaded value keeps in memory.
+
+    Parameters:
+        value: A DataFrame, Series, ndarray or other object returned by a loader.
+
+    Returns:
+        int: The estimated size in bytes.
+    """
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, (pd.Series, pd.Index)):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, np.ndarray):
+        if value.dtype == object:
+            return int(value.nbytes + sum(sys.getsizeof(v) for v in value))
+        return int(value.nbytes)
+    # containers such as the price panel report the size of their arrays
+    return int(getattr(value, 'nbytes', 0))
+
+
+# hand out a view so callers can add columns or reassign the index without touching the cached value
+def _share(value):
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return value.copy(deep=False)
+    if isinstance(value, np.ndarray):
+        view = value.view()
+        view.flags.writeable = False
+        return view
+    return value
+
+
+class LoaderCache:
+    """
+    Size-bounded LRU cache of loader results, invalidated when the source files change.
+
+    Each entry remembers the (mtime, size) signature of the files it was loaded from and is
+    reloaded as soon as any of them differ. When the total size exceeds the budget the least
+    recently used entries are evicted.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._signatures = {}
+        self._nbytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def set_budget(self, max_bytes):
+        """
+        Changes the memory budget, evicting entries if the cache is now over it.
+
+        Parameters:
+            max_bytes (int): The new budget in bytes.
+        """
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def get(self, key, signature):
+        """
+        Looks up a cached value.
+
+        Parameters:
+            key (tuple): The cache key.
+            signature (tuple): The current signature of the source files.
+
+        Returns:
+            tuple: (True, value) on a hit, (False, None) on a miss or a stale entry.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] != signature:
+                self._drop(key)
+                self.invalidations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, entry[1]
+
+    def put(self, key, signature, value):
+        """
+        Stores a value, evicting least recently used entries to stay within the budget.
+
+        Values larger than the whole budget are not cached.
+
+        Parameters:
+            key (tuple): The cache key.
+            signature (tuple): The signature of the source files the value was loaded from.
+            value: The loaded value.
+        """
+        nbytes = estimate_nbytes(value)
+        with self._lock:
+            # a source file changed since this key was last loaded, even if it was evicted in between
+            if self._signatures.get(key, signature) != signature:
+                bump_snapshot()
+            self._signatures[key] = signature
+            if key in self._entries:
+                self._drop(key)
+            if nbytes > self.max_bytes:
+                return
+            self._entries[key] = (signature, value, nbytes)
+            self._nbytes += nbytes
+            self._evict()
+
+    def clear(self):
+        """
+        Removes every entry while keeping the counters.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._nbytes = 0
+
+    def stats(self):
+        """
+        Reports the cache counters.
+
+        Returns:
+            dict: Hits, misses, evictions, invalidations, number of entries and bytes in use.
+        """
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'entries': len(self._entries),
+                'bytes': self._nbytes,
+                'max_bytes': self.max_bytes,
+            }
+
+    def _drop(self, key):
+        self._nbytes -= self._entries.pop(key)[2]
+
+    def _evict(self):
+        while self._nbytes > self.max_bytes and self._entries:
+            _, (_, _, nbytes) = self._entries.popitem(last=False)
+            self._nbytes -= nbytes
+            self.evictions += 1
+
+
+loader_cache = LoaderCache(DEFAULT_BUDGET_MB * 2**20)
+
+
+# decorator caching a loader on its arguments and the signature of the files it reads
+def cached_loader(source_paths):
+    """
+    Caches a loader in the shared loader cache.
+
+    DataFrames are tagged with attrs['data_version'] identifying the source files and their signature.
+
+    Parameters:
+        source_paths (function): Called with the loader's arguments, returns the paths of the files the
+                                 loader reads. Their signatures decide whether a cached result is stale.
+
+    Returns:
+        function: The decorator.
+    """
+    def decorator(loader):
+        @functools.wraps(loader)
+        def wrapper(*args, **kwargs):
+            paths = tuple(source_paths(*args, **kwargs))
+            key = (loader.__qualname__, args, tuple(sorted(kwargs.items())), paths)
+            signature = tuple(file_signature(path) for path in paths)
+            hit, value = loader_cache.get(key, signature)
+            if not hit:
+                value = loader(*args, **kwargs)
+                # tag frames with their source so derived results can be cached per data version
+                if isinstance(value, pd.DataFrame):
+                    value.attrs['data_version'] = repr((paths, signature))
+                loader_cache.put(key, signature, value)
+            return _share(value)
+        return wrapper
+    return decorator
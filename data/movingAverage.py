@@ -0,0 +1,112 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# Number of moving-average matrices kept per close price panel
+MAX_CACHED_WINDOWS = 32
+
+_lock = threading.Lock()
+_cumulative_cache = OrderedDict()
+_average_cache = OrderedDict()
+
+
+# identify the contents of a close price panel without rescanning it when the loader tagged it
+def panel_version(close_df):
+    """
+    Returns a token identifying the data of a close price panel.
+
+    Frames returned by the cached loaders carry the signature of their source files in
+    attrs['data_version']; other frames are hashed.
+
+    Parameters:
+        close_df (DataFrame): Close prices indexed by date with one column per ticker.
+
+    Returns:
+        tuple: A hashable version token.
+    """
+    version = close_df.attrs.get('data_version')
+    if version is None:
+        version = int(pd.util.hash_pandas_object(close_df, index=True).sum())
+    return (version, close_df.shape, hash(tuple(close_df.columns)))
+
+
+def _remember(cache, key, value, limit):
+    cache[key] = value
+    cache.move_to_end(key)
+    while len(cache) > limit:
+        cache.popitem(last=False)
+
+
+def _cumulative_sums(close_df, version):
+    with _lock:
+        cached = _cumulative_cache.get(version)
+    if cached is not None:
+        return cached
+    values = close_df.to_numpy(dtype=np.float64)
+    valid = ~np.isnan(values)
+    # leading zero row so the sum of rows [a, b) is sums[b] - sums[a]
+    sums = np.zeros((values.shape[0] + 1, values.shape[1]))
+    counts = np.zeros((values.shape[0] + 1, values.shape[1]), dtype=np.int64)
+    np.cumsum(np.where(valid, values, 0.0), axis=0, out=sums[1:])
+    np.cumsum(valid, axis=0, out=counts[1:])
+    with _lock:
+        _remember(_cumulative_cache, version, (sums, counts), 4)
+    return sums, counts
+
+
+# moving average of every ticker for one window, computed from cumulative sums
+def moving_average(close_df, window):
+    """
+    Computes the trailing moving average of every column of a close price panel.
+
+    Matches rolling(window, min_periods=1).mean(): missing prices are skipped and a value is produced
+    as soon as the window holds one price. Results are cached by (window, panel version).
+
+    Parameters:
+        close_df (DataFrame): Close prices indexed by date with one column per ticker.
+        window (int): The number of rows in the window.
+
+    Returns:
+        DataFrame: The moving averages, aligned with close_df. The frame is shared with the cache
+                   and must not be modified.
+    """
+    window = int(window)
+    if window < 1:
+        raise ValueError(f'Moving average window must be positive, got {window}')
+    version = panel_version(close_df)
+    key = (window, version)
+    with _lock:
+        cached = _average_cache.get(key)
+        if cached is not None:
+            _average_cache.move_to_end(key)
+    if cached is not None:
+        return cached
+
+    sums, counts = _cumulative_sums(close_df, version)
+    end = np.arange(1, sums.shape[0])
+    start = np.maximum(end - window, 0)
+    window_counts = counts[end] - counts[start]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        values = np.where(window_counts > 0, (sums[end] - sums[start]) / window_counts, np.nan)
+    # drop the round-off left by differencing the cumulative sums
+    np.round(values, 10, out=values)
+    averages = pd.DataFrame(values, index=close_df.index, columns=close_df.columns)
+    with _lock:
+        _remember(_average_cache, key, averages, MAX_CACHED_WINDOWS)
+    return averages
+
+
+def moving_averages(close_df, windows):
+    """
+    Computes the moving averages of a close price panel for several windows.
+
+    Parameters:
+        close_df (DataFrame): Close prices indexed by date with one column per ticker.
+        windows (list): The window lengths.
+
+    Returns:
+        dict: Window length to DataFrame of moving averages.
+    """
+    return {int(window): moving_average(close_df, window) for window in windows}
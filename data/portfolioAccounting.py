@@ -0,0 +1,253 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+from data.dataManage import load_fx_rates
+from data.fx import BASE_CURRENCY, ticker_currencies
+
+# Shares left in a pool below this are treated as a full disposal
+_EMPTY_POOL = 1e-9
+
+# Per-ticker metrics derived from the ledger, with the column names of Investment Company.csv
+METRIC_COLUMNS = [
+    'Average Price per Share', 'Date of First Purchase', 'Date of Last Purchase',
+    'Total Number of Shares Purchased', 'Total Purchase Amount', 'Date of First Sell', 'Date of Last Sell',
+    'Total Number of Shares Sold', 'Total Sales Amount', 'Average Sale Price per Share',
+    'Net Total Number of Shares', 'Current Share Price', 'Total Dividends',
+    'Realized Capital Gain & Loss', 'Result Realized Capital Gain & Loss', 'Unrealized Capital Gain & Loss',
+    'Start Date', 'End Date',
+]
+
+
+# Split sentence of the Notes column, e.g. "took place on August 31, 2020. This was a 4 for 1 split"
+_SPLIT_NOTE = re.compile(r'took place on (\w+ \d{1,2}, \d{4})\. This was a (\d+) for (\d+)')
+
+
+def _format_dates(dates):
+    return dates.dt.strftime('%d/%m/%Y')
+
+
+def stock_splits(company_df):
+    """
+    Extracts the stock splits recorded in the 'Notes' column of the company data.
+
+    Parameters:
+        company_df (DataFrame): The company data with 'Ticker' and 'Notes'.
+
+    Returns:
+        DataFrame: One row per split with 'Ticker', 'Date' and 'Ratio' (new shares per old share).
+    """
+    splits = []
+    for ticker, notes in zip(company_df['Ticker'], company_df.get('Notes', pd.Series(dtype=object))):
+        if not isinstance(notes, str):
+            continue
+        for date, new, old in _SPLIT_NOTE.findall(notes):
+            splits.append((ticker, pd.to_datetime(date, format='%B %d, %Y'), int(new) / int(old)))
+    return pd.DataFrame(splits, columns=['Ticker', 'Date', 'Ratio'])
+
+
+def adjust_for_splits(trades, splits):
+    """
+    Restates the share counts of trades made before a split in post-split shares.
+
+    Parameters:
+        trades (DataFrame): Trades with 'Ticker', 'Transaction Date' and 'No. of shares'.
+        splits (DataFrame): Splits as returned by stock_splits.
+
+    Returns:
+        DataFrame: A copy of trades with adjusted 'No. of shares'.
+    """
+    factor = np.ones(len(trades))
+    tickers = trades['Ticker'].to_numpy()
+    dates = trades['Transaction Date'].to_numpy()
+    for ticker, date, ratio in splits[['Ticker', 'Date', 'Ratio']].itertuples(index=False):
+        factor[(tickers == ticker) & (dates < np.datetime64(date))] *= ratio
+    return trades.assign(**{'No. of shares': trades['No. of shares'].to_numpy() * factor})
+
+
+# average-cost pool of every ticker, replayed over its buys and sells in one vectorized pass
+def pool_trades(trades):
+    """
+    Replays buys and sells through a Section 104 style average-cost pool per ticker.
+
+    Buys add their shares and GBP cost to the pool; a sale removes the sold fraction of the pool's
+    shares and cost, and realizes its proceeds minus that cost. The pool cost follows the affine
+    recurrence cost_t = kept_t * cost_t-1 + bought_t, which is solved within each run of trades
+    between two full disposals with a cumulative product and a cumulative sum. Sales exceeding the
+    pool, such as spun-off shares, are realized at no cost.
+
+    Parameters:
+        trades (DataFrame): Buys and sells in ledger order with 'Ticker', 'Action Type',
+                            'No. of shares' and 'Total (GBP)'.
+
+    Returns:
+        DataFrame: Aligned with trades, with the pool 'Shares' and 'Cost' after each trade and the
+                   'Realized' gain or loss of each sale.
+    """
+    tickers = trades['Ticker'].to_numpy()
+    is_sell = (trades['Action Type'] == 'sell').to_numpy()
+    shares = trades['No. of shares'].to_numpy(dtype=np.float64)
+    amounts = trades['Total (GBP)'].to_numpy(dtype=np.float64)
+
+    # stable sort by ticker keeps the ledger order of each ticker's trades
+    order = np.argsort(pd.factorize(tickers)[0], kind='stable')
+    ticker_codes = pd.factorize(tickers[order])[0]
+    is_sell, shares, amounts = is_sell[order], shares[order], amounts[order]
+    new_ticker = np.r_[True, ticker_codes[1:] != ticker_codes[:-1]]
+    by_ticker = pd.Series(ticker_codes)
+
+    held = pd.Series(np.where(is_sell, -shares, shares)).groupby(by_ticker).cumsum().to_numpy()
+    held_before = held - np.where(is_sell, -shares, shares)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sold_fraction = np.where(held_before > _EMPTY_POOL, np.minimum(shares / held_before, 1.0), 1.0)
+    sold_fraction[held <= _EMPTY_POOL] = 1.0
+    kept = np.where(is_sell, 1.0 - sold_fraction, 1.0)
+    bought = np.where(is_sell, 0.0, amounts)
+
+    # a new run starts with each ticker and after every trade that empties the pool
+    emptied = np.r_[False, kept[:-1] == 0.0]
+    run = np.cumsum(new_ticker | emptied)
+    growth = pd.Series(kept).groupby(run).cumprod().to_numpy()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        scaled = np.where(growth > 0, bought / growth, 0.0)
+    cost = growth * pd.Series(scaled).groupby(run).cumsum().to_numpy()
+
+    cost_before = np.where(new_ticker, 0.0, np.r_[0.0, cost[:-1]])
+    realized = np.where(is_sell, amounts - cost_before * np.where(held_before > _EMPTY_POOL, sold_fraction, 0.0), 0.0)
+
+    result = pd.DataFrame({'Shares': np.maximum(held, 0.0), 'Cost': cost, 'Realized': realized})
+    result.index = trades.index[order]
+    return result.reindex(trades.index)
+
+
+def latest_prices(close_df, transactions, rates=None):
+    """
+    Converts the latest close price of every ticker to GBP.
+
+    The currency of a ticker is the one of its last trade and the rate is the one of the last date
+    of close_df, read off the same rate table as the converted price charts and the valuations.
+
+    Parameters:
+        close_df (DataFrame): Close prices indexed by date with one column per ticker.
+        transactions (DataFrame): The ledger with 'Ticker', 'Action Type' and 'Currency (Price / share)'.
+        rates (RateTable, optional): The exchange rates, those of load_fx_rates by default.
+
+    Returns:
+        Series: The GBP price of each ticker with a close price, indexed by ticker.
+    """
+    if not len(close_df):
+        return pd.Series(dtype=np.float64)
+    last_close = close_df.ffill().iloc[-1]
+    if rates is None:
+        rates = load_fx_rates()
+    currencies = ticker_currencies(transactions).reindex(last_close.index).fillna(BASE_CURRENCY)
+    factors = rates.factors(close_df.index[-1:], currencies.to_numpy())[0]
+    # prices in a currency without any rate are kept as they are
+    return last_close * np.where(np.isnan(factors), 1.0, factors)
+
+
+# per-ticker holdings, costs and gains computed from the ledger
+def compute_portfolio_metrics(transactions, close_df, splits=None):
+    """
+    Computes the per-ticker metrics of Investment Company.csv from the transaction ledger.
+
+    Share counts are stated in post-split shares, matching split-adjusted close prices.
+
+    Parameters:
+        transactions (DataFrame): The transactions, as returned by load_investment_data.
+        close_df (DataFrame): Close prices indexed by date with one column per ticker.
+        splits (DataFrame, optional): Splits as returned by stock_splits.
+
+    Returns:
+        DataFrame: One row per traded ticker, indexed by ticker, with METRIC_COLUMNS.
+    """
+    kinds = transactions['Action Type']
+    trades = transactions[kinds.isin(['buy', 'sell'])]
+    trades = trades.assign(Ticker=trades['Ticker'].astype(object))
+    if splits is not None and len(splits):
+        trades = adjust_for_splits(trades, splits)
+    pool = pool_trades(trades)
+
+    is_buy = trades['Action Type'] == 'buy'
+    buys, sells = trades[is_buy], trades[~is_buy]
+    bought = buys.groupby('Ticker').agg(shares=('No. of shares', 'sum'), amount=('Total (GBP)', 'sum'),
+                                        first=('Transaction Date', 'min'), last=('Transaction Date', 'max'))
+    sold = sells.groupby('Ticker').agg(shares=('No. of shares', 'sum'), amount=('Total (GBP)', 'sum'),
+                                       first=('Transaction Date', 'min'), last=('Transaction Date', 'max'),
+                                       result=('Result(GBP)', 'sum'))
+    final_pool = pool.groupby(trades['Ticker']).last()
+    realized = pool['Realized'].groupby(trades['Ticker']).sum()
+    income = transactions[kinds.isin(['dividend', 'capital return'])]
+    dividends = income.groupby(income['Ticker'].astype(object))['Total (GBP)'].sum()
+
+    metrics = pd.DataFrame(index=final_pool.index)
+    metrics.index.name = 'Ticker'
+    shares_bought = bought['shares'].reindex(metrics.index, fill_value=0.0)
+    shares_sold = sold['shares'].reindex(metrics.index, fill_value=0.0)
+    purchase_amount = bought['amount'].reindex(metrics.index, fill_value=0.0)
+    sales_amount = sold['amount'].reindex(metrics.index, fill_value=0.0)
+    net_shares = final_pool['Shares']
+    price = latest_prices(close_df, transactions).reindex(metrics.index)
+
+    metrics['Average Price per Share'] = (purchase_amount / shares_bought.where(shares_bought > 0)).fillna(0.0)
+    metrics['Date of First Purchase'] = _format_dates(bought['first'].reindex(metrics.index))
+    metrics['Date of Last Purchase'] = _format_dates(bought['last'].reindex(metrics.index))
+    metrics['Total Number of Shares Purchased'] = shares_bought
+    metrics['Total Purchase Amount'] = purchase_amount
+    metrics['Date of First Sell'] = _format_dates(sold['first'].reindex(metrics.index))
+    metrics['Date of Last Sell'] = _format_dates(sold['last'].reindex(metrics.index))
+    metrics['Total Number of Shares Sold'] = shares_sold
+    metrics['Total Sales Amount'] = sales_amount
+    metrics['Average Sale Price per Share'] = (sales_amount / shares_sold.where(shares_sold > 0)).fillna(0.0)
+    metrics['Net Total Number of Shares'] = net_shares
+    metrics['Current Share Price'] = price
+    metrics['Total Dividends'] = dividends.reindex(metrics.index, fill_value=0.0)
+    metrics['Realized Capital Gain & Loss'] = realized
+    metrics['Result Realized Capital Gain & Loss'] = sold['result'].reindex(metrics.index, fill_value=0.0)
+    metrics['Unrealized Capital Gain & Loss'] = (net_shares * price - final_pool['Cost']).where(net_shares > 0, 0.0)
+    first_trade = trades.groupby('Ticker')['Transaction Date'].min()
+    last_trade = trades.groupby('Ticker')['Transaction Date'].max()
+    metrics['Start Date'] = _format_dates(first_trade)
+    metrics['End Date'] = _format_dates(last_trade)
+    return metrics[METRIC_COLUMNS]
+
+
+def build_company_data(transactions, close_df, company_df):
+    """
+    Refreshes the company data with metrics recomputed from the transaction ledger.
+
+    Descriptive columns such as 'Ticker Index', 'Company Name' and 'Notes' are kept from
+    company_df, in its row order, and the splits described in its notes are applied. Tickers
+    traded in the ledger but missing from company_df are appended with the next ticker indices.
+    Metrics that cannot be derived, such as the price of a delisted ticker without close prices,
+    keep their value from company_df.
+
+    Parameters:
+        transactions (DataFrame): The transactions, as returned by load_investment_data.
+        close_df (DataFrame): Close prices indexed by date with one column per ticker.
+        company_df (DataFrame): The company data, as returned by load_company_data.
+
+    Returns:
+        DataFrame: The company data with up to date metric columns.
+    """
+    metrics = compute_portfolio_metrics(transactions, close_df, stock_splits(company_df))
+    known = company_df['Ticker']
+    new_tickers = metrics.index[~metrics.index.isin(known)]
+    if len(new_tickers):
+        names = transactions.groupby(transactions['Ticker'].astype(object))['Name'].last()
+        start = company_df['Ticker Index'].max() + 1 if len(company_df) else 0
+        additions = pd.DataFrame({'Ticker Index': np.arange(start, start + len(new_tickers)),
+                                  'Company Name': names.reindex(new_tickers).to_numpy(),
+                                  'Ticker': new_tickers})
+        company_df = pd.concat([company_df, additions], ignore_index=True)
+
+    company_df = company_df.copy()
+    rows = metrics.reindex(company_df['Ticker'])
+    for column in METRIC_COLUMNS:
+        values = rows[column]
+        if column in company_df.columns:
+            company_df[column] = np.where(values.notna(), values.to_numpy(), company_df[column].to_numpy())
+        else:
+            company_df[column] = values.to_numpy()
+    return company_df
@@ -0,0 +1,246 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from data.priceStore import (TICKER_FIELDS, file_signature, price_sources, read_close_arrays, read_panel_arrays,
+                             read_ticker_arrays, read_ticker_csv, read_wide_csv, save_panel_arrays)
+
+# Fields of the panel: the adjusted prices, volumes, dividends and splits of the per-ticker files,
+# in the order of TICKER_FIELDS, then the unadjusted closes of the wide API table
+FIELDS = ['Open', 'High', 'Low', 'Close', 'Volume', 'Dividends', 'Splits', 'Unadjusted Close']
+TICKER_PANEL_FIELDS = FIELDS[:len(TICKER_FIELDS)]
+WIDE_FIELD = 'Unadjusted Close'
+
+# Wide table the unadjusted closes are read from
+WIDE_TABLE = 'API'
+
+
+def _positions_or_slice(positions, size):
+    # a leading run of positions selects a view instead of copying
+    if len(positions) and positions[-1] == len(positions) - 1:
+        return slice(0, len(positions)) if len(positions) < size else slice(None)
+    return positions
+
+
+class PricePanel:
+    """
+    Prices of every ticker on every trading date in one contiguous array.
+
+    The values are laid out (field, ticker, date), so the wide frame of one field and the series of
+    one ticker and field are views of the array. Tickers, dates and fields map to their offsets
+    through dicts and date ranges are sliced with binary searches. Dates missing from a ticker's
+    file hold NaN; each field remembers which tickers and dates its source covered, so the frames
+    it returns match the source table.
+    """
+
+    def __init__(self, values, tickers, dates, present, wide_tickers, wide_dates, version=None):
+        """
+        Parameters:
+            values (ndarray): The (len(FIELDS), tickers, dates) prices.
+            tickers (list): The tickers, in array order.
+            dates (ndarray): The sorted datetime64 trading dates.
+            present (ndarray): A (tickers, dates) mask of the rows of each per-ticker file.
+            wide_tickers (ndarray): Offsets of the tickers of the wide table.
+            wide_dates (ndarray): Offsets of the dates of the wide table.
+            version (object, optional): A token identifying the source files.
+        """
+        self.values = values
+        self.tickers = pd.Index(tickers)
+        self.dates = pd.DatetimeIndex(dates, name='Date')
+        self.present = present
+        self.version = version
+        self._date_values = self.dates.asi8
+        self._field_offsets = {field: offset for offset, field in enumerate(FIELDS)}
+        self._ticker_offsets = {ticker: offset for offset, ticker in enumerate(tickers)}
+        self._date_offsets = {date: offset for offset, date in enumerate(self._date_values)}
+        ticker_columns = _positions_or_slice(np.flatnonzero(present.any(axis=1)), len(tickers))
+        ticker_rows = _positions_or_slice(np.flatnonzero(present.any(axis=0)), len(dates))
+        wide = (_positions_or_slice(np.asarray(wide_tickers, dtype=np.intp), len(tickers)),
+                _positions_or_slice(np.asarray(wide_dates, dtype=np.intp), len(dates)))
+        # tickers and dates of the source table of each field
+        self._coverage = {field: wide if field == WIDE_FIELD else (ticker_columns, ticker_rows) for field in FIELDS}
+
+    @property
+    def nbytes(self):
+        # arrays mapped from the saved panel live in the page cache shared by every process
+        return sum(int(array.nbytes) for array in (self.values, self.present) if not isinstance(array, np.memmap))
+
+    def ticker_offset(self, ticker):
+        """
+        Parameters:
+            ticker (str): The stock ticker symbol.
+
+        Returns:
+            int: The offset of the ticker along the ticker axis.
+        """
+        return self._ticker_offsets[ticker]
+
+    def date_offset(self, date):
+        """
+        Parameters:
+            date (Timestamp or str): A trading date.
+
+        Returns:
+            int: The offset of the date along the date axis.
+        """
+        return self._date_offsets[pd.Timestamp(date).value]
+
+    def date_slice(self, start=None, end=None):
+        """
+        Finds the dates of a range with binary searches.
+
+        Parameters:
+            start (Timestamp, optional): The first date, included.
+            end (Timestamp, optional): The last date, included.
+
+        Returns:
+            slice: The offsets of the dates from start to end.
+        """
+        first = 0 if start is None else int(np.searchsorted(self._date_values, pd.Timestamp(start).value, side='left'))
+        last = len(self.dates) if end is None else int(np.searchsorted(self._date_values, pd.Timestamp(end).value, side='right'))
+        return slice(first, max(first, last))
+
+    def _rows(self, rows, start, end):
+        # the rows of a source that fall in the date range
+        dates = self.date_slice(start, end)
+        if isinstance(rows, slice):
+            first, last, _ = rows.indices(len(self.dates))
+            first = max(first, dates.start)
+            return slice(first, max(first, min(last, dates.stop)))
+        return rows[np.searchsorted(rows, dates.start):np.searchsorted(rows, dates.stop)]
+
+    def frame(self, field, start=None, end=None):
+        """
+        Returns one field of every ticker of its source as a wide frame.
+
+        Parameters:
+            field (str): One of FIELDS.
+            start (Timestamp, optional): The first date, included.
+            end (Timestamp, optional): The last date, included.
+
+        Returns:
+            DataFrame: The values indexed by date with one column per ticker, a view of the panel
+                       when the source covers a contiguous block of it.
+        """
+        columns, rows = self._coverage[field]
+        rows = self._rows(rows, start, end)
+        block = self.values[self._field_offsets[field]][columns]
+        # pandas keeps the (tickers, dates) block of the transposed view without copying it
+        df = pd.DataFrame(block[:, rows].T, index=self.dates[rows], columns=self.tickers[columns], copy=False)
+        df.attrs['data_version'] = repr((self.version, field, str(start), str(end)))
+        return df
+
+    def series(self, ticker, field, start=None, end=None):
+        """
+        Returns one field of one ticker over the dates of the field's source.
+
+        Parameters:
+            ticker (str): The stock ticker symbol.
+            field (str): One of FIELDS.
+            start (Timestamp, optional): The first date, included.
+            end (Timestamp, optional): The last date, included.
+
+        Returns:
+            Series: The values indexed by date, named after the ticker.
+        """
+        rows = self._rows(self._coverage[field][1], start, end)
+        values = self.values[self._field_offsets[field], self.ticker_offset(ticker)]
+        return pd.Series(values[rows], index=self.dates[rows], name=ticker, copy=False)
+
+    def ticker_frame(self, ticker, start=None, end=None):
+        """
+        Returns the rows of a ticker's own file.
+
+        Parameters:
+            ticker (str): The stock ticker symbol.
+            start (Timestamp, optional): The first date, included.
+            end (Timestamp, optional): The last date, included.
+
+        Returns:
+            DataFrame: A Date column and one column per field of TICKER_PANEL_FIELDS.
+        """
+        offset = self.ticker_offset(ticker)
+        dates = self.date_slice(start, end)
+        rows = dates.start + np.flatnonzero(self.present[offset, dates])
+        df = pd.DataFrame(self.values[:len(TICKER_PANEL_FIELDS), offset][:, rows].T, columns=TICKER_PANEL_FIELDS, copy=False)
+        df.insert(0, 'Date', self.dates[rows].to_numpy())
+        return df
+
+
+def price_source_paths(data_dir):
+    """
+    Lists the csv files a price panel is built from.
+
+    Parameters:
+        data_dir (str): The data directory containing the csv files.
+
+    Returns:
+        list: The paths of the per-ticker files and of the wide table.
+    """
+    return [
+        os.path.join(data_dir, file_name) for key, file_name in price_sources(data_dir).items()
+        if key.startswith('ticker:') or key == f'wide:{WIDE_TABLE}'
+    ]
+
+
+# assemble the panel from the compiled store, parsing the csv of stale or uncompiled entries
+def _assemble_panel(data_dir, version):
+    sources = price_sources(data_dir)
+    ticker_data = {}
+    for key in sources:
+        kind, name = key.split(':', 1)
+        if kind == 'ticker':
+            ticker_data[name] = read_ticker_arrays(data_dir, name) or read_ticker_csv(data_dir, name)
+    if f'wide:{WIDE_TABLE}' in sources:
+        wide_dates, wide_names, wide_values = read_close_arrays(data_dir, WIDE_TABLE) or read_wide_csv(data_dir, WIDE_TABLE)
+    else:
+        wide_dates, wide_names, wide_values = np.array([], dtype='datetime64[ns]'), [], np.empty((0, 0))
+
+    # the tickers of the wide table come first so its frames are a view of the leading rows
+    tickers = list(wide_names) + sorted(set(ticker_data) - set(wide_names))
+    ticker_offsets = {ticker: offset for offset, ticker in enumerate(tickers)}
+    dates = np.unique(np.concatenate([np.asarray(wide_dates, dtype='datetime64[ns]')]
+                                     + [np.asarray(arrays[0], dtype='datetime64[ns]') for arrays in ticker_data.values()]))
+
+    values = np.full((len(FIELDS), len(tickers), len(dates)), np.nan)
+    present = np.zeros((len(tickers), len(dates)), dtype=bool)
+    for ticker, (ticker_dates, ticker_values) in ticker_data.items():
+        offset = ticker_offsets[ticker]
+        rows = np.searchsorted(dates, ticker_dates)
+        values[:len(TICKER_PANEL_FIELDS), offset, rows] = ticker_values
+        present[offset, rows] = True
+    wide_rows = np.searchsorted(dates, wide_dates)
+    values[FIELDS.index(WIDE_FIELD), :len(wide_names)][:, wide_rows] = wide_values
+    meta = {'version': version, 'tickers': tickers, 'wide_tickers': len(wide_names)}
+    return meta, {'values': values, 'present': present, 'dates': dates, 'wide_rows': wide_rows}
+
+
+# map the saved panel of the current sources, assembling and saving it first when there is none
+def build_price_panel(data_dir):
+    """
+    Builds the price panel of a data directory.
+
+    While its sources are unchanged, the panel saved by an earlier build is memory-mapped, so every
+    process shares its pages and large panels do not count against the loader cache budget.
+    Otherwise each source is read from the memory maps of the compiled store when it is up to date
+    and parsed from its csv otherwise, copied once into the panel, and the panel is saved and mapped
+    back. The private copy is kept only when it cannot be saved.
+
+    Parameters:
+        data_dir (str): The data directory containing the csv files and the compiled store.
+
+    Returns:
+        PricePanel: The prices of every ticker.
+    """
+    version = tuple(file_signature(path) for path in price_source_paths(data_dir))
+    saved = read_panel_arrays(data_dir, version)
+    if saved is None:
+        meta, arrays = _assemble_panel(data_dir, version)
+        saved = (save_panel_arrays(data_dir, meta, arrays) and read_panel_arrays(data_dir, version)) or (meta, arrays)
+    meta, arrays = saved
+    # the frames handed out are views of the panel
+    for array in arrays.values():
+        array.flags.writeable = False
+    return PricePanel(arrays['values'], meta['tickers'], arrays['dates'], arrays['present'],
+                      np.arange(meta['wide_tickers']), arrays['wide_rows'], version)
@@ -0,0 +1,373 @@
+import glob
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import threading
+
+import numpy as np
+import pandas as pd
+
+# Sub-directory of the data directory holding the compiled binary store
+STORE_DIR = 'compiled'
+MANIFEST = 'manifest.json'
+STORE_VERSION = 2
+
+# Columns kept for each ticker, stored field-major so each field is contiguous on disk. Files
+# without dividend or split columns store zeros for them
+OHLCV_FIELDS = ['Open', 'High', 'Low', 'Close', 'Volume']
+TICKER_FIELDS = OHLCV_FIELDS + ['Dividends', 'Stock Splits']
+# Wide close price table compiled alongside the per-ticker files. stock_close.csv repeats the
+# Close column of the per-ticker files and is not read
+WIDE_TABLES = ['API']
+
+# The assembled price panel is saved next to the compiled entries as panel.<array>.npy files
+# described by panel.json, so every process maps the same pages instead of building its own copy
+PANEL_META = 'panel.json'
+PANEL_ARRAYS = ['values', 'present', 'dates', 'wide_rows']
+
+_manifest_cache = {}
+
+
+# stat signature of a file used to detect stale compiled entries
+def file_signature(path):
+    """
+    Returns a signature identifying the current contents of a file.
+
+    Parameters:
+        path (str): Path of the file.
+
+    Returns:
+        tuple: (mtime_ns, size) of the file, or None if it does not exist.
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _store_path(data_dir, *parts):
+    return os.path.join(data_dir, STORE_DIR, *parts)
+
+
+# write an array next to its final location and swap it in atomically
+def _save_array(path, values):
+    tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.save(f, values)
+    os.replace(tmp_path, path)
+
+
+def _save_json(path, value):
+    tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(value, f)
+    os.replace(tmp_path, path)
+
+
+def _parse_dates(values):
+    return pd.to_datetime(values, format='%d/%m/%Y').values.astype('datetime64[ns]')
+
+
+# some exported files abbreviate volumes as e.g. '968.59K'
+def _parse_numbers(values):
+    if values.dtype != object:
+        return values.to_numpy(dtype=np.float64)
+    text = values.astype(str).str.strip()
+    multiplier = text.str[-1].map({'K': 1e3, 'M': 1e6, 'B': 1e9}).fillna(1.0)
+    text = text.where(multiplier == 1.0, text.str[:-1])
+    return pd.to_numeric(text, errors='coerce').to_numpy(dtype=np.float64) * multiplier.to_numpy()
+
+
+# parse a per-ticker csv into its dates and field-major values
+def read_ticker_csv(data_dir, ticker):
+    """
+    Parses the csv of a ticker.
+
+    Parameters:
+        data_dir (str): The data directory containing the csv files.
+        ticker (str): The stock ticker symbol.
+
+    Returns:
+        tuple: The datetime64 dates and a (len(TICKER_FIELDS), dates) float64 array.
+    """
+    df = pd.read_csv(os.path.join(data_dir, f'{ticker}_stock_data.csv'), usecols=lambda column: column in ['Date'] + TICKER_FIELDS)
+    values = np.zeros((len(TICKER_FIELDS), len(df)))
+    for position, field in enumerate(TICKER_FIELDS):
+        if field in df.columns:
+            values[position] = _parse_numbers(df[field])
+    return _parse_dates(df['Date']), values
+
+
+# parse a wide close price csv into its dates, tickers and ticker-major values
+def read_wide_csv(data_dir, name):
+    """
+    Parses a wide close price csv.
+
+    Parameters:
+        data_dir (str): The data directory containing the csv files.
+        name (str): The name of the table, such as 'API'.
+
+    Returns:
+        tuple: The datetime64 dates, the list of tickers and a (tickers, dates) float64 array.
+    """
+    df = pd.read_csv(os.path.join(data_dir, f'{name}.csv'), dtype={'Date': 'object'})
+    tickers = [col for col in df.columns if col != 'Date']
+    return _parse_dates(df['Date']), tickers, np.ascontiguousarray(df[tickers].to_numpy(dtype=np.float64).T)
+
+
+def _compile_ticker(data_dir, ticker):
+    dates, values = read_ticker_csv(data_dir, ticker)
+    _save_array(_store_path(data_dir, f'{ticker}.dates.npy'), dates)
+    _save_array(_store_path(data_dir, f'{ticker}.fields.npy'), values)
+
+
+def _compile_wide(data_dir, name):
+    dates, tickers, values = read_wide_csv(data_dir, name)
+    _save_array(_store_path(data_dir, f'{name}.dates.npy'), dates)
+    _save_array(_store_path(data_dir, f'{name}.close.npy'), values)
+    return tickers
+
+
+def price_sources(data_dir):
+    """
+    Lists the price csv files of a data directory.
+
+    Parameters:
+        data_dir (str): The data directory containing the csv files.
+
+    Returns:
+        dict: The file name of each source, keyed 'ticker:<ticker>' or 'wide:<name>'.
+    """
+    sources = {}
+    for path in sorted(glob.glob(os.path.join(data_dir, '*_stock_data.csv'))):
+        ticker = os.path.basename(path)[:-len('_stock_data.csv')]
+        sources[f'ticker:{ticker}'] = os.path.basename(path)
+    for name in WIDE_TABLES:
+        if os.path.exists(os.path.join(data_dir, f'{name}.csv')):
+            sources[f'wide:{name}'] = f'{name}.csv'
+    return sources
+
+
+def read_manifest(data_dir):
+    """
+    Reads the manifest of the compiled store, reusing the parsed copy while the file is unchanged.
+
+    Parameters:
+        data_dir (str): The data directory containing the compiled store.
+
+    Returns:
+        dict: The manifest, or None if the store has not been compiled.
+    """
+    path = _store_path(data_dir, MANIFEST)
+    signature = file_signature(path)
+    if signature is None:
+        return None
+    cached = _manifest_cache.get(path)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+    with open(path) as f:
+        manifest = json.load(f)
+    if manifest.get('version') != STORE_VERSION:
+        manifest = None
+    _manifest_cache[path] = (signature, manifest)
+    return manifest
+
+
+# compile the csv price files into the binary columnar store
+def compile_price_store(data_dir='data', force=False):
+    """
+    Compiles the per-ticker OHLCV files and the wide close price tables into binary arrays.
+
+    Only entries whose source csv changed since the last compile are rewritten unless force is set.
+
+    Parameters:
+        data_dir (str, optional): The data directory containing the csv files.
+        force (bool, optional): Recompile every entry even when it is up to date.
+
+    Returns:
+        list: The keys of the entries that were (re)compiled.
+    """
+    os.makedirs(_store_path(data_dir), exist_ok=True)
+    manifest = None if force else read_manifest(data_dir)
+    entries = dict(manifest['entries']) if manifest else {}
+
+    compiled = []
+    sources = price_sources(data_dir)
+    for key, file_name in sources.items():
+        signature = list(file_signature(os.path.join(data_dir, file_name)))
+        if entries.get(key, {}).get('signature') == signature:
+            continue
+        kind, name = key.split(':', 1)
+        entry = {'source': file_name, 'signature': signature}
+        if kind == 'ticker':
+            _compile_ticker(data_dir, name)
+        else:
+            entry['tickers'] = _compile_wide(data_dir, name)
+        entries[key] = entry
+        compiled.append(key)
+
+    # drop entries whose source files were removed
+    for key in set(entries) - set(sources):
+        del entries[key]
+        compiled.append(key)
+
+    if compiled or manifest is None:
+        _save_json(_store_path(data_dir, MANIFEST), {'version': STORE_VERSION, 'entries': entries})
+        _remove_orphans(data_dir, entries)
+    return compiled
+
+
+# delete arrays of removed sources or of an older store layout
+def _remove_orphans(data_dir, entries):
+    kept = {f'panel.{name}.npy' for name in PANEL_ARRAYS}
+    for key in entries:
+        kind, name = key.split(':', 1)
+        kept.update([f'{name}.dates.npy', f'{name}.fields.npy' if kind == 'ticker' else f'{name}.close.npy'])
+    for path in glob.glob(_store_path(data_dir, '*.npy')):
+        if os.path.basename(path) not in kept:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+# compile the store when it is missing or stale, without failing on read-only data directories
+def ensure_price_store(data_dir='data'):
+    """
+    Brings the compiled store up to date, falling back silently to csv reads if it cannot be written.
+
+    Parameters:
+        data_dir (str, optional): The data directory containing the csv files.
+
+    Returns:
+        bool: True if the compiled store is available.
+    """
+    try:
+        compile_price_store(data_dir)
+    except OSError:
+        return False
+    return True
+
+
+def _fresh_entry(data_dir, key):
+    manifest = read_manifest(data_dir)
+    if manifest is None:
+        return None
+    entry = manifest['entries'].get(key)
+    if entry is None:
+        return None
+    signature = file_signature(os.path.join(data_dir, entry['source']))
+    if signature is None or list(signature) != entry['signature']:
+        return None
+    return entry
+
+
+def _load_array(data_dir, file_name):
+    return np.load(_store_path(data_dir, file_name), mmap_mode='r')
+
+
+# memory-mapped fields of a single ticker
+def read_ticker_arrays(data_dir, ticker):
+    """
+    Reads the compiled data of a ticker through memory maps.
+
+    Parameters:
+        data_dir (str): The data directory containing the compiled store.
+        ticker (str): The stock ticker symbol.
+
+    Returns:
+        tuple: The dates and the (len(TICKER_FIELDS), dates) values, as read_ticker_csv returns
+               them, or None if the ticker is not compiled or its csv changed since.
+    """
+    if _fresh_entry(data_dir, f'ticker:{ticker}') is None:
+        return None
+    return _load_array(data_dir, f'{ticker}.dates.npy'), _load_array(data_dir, f'{ticker}.fields.npy')
+
+
+# memory-mapped wide close price table
+def read_close_arrays(data_dir, name='API'):
+    """
+    Reads a compiled wide close price table through memory maps.
+
+    Parameters:
+        data_dir (str): The data directory containing the compiled store.
+        name (str, optional): The name of the source table.
+
+    Returns:
+        tuple: The dates, the tickers and the (tickers, dates) closes, as read_wide_csv returns
+               them, or None if the table is not compiled or its csv changed since.
+    """
+    entry = _fresh_entry(data_dir, f'wide:{name}')
+    if entry is None:
+        return None
+    return _load_array(data_dir, f'{name}.dates.npy'), entry['tickers'], _load_array(data_dir, f'{name}.close.npy')
+
+
+# the compiled store, then a temporary directory for data directories that cannot be written
+def _panel_dirs(data_dir):
+    key = hashlib.sha1(os.path.abspath(data_dir).encode()).hexdigest()[:12]
+    return [_store_path(data_dir), os.path.join(tempfile.gettempdir(), f'finvis-panel-{key}')]
+
+
+# save the arrays of an assembled price panel so other processes can map them
+def save_panel_arrays(data_dir, meta, arrays):
+    """
+    Saves the arrays of an assembled price panel to the compiled store, or to a temporary directory
+    when the data directory is read-only.
+
+    Parameters:
+        data_dir (str): The data directory the panel was built from.
+        meta (dict): The JSON description of the panel, including the 'version' of its sources.
+        arrays (dict): The arrays of the panel, keyed by the names of PANEL_ARRAYS.
+
+    Returns:
+        bool: True if the arrays were saved.
+    """
+    for directory in _panel_dirs(data_dir):
+        try:
+            os.makedirs(directory, exist_ok=True)
+            for name in PANEL_ARRAYS:
+                _save_array(os.path.join(directory, f'panel.{name}.npy'), arrays[name])
+            # the description goes last so readers never pair it with the arrays of another version
+            _save_json(os.path.join(directory, PANEL_META), meta)
+        except OSError:
+            continue
+        return True
+    return False
+
+
+# memory-mapped arrays of a saved price panel
+def read_panel_arrays(data_dir, version):
+    """
+    Reads the arrays of a saved price panel through memory maps.
+
+    Parameters:
+        data_dir (str): The data directory the panel was built from.
+        version (object): The JSON-serializable version of the sources the panel must match.
+
+    Returns:
+        tuple: The description and the arrays as save_panel_arrays received them, or None if no
+               panel of this version was saved.
+    """
+    version = json.loads(json.dumps(version))
+    for directory in _panel_dirs(data_dir):
+        try:
+            with open(os.path.join(directory, PANEL_META)) as f:
+                meta = json.load(f)
+            if meta.get('version') != version:
+                continue
+            arrays = {name: np.load(os.path.join(directory, f'panel.{name}.npy'), mmap_mode='r') for name in PANEL_ARRAYS}
+        except (OSError, ValueError):
+            continue
+        return meta, arrays
+    return None
+
+
+if __name__ == '__main__':
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    target = args[0] if args else os.environ.get('FINVIS_DATA_DIR', 'data')
+    updated = compile_price_store(target, force='--force' in sys.argv)
+    print(f'Compiled {len(updated)} entries into {_store_path(target)}')
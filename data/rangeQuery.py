@@ -0,0 +1,97 @@
+import numpy as np
+import pandas as pd
+
+
+class RangeIndex:
+    """
+    Numeric columns of a frame held as a matrix with a sorted index per column, answering
+    multi-range queries such as the brushes of a parallel coordinates plot.
+
+    Each range is located in its column's sorted values with two binary searches, so a query
+    costs O(log n) per range plus the size of the matching slices, and the ranges of all
+    columns are combined as boolean masks instead of sets of keys. Rows whose value is NaN never
+    match a range.
+    """
+
+    def __init__(self, frame, columns, key='Ticker'):
+        """
+        Parameters:
+            frame (DataFrame): The rows to index, one per key.
+            columns (list): The numeric columns that can be queried.
+            key (str, optional): The column identifying the rows.
+        """
+        self.columns = list(columns)
+        self.keys = pd.Index(frame[key].to_numpy())
+        self.values = frame[self.columns].to_numpy(dtype=np.float64)
+        # NaNs sort last, so the binary searches of finite bounds never reach them
+        self.order = np.argsort(self.values, axis=0, kind='stable')
+        self.sorted_values = np.take_along_axis(self.values, self.order, axis=0)
+        self._column_positions = {column: position for position, column in enumerate(self.columns)}
+
+    def __len__(self):
+        return len(self.keys)
+
+    def column_mask(self, column, ranges):
+        """
+        Finds the rows whose value in a column lies in any of the given ranges.
+
+        Parameters:
+            column (str): One of the indexed columns.
+            ranges (list): [low, high] pairs, bounds included.
+
+        Returns:
+            ndarray: A boolean mask over the rows.
+        """
+        position = self._column_positions[column]
+        sorted_values, order = self.sorted_values[:, position], self.order[:, position]
+        bounds = np.sort(np.asarray(ranges, dtype=np.float64).reshape(-1, 2), axis=1)
+        starts = np.searchsorted(sorted_values, bounds[:, 0], side='left')
+        stops = np.searchsorted(sorted_values, bounds[:, 1], side='right')
+        mask = np.zeros(len(self), dtype=bool)
+        for start, stop in zip(starts, stops):
+            mask[order[start:stop]] = True
+        return mask
+
+    def query(self, selections):
+        """
+        Finds the rows inside the selected ranges of every column.
+
+        Parameters:
+            selections (dict): Lists of [low, high] ranges by column; columns without ranges, or
+                               with None, are not filtered.
+
+        Returns:
+            ndarray: A boolean mask over the rows.
+        """
+        mask = np.ones(len(self), dtype=bool)
+        for column, ranges in selections.items():
+            if ranges:
+                mask &= self.column_mask(column, ranges)
+        return mask
+
+    def positions(self, keys):
+        """
+        Maps keys to their row positions.
+
+        Parameters:
+            keys (list): Keys, such as the ticker of every trace of a figure.
+
+        Returns:
+            ndarray: The row of each key, -1 for keys that are not indexed.
+        """
+        return self.keys.get_indexer(keys)
+
+    def lookup(self, mask, positions, fill=False):
+        """
+        Reads a row mask at the given positions.
+
+        Parameters:
+            mask (ndarray): A boolean mask over the rows, as returned by query.
+            positions (ndarray): Row positions, as returned by positions.
+            fill (bool, optional): The value of the positions of keys that are not indexed.
+
+        Returns:
+            ndarray: The mask value of every position.
+        """
+        # the position -1 of missing keys reads the appended fill value
+        return np.append(mask, fill)[positions]
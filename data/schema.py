@@ -0,0 +1,182 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+# Format of the dates of every csv export
+DATE_FORMAT = '%d/%m/%Y'
+
+# Whether close prices are held as float32 instead of float64, through the environment. Off by
+# default: prices then stay on the memory maps of the compiled store instead of being copied
+FLOAT32_FRAMES = os.environ.get('FINVIS_FLOAT32_FRAMES', '0') == '1'
+
+# Column types of the transaction csv. Repeated labels are categoricals, the exchange rate is a
+# number with 'Not available' as missing value, and the trailing unnamed column is not loaded
+TRANSACTION_DTYPES = {
+    'No.': 'int32', 'Account Number': 'int32', 'Action': 'category', 'Ticker': 'category',
+    'Name': 'category', 'Currency (Price / share)': 'category', 'Exchange rate': 'float64',
+    'Currency (Withholding tax)': 'category',
+}
+TRANSACTION_NA_VALUES = {'Exchange rate': ['Not available']}
+
+# Column types of stock_time.csv and its date columns
+INVESTMENT_DATE_DTYPES = {'Ticker': 'category', 'Last Action': 'category'}
+INVESTMENT_DATE_COLUMNS = ['Start Date', 'End Date']
+
+
+def _named_column(column):
+    return not column.startswith('Unnamed:')
+
+
+# read a csv with the column types of its schema
+def read_typed_csv(source, dtypes, date_columns=(), na_values=None, drop_unnamed=False):
+    """
+    Reads a csv file with explicit column types and dates in DATE_FORMAT.
+
+    Parameters:
+        source (str or file): The path or a file object of the csv.
+        dtypes (dict): The type of each column, columns not listed are inferred.
+        date_columns (list, optional): The columns holding dates.
+        na_values (dict, optional): Extra missing value markers by column.
+        drop_unnamed (bool, optional): Whether to skip columns without a header, such as the one
+                                       a trailing comma creates.
+
+    Returns:
+        DataFrame: The typed frame.
+    """
+    df = pd.read_csv(source, dtype=dtypes, na_values=na_values, usecols=_named_column if drop_unnamed else None)
+    return parse_dates(df, date_columns)
+
+
+def parse_dates(df, columns, date_format=DATE_FORMAT):
+    """
+    Parses date columns in place with an exact format, which is much faster than inferring it.
+
+    Parameters:
+        df (DataFrame): The frame.
+        columns (list): The columns to parse.
+        date_format (str, optional): The strptime format of the dates.
+
+    Returns:
+        DataFrame: The same frame.
+    """
+    for column in columns:
+        if column in df.columns and df[column].dtype.kind != 'M':
+            df[column] = pd.to_datetime(df[column], format=date_format)
+    return df
+
+
+def read_transactions(source):
+    """
+    Reads the transaction csv with TRANSACTION_DTYPES.
+
+    Parameters:
+        source (str or file): The path or a file object of the csv.
+
+    Returns:
+        DataFrame: The raw ledger rows, dates not yet parsed.
+    """
+    return read_typed_csv(source, TRANSACTION_DTYPES, na_values=TRANSACTION_NA_VALUES, drop_unnamed=True)
+
+
+def month_categories(dates):
+    """
+    Labels dates with their 'YYYY-MM' month as a categorical, formatting each distinct month once.
+
+    The categories are sorted, so grouping by the labels orders the months in time.
+
+    Parameters:
+        dates (Series): A datetime Series.
+
+    Returns:
+        Series: The categorical month of each date, NaN where the date is missing.
+    """
+    codes, months = pd.factorize(dates.to_numpy().astype('datetime64[M]'), sort=True)
+    labels = pd.DatetimeIndex(months).strftime('%Y-%m')
+    # missing dates have code -1, which Categorical reads as NaN
+    return pd.Series(pd.Categorical.from_codes(codes, categories=labels), index=dates.index)
+
+
+def union_categories(left, right):
+    """
+    Gives the categorical columns of two frames the same categories, so concatenating them keeps
+    the columns categorical instead of falling back to object.
+
+    Parameters:
+        left (DataFrame): The first frame.
+        right (DataFrame): The second frame, with the same columns.
+
+    Returns:
+        tuple: The two frames, copied only when their categories had to change.
+    """
+    changed_left, changed_right = {}, {}
+    for column in left.columns:
+        if column not in right.columns:
+            continue
+        left_dtype, right_dtype = left[column].dtype, right[column].dtype
+        if not isinstance(left_dtype, pd.CategoricalDtype) and not isinstance(right_dtype, pd.CategoricalDtype):
+            continue
+        left_values = left[column] if isinstance(left_dtype, pd.CategoricalDtype) else left[column].astype('category')
+        right_values = right[column] if isinstance(right_dtype, pd.CategoricalDtype) else right[column].astype('category')
+        categories = left_values.cat.categories.union(right_values.cat.categories)
+        if not (isinstance(left_dtype, pd.CategoricalDtype) and left_dtype.categories.equals(categories)):
+            changed_left[column] = left_values.cat.set_categories(categories)
+        if not (isinstance(right_dtype, pd.CategoricalDtype) and right_dtype.categories.equals(categories)):
+            changed_right[column] = right_values.cat.set_categories(categories)
+    if changed_left:
+        left = left.assign(**changed_left)
+    if changed_right:
+        right = right.assign(**changed_right)
+    return left, right
+
+
+def price_frame(df):
+    """
+    Casts a frame of prices to float32 when FLOAT32_FRAMES is set.
+
+    Volumes keep float64, float32 only counts whole shares exactly up to 16 million.
+
+    Parameters:
+        df (DataFrame): Prices, with an optional datetime 'Date' and 'Volume' column.
+
+    Returns:
+        DataFrame: The frame, or a copy with float32 prices.
+    """
+    if not FLOAT32_FRAMES:
+        return df
+    floats = df.select_dtypes('float64').columns.drop('Volume', errors='ignore')
+    return df.astype({column: np.float32 for column in floats}) if len(floats) else df
+
+
+# resident size of each loaded frame
+def memory_report(frames):
+    """
+    Summarizes how much memory loaded frames hold.
+
+    Parameters:
+        frames (dict): DataFrames by name.
+
+    Returns:
+        DataFrame: Rows, columns, total MB, MB held by object columns and the largest column of
+                   each frame, largest frame first.
+    """
+    rows = []
+    for name, df in frames.items():
+        usage = df.memory_usage(index=True, deep=True)
+        objects = sum(usage[column] for column in df.columns[df.dtypes == object])
+        column_usage = usage.drop('Index')
+        rows.append({'frame': name, 'rows': len(df), 'columns': len(df.columns), 'MB': usage.sum() / 2 ** 20,
+                     'object MB': objects / 2 ** 20,
+                     'largest column': column_usage.idxmax() if len(column_usage) else None})
+    report = pd.DataFrame(rows, columns=['frame', 'rows', 'columns', 'MB', 'object MB', 'largest column'])
+    return report.set_index('frame').sort_values('MB', ascending=False)
+
+
+if __name__ == '__main__':
+    from data.dataManage import DATA_DIR, load_company_data, load_investment_data, load_investment_dates, load_stock_close_data
+    from data.transactionCube import transaction_cube
+    print(f'Frames loaded from {DATA_DIR}')
+    transactions = load_investment_data()
+    print(memory_report({'transactions': transactions, 'transaction cube': transaction_cube(transactions),
+                         'close prices': load_stock_close_data(), 'investment dates': load_investment_dates(),
+                         'companies': load_company_data()}).round(3).to_string())
@@ -0,0 +1,471 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from data.dataManage import prepare_transactions
+from data.portfolioAccounting import build_company_data, pool_trades
+from data.transactionIndex import index_transactions
+
+# Trading days per year of the generated price history
+TRADING_DAYS = 252
+
+# Columns of Investment Transaction.csv; every row ends with an empty trailing column
+LEDGER_COLUMNS = [
+    'No.', 'Account Number', 'Action', 'Transaction Date', 'Time', 'Ticker', 'Name', 'No. of shares',
+    'Price / share', 'Currency (Price / share)', 'Exchange rate', 'Result(GBP)', 'Total (GBP)',
+    'Withholding tax', 'Currency (Withholding tax)', 'Charge amount (GBP)', 'Deposit fee(GBP)',
+    'Transaction fee(GBP)', 'Finra fee(GBP)', 'Currency conversion fee(GBP)', 'Stamp duty reserve tax (GBP)',
+]
+
+# Ledger columns left empty rather than 0 on rows they do not apply to
+_TEXT_COLUMNS = ['Currency (Price / share)', 'Exchange rate', 'Currency (Withholding tax)']
+
+# Columns of Investment Company.csv, 'Unnamed: 22' holds the last action of the ticker
+COMPANY_COLUMNS = [
+    'Ticker Index', 'Company Name', 'Unnamed: 22', 'Ticker', 'Average Price per Share', 'Date of First Purchase',
+    'Date of Last Purchase', 'Total Number of Shares Purchased', 'Total Purchase Amount', 'Date of First Sell',
+    'Date of Last Sell', 'Total Number of Shares Sold', 'Total Sales Amount', 'Average Sale Price per Share',
+    'Net Total Number of Shares', 'Current Share Price', 'Total Dividends', 'Realized Capital Gain & Loss',
+    'Result Realized Capital Gain & Loss', 'Unrealized Capital Gain & Loss', 'Notes', 'Start Date', 'End Date',
+    'Average Price', 'Average',
+]
+
+# Split ratios drawn for synthetic splits, as (new shares, old shares)
+SPLIT_RATIOS = np.array([[2, 1], [3, 1], [4, 1], [3, 2], [1, 4], [1, 10]])
+
+# Suffixes of the synthetic company names
+_NAME_SUFFIXES = np.array(['Holdings', 'Group', 'Industries', 'Technologies', 'Realty', 'Energy', 'Financial', 'Brands'])
+
+# Fraction of tickers quoted in pence on the London exchange, the others trade in USD
+GBX_SHARE = 0.15
+
+# Withholding tax deducted from USD dividends and the fees charged on trades
+WITHHOLDING_RATE = 0.15
+FX_FEE_RATE = 0.0015
+STAMP_DUTY_RATE = 0.005
+
+# Account numbers of the generated accounts, the first two match the shipped ledger
+_FIRST_ACCOUNT = 2131
+
+
+# unique upper-case ticker symbols, 'Null' is reserved for cash rows
+def ticker_symbols(count):
+    """
+    Builds distinct ticker symbols of three or more letters.
+
+    Parameters:
+        count (int): The number of symbols.
+
+    Returns:
+        ndarray: The symbols.
+    """
+    width = max(3, int(np.ceil(np.log(count + 2) / np.log(26))))
+    codes = np.arange(count + 1)[:, None] // 26 ** np.arange(width - 1, -1, -1) % 26
+    letters = np.array(list('ABCDEFGHIJKLMNOPQRSTUVWXYZ'))[codes]
+    symbols = np.array([''.join(row) for row in letters])
+    return symbols[symbols != 'NULL'][:count]
+
+
+def _format_dates(dates):
+    return pd.DatetimeIndex(dates).strftime('%d/%m/%Y').to_numpy(dtype=object)
+
+
+def _format_times(seconds):
+    return pd.to_timedelta(seconds, unit='s').astype(str).str[-8:].to_numpy(dtype=object)
+
+
+# daily split-adjusted prices, splits and dividends of every ticker
+def simulate_market(rng, dates, n_tickers, split_rate=0.04, dividend_share=0.6):
+    """
+    Simulates the split-adjusted daily prices of a universe of tickers as geometric random walks.
+
+    Some tickers list part way through the period and have no price before. Splits happen at
+    split_rate per ticker and year and do not move the adjusted price; the unadjusted price on a
+    day is the adjusted one times the product of the ratios of the later splits. Dividend payers
+    pay every quarter a yield drawn per ticker.
+
+    Parameters:
+        rng (Generator): The random number generator.
+        dates (DatetimeIndex): The trading days.
+        n_tickers (int): The number of tickers.
+        split_rate (float, optional): Expected splits per ticker and year.
+        dividend_share (float, optional): Fraction of tickers paying dividends.
+
+    Returns:
+        dict: 'close' (days x tickers adjusted closes, NaN before listing), 'factor' (days x tickers
+              split factors), 'listing' (first trading day of each ticker), 'splits' (day, ticker,
+              new, old arrays) and 'dividends' (day, ticker, adjusted dividend per share arrays).
+    """
+    n_days = len(dates)
+    drift = rng.normal(0.07, 0.1, n_tickers)
+    volatility = rng.uniform(0.15, 0.6, n_tickers)
+    steps = rng.standard_normal((n_days, n_tickers)) * (volatility / np.sqrt(TRADING_DAYS))
+    steps += (drift - volatility ** 2 / 2) / TRADING_DAYS
+    steps[0] = 0.0
+    close = np.exp(rng.normal(3.5, 1.0, n_tickers) + np.cumsum(steps, axis=0))
+
+    late = rng.random(n_tickers) < 0.3
+    listing = np.where(late, rng.integers(0, max(n_days // 2, 1), n_tickers), 0)
+    listed = np.arange(n_days)[:, None] >= listing
+    close[~listed] = np.nan
+
+    split_days, split_tickers = np.nonzero((rng.random((n_days, n_tickers)) < split_rate / TRADING_DAYS)
+                                           & (np.arange(n_days)[:, None] > listing))
+    new, old = SPLIT_RATIOS[rng.integers(0, len(SPLIT_RATIOS), len(split_days))].T
+    ratios = np.ones((n_days, n_tickers))
+    ratios[split_days, split_tickers] = new / old
+    # product of the ratios of the splits after each day
+    factor = np.cumprod(ratios[::-1], axis=0)[::-1] / ratios
+
+    payers = rng.random(n_tickers) < dividend_share
+    quarter = TRADING_DAYS // 4
+    offset = rng.integers(0, quarter, n_tickers)
+    paid = ((np.arange(n_days)[:, None] - offset) % quarter == 0) & payers & listed
+    dividend_days, dividend_tickers = np.nonzero(paid)
+    dividend_yield = rng.uniform(0.01, 0.06, n_tickers)[dividend_tickers]
+    unadjusted = close[dividend_days, dividend_tickers] * factor[dividend_days, dividend_tickers]
+    per_share = np.maximum(np.round(unadjusted * dividend_yield / 4, 4), 0.0001)
+
+    return {
+        'close': close, 'factor': factor, 'listing': listing,
+        'splits': (split_days, split_tickers, new, old),
+        'dividends': (dividend_days, dividend_tickers, per_share / factor[dividend_days, dividend_tickers]),
+    }
+
+
+# buys and sells of every ticker that never sell more shares than are held
+def simulate_trades(rng, close, factor, listing, trades_per_ticker=8, exit_rate=0.15):
+    """
+    Simulates the buys and sells of every ticker.
+
+    Each trade moves the position to a random target size, or to zero for a full exit, so sells
+    are bounded by the holding by construction. Targets are set in post-split shares and the
+    traded quantities are stated in the shares of the trade day to six decimals, buys rounded up
+    and partial sells rounded down, so rounding never leaves fewer shares than the targets; full
+    exits sell exactly what is held.
+
+    Parameters:
+        rng (Generator): The random number generator.
+        close (ndarray): Days x tickers adjusted closes.
+        factor (ndarray): Days x tickers split factors.
+        listing (ndarray): The first trading day of each ticker.
+        trades_per_ticker (float, optional): Average number of trades per ticker.
+        exit_rate (float, optional): Probability that a trade closes the position.
+
+    Returns:
+        dict: Arrays in (ticker, day, time) order: 'ticker', 'day', 'seconds', 'sell', 'shares'
+              (shares of the trade day), 'adjusted' (signed post-split shares) and 'held' (post-split
+              shares held after the trade).
+    """
+    n_days, n_tickers = close.shape
+    counts = 1 + rng.poisson(max(trades_per_ticker - 1, 0), n_tickers)
+    ticker = np.repeat(np.arange(n_tickers), counts)
+    day = listing[ticker] + (rng.random(len(ticker)) * (n_days - listing[ticker])).astype(np.int64)
+    seconds = rng.integers(8 * 3600, 21 * 3600, len(ticker))
+    order = np.lexsort((seconds, day, ticker))
+    ticker, day, seconds = ticker[order], day[order], seconds[order]
+    new_ticker = np.r_[True, ticker[1:] != ticker[:-1]]
+
+    target = rng.lognormal(np.log(2000), 0.8, len(ticker)) / close[day, ticker]
+    exit_ = (rng.random(len(ticker)) < exit_rate) & ~new_ticker
+    target[exit_] = 0.0
+    previous = np.where(new_ticker, 0.0, np.r_[0.0, target[:-1]])
+    intended = target - previous
+
+    day_factor = factor[day, ticker]
+    sell = intended < 0
+    shares = np.abs(intended) / day_factor
+    shares = np.where(sell, np.floor(shares * 1e6), np.ceil(shares * 1e6)) / 1e6
+    # rounding only ever adds to the position; the surplus carried into an exit is sold with it
+    surplus = np.where(sell, -shares, shares) * day_factor - intended
+    run = pd.Series(np.cumsum(new_ticker | np.r_[False, exit_[:-1]]))
+    carried = pd.Series(surplus).groupby(run).cumsum().to_numpy() - surplus
+    shares = np.where(exit_, (previous + carried) / day_factor, shares)
+
+    adjusted = np.where(sell, -shares, shares) * day_factor
+    keep = shares > 0
+    ticker, day, seconds, sell, shares, adjusted = (values[keep] for values in (ticker, day, seconds, sell, shares, adjusted))
+    held = pd.Series(adjusted).groupby(ticker).cumsum().to_numpy()
+    return {'ticker': ticker, 'day': day, 'seconds': seconds, 'sell': sell, 'shares': shares,
+            'adjusted': adjusted, 'held': held}
+
+
+def _ledger_rows(count, **columns):
+    rows = pd.DataFrame({column: np.zeros(count, dtype=np.int64) for column in LEDGER_COLUMNS if column not in _TEXT_COLUMNS})
+    for column in _TEXT_COLUMNS:
+        rows[column] = np.full(count, np.nan, dtype=object)
+    for column, values in columns.items():
+        rows[column] = values
+    return rows[LEDGER_COLUMNS]
+
+
+# cash movements of every account, sized to fund its trades
+def _cash_rows(rng, dates, trades, accounts):
+    months = dates.to_numpy().astype('datetime64[M]')
+    month_start = np.flatnonzero(np.r_[True, months[1:] != months[:-1]])
+    month_end = np.r_[month_start[1:] - 1, len(dates) - 1]
+    month_of_day = np.cumsum(np.r_[True, months[1:] != months[:-1]]) - 1
+
+    spend = trades.groupby([trades['Account Number'], month_of_day[trades['day']]])['Total (GBP)'].sum()
+    spend = spend.unstack(fill_value=0.0).reindex(columns=range(len(month_start)), fill_value=0.0)
+    account_index, month_index = np.nonzero(spend.to_numpy() > 0)
+    amount = np.ceil(spend.to_numpy()[account_index, month_index] / 50 + 2) * 50
+    deposits = _ledger_rows(len(amount), **{
+        'Account Number': spend.index.to_numpy()[account_index], 'Action': 'Deposit',
+        'Total (GBP)': amount, 'Charge amount (GBP)': amount})
+    deposits['day'] = month_start[month_index]
+    deposits['seconds'] = rng.integers(7 * 3600, 8 * 3600, len(deposits))
+
+    account_index, month_index = np.nonzero(np.ones((len(accounts), len(month_start)), dtype=bool))
+    interest = np.round(rng.uniform(0.01, 2.0, len(month_index)), 2)
+    interests = _ledger_rows(len(interest), **{
+        'Account Number': accounts[account_index], 'Action': 'Interest on cash',
+        'Total (GBP)': interest, 'Charge amount (GBP)': interest})
+    interests['day'] = month_end[month_index]
+    interests['seconds'] = 21 * 3600 + rng.integers(0, 3600, len(interests))
+
+    withdrawn = rng.random(len(month_index)) < 0.02
+    withdrawals = _ledger_rows(int(withdrawn.sum()), **{
+        'Account Number': accounts[account_index[withdrawn]], 'Action': 'Withdrawal',
+        'Total (GBP)': np.round(rng.uniform(1, 100, int(withdrawn.sum())), 2)})
+    withdrawals['day'] = month_end[month_index[withdrawn]]
+    withdrawals['seconds'] = rng.integers(9 * 3600, 17 * 3600, len(withdrawals))
+    return pd.concat([deposits, interests, withdrawals], ignore_index=True)
+
+
+# the transaction ledger of the simulated trades, dividends and cash movements
+def build_ledger(rng, dates, market, trades, tickers, names, currencies, accounts):
+    """
+    Builds the rows of Investment Transaction.csv.
+
+    Trades are priced at the unadjusted close of their day and converted to GBP at the day's rate,
+    with currency conversion fees on USD trades and stamp duty on GBX buys. Holders on a dividend
+    day receive the dividend net of withholding tax on USD dividends. Each account receives a
+    monthly deposit covering its net purchases of the month and monthly interest. Sells carry the
+    result of the average-cost pool in 'Result(GBP)'.
+
+    Parameters:
+        rng (Generator): The random number generator.
+        dates (DatetimeIndex): The trading days.
+        market (dict): The market returned by simulate_market.
+        trades (dict): The trades returned by simulate_trades.
+        tickers (ndarray): The ticker symbols.
+        names (ndarray): The company names.
+        currencies (ndarray): The price currency of each ticker, 'USD' or 'GBX'.
+        accounts (ndarray): The account of each ticker.
+
+    Returns:
+        DataFrame: The ledger with LEDGER_COLUMNS, numbered in date and time order.
+    """
+    close, factor = market['close'], market['factor']
+    usd_rate = np.round(1.3 * np.exp(np.cumsum(rng.normal(0, 0.004, len(dates)))), 5)
+    gbx = currencies == 'GBX'
+
+    ticker, day, sell = trades['ticker'], trades['day'], trades['sell']
+    price = np.round(close[day, ticker] * factor[day, ticker], 2)
+    rate = np.where(gbx[ticker], 100.0, usd_rate[day])
+    gross = trades['shares'] * price / rate
+    fx_fee = np.where(gbx[ticker], 0.0, np.round(gross * FX_FEE_RATE, 2))
+    stamp_duty = np.where(gbx[ticker] & ~sell, np.round(gross * STAMP_DUTY_RATE, 2), 0.0)
+    trade_rows = _ledger_rows(len(ticker), **{
+        'Account Number': accounts[ticker], 'Action': np.where(sell, 'Market sell', 'Market buy'),
+        'Ticker': tickers[ticker], 'Name': names[ticker], 'No. of shares': trades['shares'],
+        'Price / share': price, 'Currency (Price / share)': currencies[ticker],
+        'Exchange rate': np.where(gbx[ticker], '100', pd.Series(rate).map('{:.5f}'.format).to_numpy()),
+        'Total (GBP)': np.round(np.where(sell, gross - fx_fee, gross + fx_fee + stamp_duty), 2),
+        'Currency conversion fee(GBP)': fx_fee, 'Stamp duty reserve tax (GBP)': stamp_duty})
+    trade_rows['day'], trade_rows['seconds'] = day, trades['seconds']
+    trade_rows['adjusted'] = np.abs(trades['adjusted'])
+
+    # holding of each ticker at the start of its dividend days
+    dividend_days, dividend_tickers, adjusted_dividend = market['dividends']
+    trade_keys = ticker.astype(np.int64) * len(dates) + day
+    last_trade = np.searchsorted(trade_keys, dividend_tickers.astype(np.int64) * len(dates) + dividend_days) - 1
+    holder = (last_trade >= 0) & (ticker[np.maximum(last_trade, 0)] == dividend_tickers)
+    held = np.where(holder, trades['held'][np.maximum(last_trade, 0)], 0.0)
+    paid = held > 1e-6
+    day_factor = factor[dividend_days, dividend_tickers][paid]
+    held_shares = np.round(held[paid] / day_factor, 6)
+    per_share = np.round(adjusted_dividend[paid] * day_factor, 4)
+    paid_tickers, paid_days = dividend_tickers[paid], dividend_days[paid]
+    gross = held_shares * per_share
+    withholding = np.where(gbx[paid_tickers], 0.0, np.round(gross * WITHHOLDING_RATE, 2))
+    dividend_rows = _ledger_rows(len(held_shares), **{
+        'Account Number': accounts[paid_tickers], 'Action': 'Dividend (Ordinary)',
+        'Ticker': tickers[paid_tickers], 'Name': names[paid_tickers], 'No. of shares': held_shares,
+        'Price / share': per_share, 'Currency (Price / share)': currencies[paid_tickers],
+        'Exchange rate': 'Not available',
+        'Total (GBP)': np.round((gross - withholding) / np.where(gbx[paid_tickers], 100.0, usd_rate[paid_days]), 2),
+        'Withholding tax': withholding, 'Currency (Withholding tax)': currencies[paid_tickers]})
+    dividend_rows['day'] = paid_days
+    dividend_rows['seconds'] = rng.integers(8 * 3600, 10 * 3600, len(dividend_rows))
+
+    cash_rows = _cash_rows(rng, dates, trade_rows, np.unique(accounts))
+    cash_rows[['Ticker', 'Name']] = 'Null'
+    ledger = pd.concat([trade_rows, dividend_rows, cash_rows], ignore_index=True)
+    ledger = ledger.sort_values(['day', 'seconds'], kind='stable', ignore_index=True)
+
+    is_trade = ledger['Action'].isin(['Market buy', 'Market sell'])
+    pool = pool_trades(pd.DataFrame({
+        'Ticker': ledger.loc[is_trade, 'Ticker'],
+        'Action Type': np.where(ledger.loc[is_trade, 'Action'] == 'Market sell', 'sell', 'buy'),
+        'No. of shares': ledger.loc[is_trade, 'adjusted'], 'Total (GBP)': ledger.loc[is_trade, 'Total (GBP)']}))
+    ledger['Result(GBP)'] = np.round(pool['Realized'], 2).reindex(ledger.index, fill_value=0.0)
+
+    ledger['No.'] = np.arange(1, len(ledger) + 1)
+    ledger['Transaction Date'] = _format_dates(dates[ledger['day'].to_numpy()])
+    ledger['Time'] = _format_times(ledger['seconds'].to_numpy())
+    return ledger[LEDGER_COLUMNS]
+
+
+# the company data with the metrics the app derives from the ledger
+def build_company_table(ledger, close_df, tickers, names, notes):
+    """
+    Builds the rows of Investment Company.csv for the traded tickers.
+
+    Parameters:
+        ledger (DataFrame): The ledger returned by build_ledger.
+        close_df (DataFrame): Adjusted closes indexed by date with one column per ticker.
+        tickers (ndarray): The ticker symbols.
+        names (ndarray): The company names.
+        notes (ndarray): The split notes of each ticker, NaN without splits.
+
+    Returns:
+        DataFrame: The company data with COMPANY_COLUMNS.
+    """
+    transactions = index_transactions(prepare_transactions(ledger.copy()))
+    trades = transactions[transactions['Action Type'].isin(['buy', 'sell'])]
+    last_action = trades.groupby(trades['Ticker'].astype(object))['Action Type'].last().str.capitalize()
+    traded = np.isin(tickers, last_action.index)
+    company = pd.DataFrame({'Ticker Index': np.arange(traded.sum()), 'Company Name': names[traded],
+                            'Unnamed: 22': last_action.reindex(tickers[traded]).to_numpy(),
+                            'Ticker': tickers[traded], 'Notes': notes[traded]})
+    company = build_company_data(transactions, close_df, company)
+
+    sold = company['Average Sale Price per Share'] > 0
+    company['Average Price'] = np.round(np.where(sold, (company['Average Price per Share']
+                                                        + company['Average Sale Price per Share']) / 2,
+                                                 company['Average Price per Share']), 2)
+    # mean close over the holding period, from running sums of the close prices
+    values = close_df[company['Ticker']].to_numpy()
+    sums = np.vstack([np.zeros(values.shape[1]), np.nancumsum(values, axis=0)])
+    counts = np.vstack([np.zeros(values.shape[1]), np.cumsum(~np.isnan(values), axis=0)])
+    start = close_df.index.searchsorted(pd.to_datetime(company['Start Date'], format='%d/%m/%Y'))
+    end = close_df.index.searchsorted(pd.to_datetime(company['End Date'], format='%d/%m/%Y'), side='right')
+    columns = np.arange(values.shape[1])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        company['Average'] = ((sums[end, columns] - sums[start, columns])
+                              / (counts[end, columns] - counts[start, columns]))
+    return company[COMPANY_COLUMNS]
+
+
+def _split_notes(dates, tickers, splits):
+    days, split_tickers, new, old = splits
+    notes = np.full(len(tickers), np.nan, dtype=object)
+    text = pd.Series([f'The split for {tickers[ticker]} took place on {dates[day]:%B %d, %Y}. '
+                      f'This was a {n} for {o}{" reverse" if n < o else ""} split.'
+                      for day, ticker, n, o in zip(days, split_tickers, new, old)], dtype=object)
+    joined = text.groupby(split_tickers).agg(' '.join)
+    notes[joined.index.to_numpy()] = joined.to_numpy()
+    return notes
+
+
+# the daily prices file of every ticker
+def _write_ticker_files(out_dir, rng, dates, market, tickers):
+    close = market['close']
+    n_days, n_tickers = close.shape
+    previous = np.vstack([close[:1], close[:-1]])
+    open_ = previous * np.exp(rng.normal(0, 0.005, close.shape))
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.01, close.shape)))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.01, close.shape)))
+    # rounding up front lets to_csv write the shortest repr instead of formatting every value
+    open_, high, low, close = (np.round(values, 4) for values in (open_, high, low, close))
+    volume = rng.lognormal(14, 1, close.shape).astype(np.int64)
+    dividends = np.zeros(close.shape)
+    dividend_days, dividend_tickers, adjusted_dividend = market['dividends']
+    dividends[dividend_days, dividend_tickers] = np.round(adjusted_dividend, 6)
+    splits = np.zeros(close.shape)
+    split_days, split_tickers, new, old = market['splits']
+    splits[split_days, split_tickers] = new / old
+
+    formatted = _format_dates(dates)
+    for index, ticker in enumerate(tickers):
+        rows = slice(market['listing'][index], n_days)
+        pd.DataFrame({'Date': formatted[rows], 'Open': open_[rows, index], 'High': high[rows, index],
+                      'Low': low[rows, index], 'Close': close[rows, index], 'Volume': volume[rows, index],
+                      'Dividends': dividends[rows, index], 'Stock Splits': splits[rows, index]}) \
+            .to_csv(os.path.join(out_dir, f'{ticker}_stock_data.csv'), index=False)
+
+
+def generate_dataset(out_dir, n_tickers=100, years=10, n_accounts=2, trades_per_ticker=8, seed=0,
+                     end='2024-03-11', overwrite=False):
+    """
+    Writes a synthetic dataset with the files and schemas of the data directory.
+
+    The same arguments always produce the same files. Point the app at the result with the
+    FINVIS_DATA_DIR environment variable.
+
+    Parameters:
+        out_dir (str): The directory to write the csv files to.
+        n_tickers (int, optional): The number of tickers.
+        years (float, optional): The length of the price history in years.
+        n_accounts (int, optional): The number of accounts the tickers are spread over.
+        trades_per_ticker (float, optional): Average number of trades per ticker.
+        seed (int, optional): The seed of the random number generator.
+        end (str, optional): The last trading day.
+        overwrite (bool, optional): Whether to replace a dataset already in out_dir.
+
+    Returns:
+        str: out_dir.
+    """
+    if not overwrite and os.path.exists(os.path.join(out_dir, 'Investment Transaction.csv')):
+        raise FileExistsError(f'{out_dir} already holds a dataset, pass overwrite=True to replace it')
+    os.makedirs(out_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(end=end, periods=max(int(years * TRADING_DAYS), 2))
+
+    tickers = ticker_symbols(n_tickers)
+    names = np.char.add(np.char.add(tickers.astype(str), ' '), rng.choice(_NAME_SUFFIXES, n_tickers)).astype(object)
+    currencies = np.where(rng.random(n_tickers) < GBX_SHARE, 'GBX', 'USD').astype(object)
+    accounts = (_FIRST_ACCOUNT - 2 * np.arange(n_accounts))[rng.integers(0, n_accounts, n_tickers)]
+
+    market = simulate_market(rng, dates, n_tickers)
+    trades = simulate_trades(rng, market['close'], market['factor'], market['listing'], trades_per_ticker)
+    ledger = build_ledger(rng, dates, market, trades, tickers, names, currencies, accounts)
+    ledger.assign(**{'': ''}).to_csv(os.path.join(out_dir, 'Investment Transaction.csv'), index=False,
+                                     lineterminator='\r\n')
+
+    close_df = pd.DataFrame(np.round(market['close'], 4), index=dates, columns=tickers)
+    company = build_company_table(ledger, close_df, tickers, names, _split_notes(dates, tickers, market['splits']))
+    company.to_csv(os.path.join(out_dir, 'Investment Company.csv'), index=False)
+    company[['Ticker', 'Start Date', 'End Date']].assign(**{'Last Action': company['Unnamed: 22']}) \
+        .sort_values('Ticker').to_csv(os.path.join(out_dir, 'stock_time.csv'), index=False)
+
+    wide = close_df.copy()
+    wide.index = _format_dates(dates)
+    for name in ('API', 'stock_close'):
+        wide.to_csv(os.path.join(out_dir, f'{name}.csv'), index_label='Date')
+    _write_ticker_files(out_dir, rng, dates, market, tickers)
+    return out_dir
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Generate a synthetic FinVis dataset.')
+    parser.add_argument('out_dir', help='directory to write the csv files to')
+    parser.add_argument('--tickers', type=int, default=100, help='number of tickers')
+    parser.add_argument('--years', type=float, default=10, help='years of daily prices')
+    parser.add_argument('--accounts', type=int, default=2, help='number of accounts')
+    parser.add_argument('--trades', type=float, default=8, help='average number of trades per ticker')
+    parser.add_argument('--seed', type=int, default=0, help='random seed')
+    parser.add_argument('--end', default='2024-03-11', help='last trading day')
+    parser.add_argument('--overwrite', action='store_true', help='replace an existing dataset')
+    args = parser.parse_args(argv)
+    generate_dataset(args.out_dir, args.tickers, args.years, args.accounts, args.trades, args.seed, args.end,
+                     args.overwrite)
+    print(f'Wrote {args.tickers} tickers over {args.years:g} years to {args.out_dir}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+import pandas as pd
+from data.schema import union_categories
+
+# Dimensions and measures of the monthly transaction cube
+CUBE_KEYS = ['Month_Year', 'Account Number', 'Ticker', 'Action', 'Action Type']
+CUBE_VALUES = ['No. of shares', 'Total (GBP)']
+
+
+# aggregate transactions into one row per month, account, ticker and action
+def build_cube(df):
+    """
+    Aggregates transactions into the monthly transaction cube.
+
+    The cube has the same column names as the ledger, so the filter and aggregate functions of
+    dataManage work on cube slices and only scan one row per (month, account, ticker, action).
+
+    Parameters:
+        df (DataFrame): Transactions with 'Month_Year' and a normalized 'Action Type'.
+
+    Returns:
+        DataFrame: The cube with the CUBE_KEYS columns and the summed CUBE_VALUES columns.
+    """
+    return df.groupby(CUBE_KEYS, observed=True, dropna=False)[CUBE_VALUES].sum().reset_index()
+
+
+# fold newly arrived transactions into an existing cube
+def extend_cube(cube, new_rows):
+    """
+    Adds new transactions to a cube.
+
+    Only the new rows are aggregated, then merged with the existing cells, so the cost depends
+    on the number of new rows and cube cells rather than on the size of the ledger.
+
+    Parameters:
+        cube (DataFrame): The cube of the transactions already loaded.
+        new_rows (DataFrame): The new transactions, with the same columns as the ledger.
+
+    Returns:
+        DataFrame: A new cube covering both.
+    """
+    if len(new_rows) == 0:
+        return cube
+    # concat falls back to object when the categories differ, so the keys share them first
+    merged = pd.concat(union_categories(cube, build_cube(new_rows)), ignore_index=True)
+    return build_cube(merged)
+
+
+def transaction_cube(df):
+    """
+    Returns the monthly transaction cube of a ledger.
+
+    The cube of a TransactionFrame is built on first use and kept on the frame.
+
+    Parameters:
+        df (DataFrame): The transactions, usually the TransactionFrame from load_investment_data.
+
+    Returns:
+        DataFrame: The monthly transaction cube, shared with the frame and not to be modified.
+    """
+    cube = getattr(df, '_cube', None)
+    if cube is None:
+        cube = build_cube(df)
+        if '_cube' in getattr(df, '_metadata', ()):
+            df._cube = cube
+    return cube
@@ -0,0 +1,188 @@
+import numpy as np
+import pandas as pd
+from data.transactionCube import extend_cube
+from data.schema import union_categories
+
+# Normalized transaction kinds stored in the 'Action Type' column
+ACTION_TYPES = ['buy', 'sell', 'dividend', 'capital return', 'deposit', 'withdrawal', 'interest', 'other']
+
+
+# map a raw broker action such as 'Market buy' or 'Dividend (Ordinary)' to its normalized kind
+def normalize_action(action):
+    """
+    Normalizes a raw transaction action.
+
+    Parameters:
+        action (str): The action as exported by the broker.
+
+    Returns:
+        str: One of ACTION_TYPES.
+    """
+    action = str(action).lower()
+    if 'buy' in action:
+        return 'buy'
+    if 'sell' in action:
+        return 'sell'
+    if 'return of capital' in action:
+        return 'capital return'
+    if action.startswith('dividend'):
+        return 'dividend'
+    if 'deposit' in action:
+        return 'deposit'
+    if 'withdraw' in action:
+        return 'withdrawal'
+    if 'interest' in action:
+        return 'interest'
+    return 'other'
+
+
+def normalize_actions(actions):
+    """
+    Normalizes a column of raw actions, classifying each distinct action only once.
+
+    Parameters:
+        actions (Series): The raw 'Action' column.
+
+    Returns:
+        Categorical: The normalized kinds with ACTION_TYPES as categories.
+    """
+    codes, uniques = pd.factorize(actions)
+    kinds = np.array([normalize_action(action) for action in uniques], dtype=object)
+    values = kinds[codes] if len(kinds) else np.array([], dtype=object)
+    return pd.Categorical(values, categories=ACTION_TYPES)
+
+
+class TransactionFrame(pd.DataFrame):
+    """
+    Transaction DataFrame with precomputed row partitions by ticker, account and action type.
+
+    Rows of any ticker, account or action type (or a combination with an action type) are looked
+    up in a dict instead of scanning and string-matching the whole ledger. The monthly transaction
+    cube is built on first use and kept alongside the partitions. Any derived frame, such as a
+    filter or a copy, is a plain DataFrame without partitions.
+    """
+
+    _metadata = ['_partitions', '_cube']
+
+    @property
+    def _constructor(self):
+        return pd.DataFrame
+
+    def rows(self, ticker=None, account=None, action_type=None):
+        """
+        Returns the positions of the rows matching the given keys.
+
+        Parameters:
+            ticker (str, optional): The stock ticker.
+            account (int, optional): The account number.
+            action_type (str or list, optional): One or more of ACTION_TYPES.
+
+        Returns:
+            ndarray: Sorted positional row indices.
+        """
+        if isinstance(action_type, (list, tuple)):
+            parts = [self.rows(ticker, account, kind) for kind in action_type]
+            return np.sort(np.concatenate(parts)) if parts else np.array([], dtype=np.intp)
+
+        if ticker is not None and account is not None:
+            return np.intersect1d(self.rows(ticker=ticker, action_type=action_type),
+                                  self.rows(account=account, action_type=action_type))
+        if ticker is not None:
+            key = ('ticker', ticker) if action_type is None else ('ticker_type', (ticker, action_type))
+        elif account is not None:
+            key = ('account', account) if action_type is None else ('account_type', (account, action_type))
+        elif action_type is not None:
+            key = ('type', action_type)
+        else:
+            return np.arange(len(self))
+        partition, value = key
+        return self._partitions[partition].get(value, np.array([], dtype=np.intp))
+
+    def select(self, ticker=None, account=None, action_type=None):
+        """
+        Returns the transactions matching the given keys.
+
+        Parameters:
+            ticker (str, optional): The stock ticker.
+            account (int, optional): The account number.
+            action_type (str or list, optional): One or more of ACTION_TYPES.
+
+        Returns:
+            DataFrame: The matching rows in ledger order.
+        """
+        return self.take(self.rows(ticker, account, action_type))
+
+
+def _group_rows(df, keys):
+    return df.groupby(keys, observed=True, sort=False).indices
+
+
+def _partition(df):
+    return {
+        'ticker': _group_rows(df, 'Ticker'),
+        'account': _group_rows(df, 'Account Number'),
+        'type': _group_rows(df, 'Action Type'),
+        'ticker_type': _group_rows(df, ['Ticker', 'Action Type']),
+        'account_type': _group_rows(df, ['Account Number', 'Action Type']),
+    }
+
+
+# build the indexed transaction model from a parsed ledger
+def index_transactions(df):
+    """
+    Adds the normalized 'Action Type' column, makes 'Ticker' categorical and partitions the rows.
+
+    Parameters:
+        df (DataFrame): The parsed transaction ledger.
+
+    Returns:
+        TransactionFrame: The indexed transaction frame.
+    """
+    df = df.reset_index(drop=True)
+    df['Action Type'] = normalize_actions(df['Action'])
+    df['Ticker'] = df['Ticker'].astype('category')
+
+    frame = TransactionFrame(df)
+    frame._partitions = _partition(frame)
+    frame._cube = None
+    return frame
+
+
+# add newly arrived transactions to an indexed transaction frame
+def append_transactions(frame, new_rows):
+    """
+    Appends transactions to a TransactionFrame, indexing only the new rows.
+
+    The new rows are normalized and partitioned on their own, and their positions are appended to
+    the existing partitions. The monthly transaction cube, if it was built, is extended the same way.
+
+    Parameters:
+        frame (TransactionFrame): The indexed transactions already loaded.
+        new_rows (DataFrame): The parsed new transactions, with the same columns as the ledger.
+
+    Returns:
+        TransactionFrame: A new indexed frame holding the transactions of both.
+    """
+    if len(new_rows) == 0:
+        return frame
+    new_rows = new_rows.reset_index(drop=True)
+    new_rows['Action Type'] = normalize_actions(new_rows['Action'])
+
+    # both parts need the same categories, of tickers, months and labels, to stay categorical once concatenated
+    old_rows, new_rows = union_categories(pd.DataFrame(frame), new_rows.assign(Ticker=new_rows['Ticker'].astype('category')))
+
+    combined = pd.concat([old_rows, new_rows], ignore_index=True)
+    result = TransactionFrame(combined)
+
+    # positions of the new rows follow the existing ones
+    offset = len(frame)
+    partitions = {}
+    for name, new_groups in _partition(new_rows).items():
+        merged = dict(frame._partitions[name])
+        for key, positions in new_groups.items():
+            positions = positions + offset
+            merged[key] = np.concatenate([merged[key], positions]) if key in merged else positions
+        partitions[name] = merged
+    result._partitions = partitions
+    result._cube = None if frame._cube is None else extend_cube(frame._cube, new_rows)
+    return result
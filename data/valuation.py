@@ -0,0 +1,133 @@
+import numpy as np
+import pandas as pd
+
+from data.dataManage import load_fx_rates
+from data.fx import BASE_CURRENCY, ticker_currencies
+from data.portfolioAccounting import adjust_for_splits
+
+# Cash moved by each kind of transaction, as a multiple of its 'Total (GBP)'
+CASH_FLOW_SIGNS = {'buy': -1.0, 'sell': 1.0, 'dividend': 1.0, 'capital return': 1.0, 'deposit': 1.0,
+                   'withdrawal': -1.0, 'interest': 1.0, 'other': 0.0}
+
+# Kinds of transaction that put money into or take it out of an account
+CONTRIBUTION_SIGNS = {'deposit': 1.0, 'withdrawal': -1.0}
+
+# Columns of the daily valuation of each account
+VALUATION_COLUMNS = ['Holdings', 'Cash', 'Net Asset Value', 'Net Contributions']
+
+# Key of the valuation summed over every account
+ALL_ACCOUNTS = 'All'
+
+
+def forward_fill(values):
+    """
+    Carries the last present value of every column of a matrix down over the missing rows.
+
+    Parameters:
+        values (ndarray): A (rows, columns) matrix, NaN where a value is missing.
+
+    Returns:
+        ndarray: The filled matrix, still NaN above the first present value of a column.
+    """
+    rows = np.where(np.isnan(values), 0, np.arange(len(values))[:, None])
+    np.maximum.accumulate(rows, axis=0, out=rows)
+    return values[rows, np.arange(values.shape[1])]
+
+
+def date_rows(dates, transaction_dates):
+    """
+    Maps transaction dates to the rows of a date axis.
+
+    Parameters:
+        dates (DatetimeIndex): The sorted dates of the axis.
+        transaction_dates (Series): The dates of the transactions.
+
+    Returns:
+        ndarray: The row of the first date on or after each transaction date, len(dates) for
+                 transactions after the last date.
+    """
+    return dates.searchsorted(transaction_dates.to_numpy())
+
+
+# GBP close of every ticker, converted with the rates of the currency it was last traded in
+def gbp_closes(close_df, trades, rates):
+    """
+    Converts a close price panel to GBP.
+
+    Parameters:
+        close_df (DataFrame): Close prices indexed by date with one column per ticker.
+        trades (DataFrame): Buys and sells with 'Ticker', 'Action Type' and 'Currency (Price / share)'.
+        rates (RateTable): The exchange rates.
+
+    Returns:
+        ndarray: The (dates, tickers) GBP closes, forward filled over missing prices. Tickers
+                 without a traded currency are taken as GBP.
+    """
+    currencies = ticker_currencies(trades).reindex(close_df.columns).astype(object).fillna(BASE_CURRENCY).to_numpy()
+    return forward_fill(close_df.to_numpy(dtype=np.float64)) * rates.factors(close_df.index, currencies)
+
+
+# daily holdings, cash and net asset value of every account, computed as whole matrices
+def portfolio_valuation(transactions, close_df, splits=None, rates=None):
+    """
+    Values every account of the ledger on every date of a close price panel.
+
+    The buys and sells are scattered into an (account, date, ticker) matrix of signed share
+    quantities and summed down the dates into positions, which are multiplied by the GBP closes.
+    The cash of each account is the running sum of the 'Total (GBP)' of its transactions, signed
+    by CASH_FLOW_SIGNS, and its net contributions the running sum of deposits less withdrawals.
+    Closes are converted to GBP with the rates of their date.
+    Transactions on a day without prices count from the next trading day. Holdings are valued
+    at the last close on or before each date, and at 0 before a ticker's first close. As in
+    pool_trades, a sale exceeding the shares held leaves none.
+
+    Parameters:
+        transactions (DataFrame): The transactions, as returned by load_investment_data.
+        close_df (DataFrame): Split-adjusted close prices indexed by date with one column per ticker.
+        splits (DataFrame, optional): Splits as returned by stock_splits, so share quantities
+                                      match the split-adjusted closes.
+        rates (RateTable, optional): The exchange rates, those of load_fx_rates by default.
+
+    Returns:
+        dict: A DataFrame of VALUATION_COLUMNS indexed by date for every account number, and the
+              sum of all accounts under ALL_ACCOUNTS.
+    """
+    dates = close_df.index
+    kinds = transactions['Action Type'].astype(str)
+    accounts, account_codes = np.unique(transactions['Account Number'].to_numpy(), return_inverse=True)
+    rows = date_rows(dates, transactions['Transaction Date'])
+    # transactions after the last close land in an extra row that is dropped
+    shape = (len(accounts), len(dates) + 1)
+
+    is_trade = kinds.isin(['buy', 'sell']).to_numpy()
+    trades = transactions[is_trade]
+    if splits is not None and len(splits):
+        trades = adjust_for_splits(trades.assign(Ticker=trades['Ticker'].astype(object)), splits)
+    ticker_codes = close_df.columns.get_indexer(trades['Ticker'].astype(object))
+    priced = ticker_codes >= 0
+    signed_shares = np.where(kinds[is_trade] == 'sell', -1.0, 1.0) * trades['No. of shares'].to_numpy(dtype=np.float64)
+    positions = np.zeros(shape + (len(close_df.columns),))
+    np.add.at(positions, (account_codes[is_trade][priced], rows[is_trade][priced], ticker_codes[priced]), signed_shares[priced])
+    np.cumsum(positions, axis=1, out=positions)
+    # sales of shares the ledger never bought, such as spun-off ones, empty the position instead
+    # of shorting it: subtracting the running minimum of the sums floors them at 0 as they go
+    positions -= np.minimum(np.minimum.accumulate(positions, axis=1), 0.0)
+
+    if rates is None:
+        rates = load_fx_rates()
+    closes = np.nan_to_num(gbp_closes(close_df, trades, rates))
+    holdings = np.einsum('adt,dt->ad', positions[:, :-1], closes)
+
+    totals = transactions['Total (GBP)'].to_numpy(dtype=np.float64)
+    cash = np.zeros(shape)
+    contributions = np.zeros(shape)
+    np.add.at(cash, (account_codes, rows), kinds.map(CASH_FLOW_SIGNS).fillna(0.0).to_numpy() * totals)
+    np.add.at(contributions, (account_codes, rows), kinds.map(CONTRIBUTION_SIGNS).fillna(0.0).to_numpy() * totals)
+    cash = np.cumsum(cash, axis=1)[:, :-1]
+    contributions = np.cumsum(contributions, axis=1)[:, :-1]
+
+    # (account, date, column) cube, with the sum of the accounts appended
+    cube = np.stack([holdings, cash, holdings + cash, contributions], axis=2)
+    cube = np.concatenate([cube, cube.sum(axis=0, keepdims=True)])
+    keys = [account.item() for account in accounts] + [ALL_ACCOUNTS]
+    return {key: pd.DataFrame(values, index=dates, columns=VALUATION_COLUMNS) for key, values in zip(keys, cube)}
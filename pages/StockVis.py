@@ -1,26 +1,78 @@
 import dash
-from dash import dcc, html, callback, Input, Output, State, callback_context
-import pandas as pd
+from dash import dcc, html, callback, Input, Output, State, Patch, callback_context
+import numpy as np
 import plotly.graph_objs as go
 from components.buySell import get_buysellTrans_layout
-from data.dataManage import load_investment_data, filter_dividend_data, load_investment_dates, load_company_data,load_stock_close_data
+from data.dataManage import DATA_DIR, filter_dividend_data, load_investment_dates, load_company_data,load_stock_close_data, get_all_tickers
+from data.priceStore import ensure_price_store
+from data.transactionCube import transaction_cube
+from data.ingest import ledger, REFRESH_SECONDS
+from data.portfolioAccounting import build_company_data
+from data.rangeQuery import RangeIndex
 from components.dividend import get_dividend_layout, create_monthly_dividend_figure, create_simplified_monthly_dividend_figure
-from components.multiple import get_overview_layout, create_stock_overview_figure
+from components.multiple import get_overview_layout, create_stock_overview_figure, get_overview_traces, get_overview_lines
+from components.downsample import downsample_series, relayout_x_range
+from components.metrics import timed_callback
+from components.figureCache import peek_figure, track_frames
+from components.backgroundJobs import background_callback
+from components.serialize import compact_array, compact_figure, FLOAT32_PRICES
 from components.single import get_single_layout, create_single_stock_figure
+from components.compare import get_compare_layout, create_compare_figure, create_correlation_figure
+from components.portfolio import get_portfolio_layout, create_portfolio_value_figure
 from components.company import get_risk_layout, create_parallel_coordinates_figure
 from components.home import get_home_layout
-from components.gainLoss import get_gainLoss_layout,create_gain_loss_chart
+from components.gainLoss import get_gainLoss_layout, create_gain_loss_chart, get_gain_loss_bars, get_gain_loss_sort_column
+from components.buySell import create_buysell_volume
+from components.dividend import create_dividend_figure
+from components.warmup import warm_in_background, worker_processes, WARMUP_CHART_STYLES, WARMUP_MA_PERIODS
 from dash.exceptions import PreventUpdate
 import json 
+import threading
 
 # Register the page within the Dash application.
 dash.register_page(__name__, title="StockVis", path='/')
 
-df =  load_investment_data()
-dividend_df = filter_dividend_data(df)
+# Compile any new or changed price csv files so the loaders read them through memory maps
+ensure_price_store(DATA_DIR)
+
+# The ledger appends new rows of the transaction csv to df as they are written
+df =  ledger.load()
+# Dividend views aggregate the dividend cells of the monthly transaction cube
+dividend_df = filter_dividend_data(transaction_cube(df))
 start_end_date_df = load_investment_dates()
-company_df = load_company_data()
 stock_df = load_stock_close_data()
+# Holdings, gains and dividends of each company are recomputed from the ledger and latest prices
+company_df = build_company_data(df, stock_df, load_company_data())
+# Figures built from these frames in background jobs are handed back to the worker's figure cache
+track_frames(df, dividend_df, start_end_date_df, stock_df, company_df)
+
+
+# figure builder calls of the views, with the arguments their callbacks pass, most requested first
+def get_warmup_tasks():
+    """
+    Lists the figures to pre-render: the home page graphs, the overview for every trend option
+    and warm-up MA window, and the single stock view of every ticker in the warm-up chart styles.
+
+    Returns:
+        list: (builder, args, kwargs) of each figure.
+    """
+    tasks = [(create_stock_overview_figure, (stock_df, start_end_date_df, df, company_df, False, False, 10), {}),
+             (create_parallel_coordinates_figure, (company_df,), {}),
+             (create_gain_loss_chart, (company_df,), {}),
+             (create_buysell_volume, (df,), {}),
+             (create_simplified_monthly_dividend_figure, (dividend_df,), {}),
+             (create_dividend_figure, (dividend_df,), {}),
+             (create_monthly_dividend_figure, (dividend_df,), {})]
+    for ma_period in WARMUP_MA_PERIODS:
+        for show_trend_after_last_buy in (False, True):
+            for show_trend_after_last_sell in (False, True):
+                tasks.append((create_stock_overview_figure, (stock_df, start_end_date_df, df, company_df,
+                                                             show_trend_after_last_buy, show_trend_after_last_sell, ma_period), {}))
+    for chart_style in WARMUP_CHART_STYLES:
+        for ticker in get_all_tickers():
+            tasks.append((create_single_stock_figure, (ticker, start_end_date_df, df, [], chart_style), {}))
+    return tasks
+
 
 @callback(
     Output('page-content', 'children'),
@@ -29,16 +81,19 @@ stock_df = load_stock_close_data()
      Input('dividend', 'n_clicks'),
      Input('overview', 'n_clicks'),  
      Input('single', 'n_clicks'),
+     Input('compare', 'n_clicks'),
+     Input('portfolio', 'n_clicks'),
      Input('gainLoss', 'n_clicks'),
      Input('risk', 'n_clicks')],
     prevent_initial_call=True
 )
-def display_view(home_btn, btn1, btn2, btn3, btn4, btn5, btn6):
+@timed_callback
+def display_view(home_btn, btn1, btn2, btn3, btn4, btn5, btn6, btn7, btn8):
     """
     Updates the content displayed on the page based on user interactions with navigation buttons.
 
     Parameters:
-        home_btn, btn1, btn2, btn3, btn4, btn5, btn6 (int): Button click counts for different views.
+        home_btn, btn1, btn2, btn3, btn4, btn5, btn6, btn7, btn8 (int): Button click counts for different views.
 
     Returns:
         html.Div: The layout corresponding to the most recently clicked button.
@@ -48,26 +103,30 @@ def display_view(home_btn, btn1, btn2, btn3, btn4, btn5, btn6):
     ctx = dash.callback_context
     if not ctx.triggered:
         # Default to view 1 if no buttons have been clicked yet
-        return get_home_layout(start_end_date_df, df, company_df, stock_df, dividend_df)
+        return get_home_layout()
     
     button_id = ctx.triggered[0]['prop_id'].split('.')[0]
 
     if button_id == 'home':
-        return get_home_layout(start_end_date_df, df, company_df, stock_df, dividend_df)
+        return get_home_layout()
     elif button_id == 'dividend':
         return get_dividend_layout(dividend_df)
     elif button_id == 'overview':
         return get_overview_layout(start_end_date_df, df, company_df, stock_df)  
     elif button_id == 'single':
         return get_single_layout()
+    elif button_id == 'compare':
+        return get_compare_layout()
+    elif button_id == 'portfolio':
+        return get_portfolio_layout(df)
     elif button_id == 'risk':
         return get_risk_layout(company_df)
     elif button_id == 'buysellTrans':
         return get_buysellTrans_layout(df)
     elif button_id == 'gainLoss':
-        return get_gainLoss_layout(company_df)
+        return get_gainLoss_layout()
     else:
-        return get_home_layout(start_end_date_df, df, company_df, stock_df, dividend_df)
+        return get_home_layout()
 
 
 
@@ -77,6 +136,7 @@ def display_view(home_btn, btn1, btn2, btn3, btn4, btn5, btn6):
     [Input('dividend-detail-view', 'n_clicks')],
     prevent_initial_call=True
 )
+@timed_callback
 def toggle_dividend_view(n_clicks):
     # Determine if we should show the simplified or detailed view based on the number of clicks
     if n_clicks % 2 == 0:
@@ -85,7 +145,7 @@ def toggle_dividend_view(n_clicks):
     else:
         # Show simplified view
         figure = create_monthly_dividend_figure(dividend_df)
-    return [dcc.Graph(figure=figure)]
+    return [dcc.Graph(figure=compact_figure(figure))]
 
 
 
@@ -95,6 +155,7 @@ def toggle_dividend_view(n_clicks):
     State('ma-input', 'value'),
     State('ma-periods', 'data')
 )
+@timed_callback
 def update_ma_periods(n_clicks, new_period, existing_periods):
     if n_clicks > 0 and new_period is not None:
         existing_periods = existing_periods or []
@@ -104,19 +165,61 @@ def update_ma_periods(n_clicks, new_period, existing_periods):
     return existing_periods
 
 
-@callback(
+# Figure builds run as background jobs so they do not hold a request worker
+@background_callback(
     Output('single-stock-graph', 'figure'),
     [Input('single-stock-dropdown', 'value'),
      Input('chart-style-dropdown', 'value'),
-     Input('ma-periods', 'data')]
+     Input('ma-periods', 'data'),
+     Input('single-currency', 'value')],
+    progress=[Output('single-progress', 'children')],
+    progress_default=['']
 )
-def update_graph_with_chart_style_and_ma(selected_ticker, chart_style, ma_periods):
+@timed_callback
+def update_graph_with_chart_style_and_ma(set_progress, selected_ticker, chart_style, ma_periods, currency):
     if selected_ticker:
+        set_progress(f'Loading {selected_ticker}...')
         ma_periods = ma_periods or []
-        return create_single_stock_figure(selected_ticker, start_end_date_df, df, ma_periods, chart_style)
+        currency = None if currency in (None, 'quoted') else currency
+        return compact_figure(create_single_stock_figure(selected_ticker, start_end_date_df, df, ma_periods, chart_style, currency),
+                              float32=FLOAT32_PRICES)
+    return go.Figure()
+
+
+@callback(
+    Output('compare-chart', 'figure'),
+    [Input('compare-tickers', 'value'),
+     Input('compare-base-date', 'date')]
+)
+@timed_callback
+def update_compare_chart(tickers, base_date):
+    if tickers:
+        return compact_figure(create_compare_figure(tickers, base_date), float32=FLOAT32_PRICES)
     return go.Figure()
 
 
+# The heatmap correlates every holding, whichever tickers are compared above it
+@callback(
+    Output('correlation-heatmap', 'figure'),
+    [Input('correlation-window', 'value'),
+     Input('correlation-end-date', 'date')]
+)
+@timed_callback
+def update_correlation_heatmap(window, end_date):
+    return compact_figure(create_correlation_figure(sorted(get_all_tickers()), window, end_date))
+
+
+# The valuation is replayed from the ledger, so new transactions redraw the chart
+@callback(
+    Output('portfolio-value-chart', 'figure'),
+    [Input('portfolio-account', 'value'),
+     Input('ledger-version', 'data')]
+)
+@timed_callback
+def update_portfolio_value_chart(account, ledger_version):
+    return compact_figure(create_portfolio_value_figure(df, stock_df, company_df, account), float32=FLOAT32_PRICES)
+
+
 df_columns = ['Ticker Index', 'Average Price per Share', 'Total Purchase Amount', 
               'Total Number of Shares Purchased', 'Total Number of Shares Sold', 
               'Total Sales Amount', 'Average Sale Price per Share', 
@@ -124,11 +227,37 @@ df_columns = ['Ticker Index', 'Average Price per Share', 'Total Purchase Amount'
               'Total Dividends', 'Realized Capital Gain & Loss', 
               'Unrealized Capital Gain & Loss']
 
+# Brushes of the parallel coordinates plot are answered from a sorted index of these columns, and
+# the overview traces are listed and mapped to their rows once; both are rebuilt with company_df
+company_ranges = RangeIndex(company_df, df_columns)
+overview_trace_map = None
+
+
+# row of company_df of every trace of the stock overview figure
+def get_overview_trace_map():
+    """
+    Lists the line traces of the stock overview figure and maps every trace to the rows of company_ranges.
+
+    The traces are the same whatever the trend and MA options, and are read off the holding periods
+    and transactions without building the figure, then kept until the ledger is refreshed.
+
+    Returns:
+        tuple: (list of the indices of the line traces, ndarray of the row of every trace, -1 for
+               tickers without company data).
+    """
+    global overview_trace_map
+    if overview_trace_map is None:
+        traces = get_overview_traces(stock_df, start_end_date_df, df, company_df)
+        line_trace_indices = [index for index, (_, kind) in enumerate(traces) if kind == 'line']
+        overview_trace_map = (line_trace_indices, company_ranges.positions([ticker for ticker, _ in traces]))
+    return overview_trace_map
+
 @callback(
     Output('user-selections-store', 'data'),
     [Input('risk-home-chart', 'restyleData')],
     State('user-selections-store', 'data')
 )
+@timed_callback
 def update_user_selections(restyle_data, existing_selections):
     if restyle_data:
         # Initialize a new selections dict if none exists
@@ -156,88 +285,252 @@ def update_user_selections(restyle_data, existing_selections):
     return existing_selections if existing_selections else json.dumps({col: None for col in df_columns})
     
 
-@callback(
-    Output('overview-home-chart', 'figure'),
-    [Input('update-ma-btn', 'n_clicks'),Input('trend_checkboxes', 'value'),Input('user-selections-store', 'data')],
-    [State('trend_checkboxes', 'value'),State('user-selections-store', 'data'),State('ma-period-input', 'value'),State('overview-home-chart', 'figure')]
+# The overview is rebuilt in a background job; the update button is disabled while it runs
+@background_callback(
+    [Output('overview-home-chart', 'figure'), Output('overview-settings', 'data')],
+    [Input('update-ma-btn', 'n_clicks'),Input('trend_checkboxes', 'value'),Input('ledger-version', 'data')],
+    [State('ma-period-input', 'value')],
+    progress=[Output('overview-progress', 'children')],
+    progress_default=[''],
+    running=[(Output('update-ma-btn', 'disabled'), True, False)]
 )
-def update_overview_chart(n_clicks,trend_checkbox_values, stored_selections, trend_checkboxes_states,stored_selections_state, ma_period, current_fig):
+@timed_callback
+def update_overview_chart(set_progress, n_clicks, trend_checkbox_values, ledger_version, ma_period):
     ctx = callback_context
     trigger_id = ctx.triggered[0]['prop_id'].split('.')[0]
-    if trigger_id == 'trend_checkboxes':
-        show_trend_after_last_buy = 'last_buy' in trend_checkbox_values
-        show_trend_after_last_sell = 'last_sell' in trend_checkbox_values
+    # The initial call when the home page is inserted fills the empty overview graph, new transactions rebuild it
+    if trigger_id not in ('', 'trend_checkboxes', 'ledger-version') and not (trigger_id == 'update-ma-btn' and n_clicks > 0):
+        raise PreventUpdate
+
+    show_trend_after_last_buy = 'last_buy' in trend_checkbox_values
+    show_trend_after_last_sell = 'last_sell' in trend_checkbox_values
 
     # Generate the figure with updated parameters based on checkbox selection
-        current_fig = create_stock_overview_figure(stock_df, start_end_date_df, df, company_df, show_trend_after_last_buy, show_trend_after_last_sell, ma_period)
-        
-    elif trigger_id == 'user-selections-store':
-    
-        if not stored_selections:
-            # If no selections are stored, do not update the chart
-            raise PreventUpdate
-        
-        if stored_selections:
-            selections_dict = json.loads(stored_selections)
-            selections_df = pd.DataFrame(list(selections_dict.items()), columns=['Dimension', 'Ranges'])
-
-            valid_indices = set(company_df['Ticker'])
-
-            for index, row in selections_df.iterrows():
-                if row['Ranges'] is not None:
-                    dimension = row['Dimension']
-                    temp_indices = set()
-
-                    for selected_range in row['Ranges']:
-                        condition = (company_df[dimension] >= selected_range[0]) & (company_df[dimension] <= selected_range[1])
-                        temp_indices.update(company_df[condition]['Ticker'])
-                    
-                    valid_indices.intersection_update(temp_indices)
-
-            valid_indices_list = list(valid_indices)
-
-            for trace in current_fig['data']:
-                ticker = trace.get('name')
-                group = trace.get('legendgroup')
-                if ticker and ticker in valid_indices_list:
-                    trace['opacity'] = 1
-                # For buy/sell markers associated with the selected tickers, ensure they are also fully opaque
-                elif group and any(ticker for ticker in valid_indices_list if group.endswith(ticker)):
-                    trace['opacity'] = 1
-                else:
-                    # For non-selected tickers, reduce opacity to make them transparent but still present on the plot
-                    trace['opacity'] = 0.15
-    elif trigger_id == 'update-ma-btn' and n_clicks > 0:
-
-        show_trend_after_last_buy = 'last_buy' in trend_checkbox_values
-        show_trend_after_last_sell = 'last_sell' in trend_checkbox_values
-        current_fig = create_stock_overview_figure(stock_df, start_end_date_df, df, company_df, show_trend_after_last_buy, show_trend_after_last_sell, ma_period)
-        
-    else:
+    set_progress(f'Building the {ma_period}-day moving averages...')
+    current_fig = create_stock_overview_figure(stock_df, start_end_date_df, df, company_df, show_trend_after_last_buy, show_trend_after_last_sell, ma_period)
+    settings = [show_trend_after_last_buy, show_trend_after_last_sell, ma_period]
+    set_progress('Sending the overview...')
+    return compact_figure(current_fig, float32=FLOAT32_PRICES), settings
+
+
+# Brushing the parallel coordinates only sends opacities, fast enough to stay in the request
+@callback(
+    Output('overview-home-chart', 'figure', allow_duplicate=True),
+    Input('user-selections-store', 'data'),
+    [State('overview-settings', 'data')],
+    prevent_initial_call=True
+)
+@timed_callback
+def highlight_overview_selection(stored_selections, settings):
+    # Nothing to highlight without selections, or before the overview has been built
+    if not stored_selections or not settings:
         raise PreventUpdate
-    
+
+    # Companies inside the brushed ranges of every dimension
+    selected = company_ranges.query(json.loads(stored_selections))
+    _, trace_rows = get_overview_trace_map()
+
+    # Only send the opacity of each trace, the lines and buy/sell markers of selected tickers stay fully opaque
+    # and the others are made transparent but still present on the plot
+    current_fig = Patch()
+    for trace_index, opacity in enumerate(np.where(company_ranges.lookup(selected, trace_rows), 1, 0.15).tolist()):
+        current_fig['data'][trace_index]['opacity'] = opacity
     return current_fig
 
 
+def get_overview_zoom_patch(relayout_data, show_trend_after_last_buy, show_trend_after_last_sell, ma_period):
+    """
+    Resamples the lines of a stock overview figure for the date window the user zoomed to.
+
+    Parameters:
+        relayout_data (dict): The relayoutData of the overview graph.
+        show_trend_after_last_buy (bool): Whether the trend lines are extended after the last buy.
+        show_trend_after_last_sell (bool): Whether the trend lines are extended after the last sell.
+        ma_period (int): The moving average period of the figure.
+
+    Returns:
+        Patch: The new x and y of every line trace.
+    """
+    changed, x_range = relayout_x_range(relayout_data)
+    if not changed:
+        raise PreventUpdate
+
+    line_trace_indices, _ = get_overview_trace_map()
+    patched_fig = Patch()
+    overview_fig = peek_figure(create_stock_overview_figure, stock_df, start_end_date_df, df, company_df,
+                               show_trend_after_last_buy, show_trend_after_last_sell, ma_period)
+    if x_range is None and overview_fig is not None:
+        # Back to the full range, the cached figure already holds the downsampled lines
+        for trace_index in line_trace_indices:
+            patched_fig['data'][trace_index]['x'] = compact_array(overview_fig['data'][trace_index]['x'], dates_as_numbers=True)
+            patched_fig['data'][trace_index]['y'] = compact_array(overview_fig['data'][trace_index]['y'], FLOAT32_PRICES)
+        return patched_fig
+
+    # Without it the full range lines are downsampled as in the figure
+    lines = get_overview_lines(stock_df, start_end_date_df, company_df,
+                               show_trend_after_last_buy, show_trend_after_last_sell, ma_period, x_range)
+
+    # Only the visible part of each line is resampled, so zooming in reveals the full resolution
+    for trace_index, (_, ma) in zip(line_trace_indices, lines):
+        ma = downsample_series(ma)
+        patched_fig['data'][trace_index]['x'] = compact_array(ma.index, dates_as_numbers=True)
+        patched_fig['data'][trace_index]['y'] = compact_array(ma.to_numpy(), FLOAT32_PRICES)
+    return patched_fig
+
+
 @callback(
-    Output('gain-loss-chart', 'figure'),
+    Output('overview-home-chart', 'figure', allow_duplicate=True),
+    Input('overview-home-chart', 'relayoutData'),
+    State('overview-settings', 'data'),
+    prevent_initial_call=True
+)
+@timed_callback
+def zoom_overview_chart(relayout_data, settings):
+    if not settings:
+        raise PreventUpdate
+    show_trend_after_last_buy, show_trend_after_last_sell, ma_period = settings
+    return get_overview_zoom_patch(relayout_data, show_trend_after_last_buy, show_trend_after_last_sell, ma_period)
+
+
+@callback(
+    Output('stock-overview-chart', 'figure'),
+    Input('stock-overview-chart', 'relayoutData'),
+    prevent_initial_call=True
+)
+@timed_callback
+def zoom_stock_overview_chart(relayout_data):
+    return get_overview_zoom_patch(relayout_data, False, False, 10)
+
+
+@callback(
+    [Output('gain-loss-chart', 'figure', allow_duplicate=True), Output('gain-loss-visible', 'data')],
     [Input('gain-loss-chart', 'restyleData')],
-    [State('gain-loss-chart', 'figure')]
+    [State('gain-loss-visible', 'data')],
+    prevent_initial_call=True
 )
-def update_chart(restyle_data, existing_figure):
-    ctx = dash.callback_context
-    if not ctx.triggered or not restyle_data:
-        sort_column = 'Total'
-    else:
-        visible_traces = restyle_data[0]['visible']
-        if visible_traces[0] is True:
-            sort_column = 'Total Dividends'
-        else:
-            sort_column = 'Realized Capital Gain & Loss'
+@timed_callback
+def update_chart(restyle_data, visible):
+    if not restyle_data or 'visible' not in restyle_data[0]:
+        raise PreventUpdate
+
+    # Track which of the two traces are shown, restyleData only holds the ones that changed
+    visible = list(visible or [True, True])
+    changes, trace_indices = restyle_data
+    values = changes['visible'] if isinstance(changes['visible'], list) else [changes['visible']] * len(trace_indices)
+    for value, trace_index in zip(values, trace_indices):
+        visible[trace_index] = value
+    sort_column = get_gain_loss_sort_column(visible)
+
+    # Re-sort by sending the reordered bars only, the legend state is kept by the browser
+    labels, dividends, gains = get_gain_loss_bars(company_df, sort_column)
+    patched_fig = Patch()
+    patched_fig['data'][0]['y'] = labels
+    patched_fig['data'][0]['x'] = dividends
+    patched_fig['data'][1]['y'] = labels
+    patched_fig['data'][1]['x'] = gains
 
-    fig = create_gain_loss_chart(company_df,sort_column)
+    return patched_fig, visible
 
-    return fig
+
+# Each graph of the home page is filled by its own callback when the page is inserted, so the
+# requests run concurrently and the page waits for the slowest figure instead of all six
+@callback(
+    Output('risk-home-chart', 'figure'),
+    Input('risk-home-chart', 'id'),
+    Input('ledger-version', 'data')
+)
+@timed_callback
+def fill_risk_home_chart(_, ledger_version):
+    return compact_figure(create_parallel_coordinates_figure(company_df))
+
+
+@callback(
+    Output('gain-loss-chart', 'figure'),
+    Input('gain-loss-chart', 'id'),
+    Input('ledger-version', 'data')
+)
+@timed_callback
+def fill_gain_loss_chart(_, ledger_version):
+    return compact_figure(create_gain_loss_chart(company_df))
+
+
+@callback(
+    Output('buy_sell_fig-home', 'figure'),
+    Input('buy_sell_fig-home', 'id'),
+    Input('ledger-version', 'data')
+)
+@timed_callback
+def fill_buy_sell_home_chart(_, ledger_version):
+    return compact_figure(create_buysell_volume(df))
+
+
+@callback(
+    Output('divi-time-home', 'figure'),
+    Input('divi-time-home', 'id'),
+    Input('ledger-version', 'data')
+)
+@timed_callback
+def fill_dividend_time_home_chart(_, ledger_version):
+    return compact_figure(create_simplified_monthly_dividend_figure(dividend_df))
+
+
+@callback(
+    Output('divi-ticker-home', 'figure'),
+    Input('divi-ticker-home', 'id'),
+    Input('ledger-version', 'data')
+)
+@timed_callback
+def fill_dividend_ticker_home_chart(_, ledger_version):
+    return compact_figure(create_dividend_figure(dividend_df))
+
+
+# The frames derived from the ledger are rebuilt and swapped by one request thread at a time
+_ledger_lock = threading.Lock()
+
+
+# bring this worker's frames up to date with the transaction csv before it answers a request
+def sync_ledger():
+    """
+    Appends the rows written to the transaction csv since the last check to the frames of this worker.
+
+    Runs before every request of every worker, so whichever worker answers a request serves the
+    ledger version the browser was told about. When the csv is unchanged this is one stat of the
+    file. The frames derived from the ledger are rebuilt from the whole ledger, not from the
+    appended rows alone, and swapped together.
+    """
+    global df, dividend_df, company_df, company_ranges, overview_trace_map
+    if not ledger.stale():
+        return
+    with _ledger_lock:
+        if not ledger.refresh():
+            return
+        new_df = ledger.frame
+        new_dividend_df = filter_dividend_data(transaction_cube(new_df))
+        new_company_df = build_company_data(new_df, stock_df, load_company_data())
+        track_frames(new_df, new_dividend_df, new_company_df)
+        df, dividend_df, company_df, company_ranges, overview_trace_map = (
+            new_df, new_dividend_df, new_company_df, RangeIndex(new_company_df, df_columns), None)
+    # The cached figures were built from the previous frames. The figure cache is private to each
+    # worker, so each one warms its own up, on its share of the cores
+    warm_in_background(get_warmup_tasks(), processes=worker_processes())
+
+
+dash.get_app().server.before_request(sync_ledger)
+
+
+# Tell the browser about new transactions so the graphs that depend on them rebuild; the frames
+# were already brought up to date by sync_ledger
+@callback(
+    Output('ledger-version', 'data'),
+    Input('ledger-refresh', 'n_intervals'),
+    State('ledger-version', 'data'),
+    prevent_initial_call=True
+)
+@timed_callback
+def refresh_ledger(n_intervals, ledger_version):
+    if ledger.version == ledger_version:
+        raise PreventUpdate
+    return ledger.version
 
 
 layout = html.Div([
@@ -249,7 +542,11 @@ layout = html.Div([
         html.Button('Company', id='risk'),
         html.Button('Multiple', id='overview'), 
         html.Button('Single', id='single'),
+        html.Button('Compare', id='compare'),
+        html.Button('Portfolio', id='portfolio'),
     ]),
-    html.Div(id='page-content', children=get_home_layout(start_end_date_df, df, company_df, stock_df, dividend_df))  
+    html.Div(id='page-content', children=get_home_layout()),
+    dcc.Interval(id='ledger-refresh', interval=REFRESH_SECONDS * 1000),
+    dcc.Store(id='ledger-version', data=ledger.version)
 ])
 
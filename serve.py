@@ -0,0 +1,143 @@
+import argparse
+import gc
+import glob
+import os
+import tempfile
+
+try:
+    from gunicorn.app.base import BaseApplication
+except ImportError:  # gunicorn is only needed for the production server
+    BaseApplication = object
+
+# Production server settings, overridable through the environment. Besides the launcher below,
+# this module is a gunicorn configuration file: gunicorn -c serve.py app:server
+bind = os.environ.get('FINVIS_BIND', '0.0.0.0:8052')
+workers = int(os.environ.get('FINVIS_WORKERS', os.cpu_count() or 1))
+threads = int(os.environ.get('FINVIS_THREADS', 1))
+# The app, and with it the transactions, company data and price maps of pages/StockVis.py, is
+# loaded once in the master and inherited by the forked workers
+preload_app = True
+# Directory the workers write their metrics to, so /metrics on any worker reports all of them. Set
+# before the app is loaded, as components/metrics.py reads it on import
+metrics_dir = os.environ.setdefault('FINVIS_METRICS_DIR', os.path.join(tempfile.gettempdir(), f'finvis-metrics-{os.getpid()}'))
+
+
+# start the metrics of a new server from zero and tell the workers how many of them there are
+def on_starting(server):
+    """
+    Removes the metrics files of an earlier server that used the same directory, and exports the
+    number of workers, which split the cores evenly between the warm-ups they run after a ledger refresh.
+
+    Parameters:
+        server (Arbiter): The gunicorn master.
+    """
+    from components.warmup import SERVER_WORKERS_VARIABLE
+    os.makedirs(metrics_dir, exist_ok=True)
+    for path in glob.glob(os.path.join(metrics_dir, '*.json')):
+        os.remove(path)
+    os.environ[SERVER_WORKERS_VARIABLE] = str(server.cfg.workers)
+
+
+# fill the figure cache in the master, once, so every worker starts with it
+def when_ready(server):
+    """
+    Pre-renders the most requested figures within the warm-up time budget before the workers are forked.
+
+    Parameters:
+        server (Arbiter): The gunicorn master.
+    """
+    if not server.cfg.preload_app:
+        # the data is only loaded in the workers, there is nothing to warm up here
+        return
+    from components.warmup import warm_figure_cache
+    from pages.StockVis import get_warmup_tasks
+    warm_figure_cache(get_warmup_tasks())
+
+
+# make the objects loaded in the master permanent before each worker is forked
+def pre_fork(server, worker):
+    """
+    Freezes the objects of the master before a worker is forked.
+
+    Frozen objects are ignored by the garbage collector, so collections in the workers do not
+    write to the memory pages holding them and the pages stay shared copy-on-write instead of
+    being copied into every worker.
+
+    Parameters:
+        server (Arbiter): The gunicorn master.
+        worker (Worker): The worker about to be forked.
+    """
+    gc.freeze()
+
+
+# forget the metrics the master recorded, which every worker would otherwise report again
+def post_fork(server, worker):
+    """
+    Resets the metrics a worker inherited from the master.
+
+    Parameters:
+        server (Arbiter): The gunicorn master.
+        worker (Worker): The forked worker.
+    """
+    from components.metrics import reset_metrics
+    reset_metrics()
+
+
+def on_exit(server):
+    """
+    Removes the metrics files, and the directory once empty, when the server shuts down.
+
+    Parameters:
+        server (Arbiter): The gunicorn master.
+    """
+    for path in glob.glob(os.path.join(metrics_dir, '*.json')):
+        os.remove(path)
+    try:
+        os.rmdir(metrics_dir)
+    except OSError:
+        pass
+
+
+class FinVisApplication(BaseApplication):
+    """
+    Gunicorn application serving the Dash app with the settings of this module.
+    """
+
+    def __init__(self, options):
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        # imported here so the data is loaded by gunicorn in the master, not by the launcher
+        from app import server
+        return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve FinVis with preloaded data shared by forked workers.')
+    parser.add_argument('--bind', default=bind, help='address to listen on')
+    parser.add_argument('--workers', type=int, default=workers, help='number of worker processes, one per core by default')
+    parser.add_argument('--threads', type=int, default=threads, help='threads per worker')
+    args = parser.parse_args(argv)
+    if BaseApplication is object:
+        raise SystemExit('The production server requires gunicorn: pip install gunicorn')
+    FinVisApplication({
+        'bind': args.bind,
+        'workers': args.workers,
+        'threads': args.threads,
+        'worker_class': 'gthread' if args.threads > 1 else 'sync',
+        'preload_app': preload_app,
+        'on_starting': on_starting,
+        'when_ready': when_ready,
+        'pre_fork': pre_fork,
+        'post_fork': post_fork,
+        'on_exit': on_exit,
+    }).run()
+
+
+if __name__ == '__main__':
+    main()